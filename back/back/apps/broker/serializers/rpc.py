@@ -13,6 +13,8 @@ from back.apps.broker.models.message import AgentType
 class CtxSerializer(serializers.Serializer):
     conversation_id = serializers.CharField(max_length=255)
     user_id = serializers.CharField(allow_null=True, allow_blank=True, required=False)
+    # Identifies the condition call the result answers, as the conditions of a state run concurrently
+    rpc_call_id = serializers.CharField(max_length=255, required=False)
 
 
 class PayloadSerializer(serializers.Serializer):
@@ -1,6 +1,8 @@
 import asyncio
+import os
 from logging import getLogger
-from typing import List, NamedTuple, Text, Union
+from typing import Dict, List, NamedTuple, Text, Tuple, Union
+from uuid import uuid4
 
 from channels.db import database_sync_to_async
 from channels.layers import get_channel_layer
@@ -13,6 +15,9 @@ from back.utils import WSStatusCodes
 
 logger = getLogger(__name__)
 
+# Seconds to wait for the result of a condition from the RPC server
+CONDITION_TIMEOUT = float(os.environ.get("FSM_CONDITION_TIMEOUT", 30))
+
 
 class State(NamedTuple):
     """
@@ -91,6 +96,11 @@ class FSM:
         self.states = states
         self.transitions = transitions
         self.rpc_result_future: Union[asyncio.Future, None] = None
+        # The conditions run concurrently, their results are matched to their calls by the rpc_call_id of the ctx
+        self.condition_futures: Dict[str, asyncio.Future] = {}
+        # Condition results of the current (state, message), so evaluating the transitions again doesn't call the RPCs
+        self.condition_results_key = None
+        self.condition_results: Dict[str, Tuple[float, dict]] = {}
         self.initial_conversation_metadata = initial_conversation_metadata
 
         self.current_state = current_state
@@ -106,13 +116,15 @@ class FSM:
         """
         It will cycle to the next state based on which transition returns a higher probability, once the next state
         is reached it makes sure everything is saved and cached into the DB to keep the system stateful
+        The conditions of all the transitions are evaluated concurrently, on a tie the first declared transition wins.
         """
-        transitions = self.get_current_state_transitions()
+        transitions = list(self.get_current_state_transitions())
+        condition_results = await self.run_conditions(transitions)
         best_score = 0
         best_transition = None
         transition_data = {}
         for t in transitions:
-            score, _data = await self.check_transition_condition(t)
+            score, _data = self.check_transition_condition(t, condition_results)
             if score > best_score:
                 best_transition = t
                 best_score = score
@@ -125,6 +137,32 @@ class FSM:
 
         await self.save_cache()
 
+    async def run_conditions(self, transitions: List[Transition]) -> Dict[str, Union[Tuple[float, dict], None]]:
+        """
+        Runs the conditions of the transitions concurrently, each one once. The results are cached for the current state
+        and message, a condition that timed out has None as result and is not cached.
+        """
+        condition_names = list(dict.fromkeys(
+            condition_name for t in transitions for condition_name in [*t.conditions, *t.unless]
+        ))
+        if not condition_names:
+            return {}
+
+        ctx = await self.ctx.serialize()
+        # Keyed on the last message, a count of messages can repeat if messages are deleted or arrive concurrently
+        last_msg = await database_sync_to_async(self.ctx.conversation.get_last_msg)()
+        results_key = (self.current_state.name, last_msg.pk if last_msg else None)
+        if results_key != self.condition_results_key:
+            self.condition_results_key = results_key
+            self.condition_results = {}
+
+        pending_names = [name for name in condition_names if name not in self.condition_results]
+        pending_results = await asyncio.gather(*[self.run_condition(name, ctx) for name in pending_names])
+        for condition_name, result in zip(pending_names, pending_results):
+            if result is not None:
+                self.condition_results[condition_name] = result
+
+        return {name: self.condition_results.get(name) for name in condition_names}
 
     async def run_current_state_events(self, transition_data=None):
         """
@@ -169,7 +207,16 @@ class FSM:
             data["id"] = id
             await self.ctx.send_response(data)
         else:
-            self.rpc_result_future.set_result(data)
+            rpc_call_id = data.get("ctx", {}).get("rpc_call_id")
+            if rpc_call_id is None:
+                # The result can't be matched to its condition call, which will time out
+                logger.error("Ignoring a condition result without rpc_call_id, the RPC server must return the ctx it received")
+                return
+            future = self.condition_futures.get(rpc_call_id)
+            if future is None or future.done():
+                logger.debug(f"Ignoring the result of the condition call {rpc_call_id}, it already timed out")
+                return
+            future.set_result(data)
 
     def manage_last_llm_msg(self, _new):
         _old = self.last_aggregated_msg
@@ -205,27 +252,31 @@ class FSM:
             self.transitions,
         )
 
-    async def check_transition_condition(self, transition):
+    def check_transition_condition(self, transition, condition_results):
         """
-        For a transition it will compute its score based on all its conditions
+        For a transition it will compute its score based on all its conditions, a transition with a condition that
+        timed out is not taken
         """
+        if any(condition_results[name] is None for name in [*transition.conditions, *transition.unless]):
+            return 0, {}
+
         max_score = 0 if transition.conditions else 1
         data = {}
         for condition_name in transition.conditions:
-            score, _data = await self.run_condition(condition_name)
+            score, _data = condition_results[condition_name]
             if score > max_score:
                 max_score = score
                 data = _data
 
         un_max_score = 0
         for condition_name in transition.unless:
-            score, _ = await self.run_condition(condition_name)
+            score, _ = condition_results[condition_name]
             if score > un_max_score:
                 un_max_score = score
 
         return max_score - un_max_score, data
 
-    async def run_condition(self, condition_name):
+    async def run_condition(self, condition_name, ctx=None):
         """
         It will call the RPC server, 'condition_name' is the procedure the remote server should run
         Then it will wait util the response is back into the database
@@ -233,28 +284,42 @@ class FSM:
         ----------
         condition_name: str
             Name of the remote procedure to call
+        ctx: dict
+            The serialized ctx, to serialize it only once for all the conditions
 
         Returns
         -------
-        tuple[float, dict]
-            The first float indicates the score, the returning dictionary is the result of the RPC
+        tuple[float, dict] or None
+            The first float indicates the score, the returning dictionary is the result of the RPC.
+            None if the RPC server didn't answer in FSM_CONDITION_TIMEOUT seconds.
 
         """
         group_name = await database_sync_to_async(ConsumerRoundRobinQueue.get_next_consumer_group_name)(self.ctx.fsm_def.pk)
 
+        rpc_call_id = str(uuid4())
         data = {
             "type": "rpc_call",
             "status": WSStatusCodes.ok.value,
-            "payload": {"name": condition_name, "ctx": await self.ctx.serialize()},
+            "payload": {
+                "name": condition_name,
+                "ctx": {**(ctx or await self.ctx.serialize()), "rpc_call_id": rpc_call_id},
+            },
         }
-        await self.channel_layer.group_send(group_name, data)
-        self.rpc_result_future = asyncio.get_event_loop().create_future()
-        logger.debug(f"Waiting for RCP call {condition_name} (condition)...")
-        payload = await self.rpc_result_future
+        future = asyncio.get_event_loop().create_future()
+        self.condition_futures[rpc_call_id] = future
+        try:
+            await self.channel_layer.group_send(group_name, data)
+            logger.debug(f"Waiting for RCP call {condition_name} (condition)...")
+            payload = await asyncio.wait_for(future, CONDITION_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"RPC call {condition_name} (condition) timed out after {CONDITION_TIMEOUT}s")
+            return None
+        finally:
+            self.condition_futures.pop(rpc_call_id, None)
         logger.debug(f"...Receive RCP call {condition_name} (condition)")
         return payload["stack"]["score"], payload["stack"]["data"]
 
     async def save_cache(self):
-        from back.apps.fsm.models import CachedFSM  # TODO: Resolve CI
+        from back.apps.fsm.state_store import get_fsm_state_store  # TODO: Resolve CI
 
-        await database_sync_to_async(CachedFSM.update_or_create)(self)
+        await get_fsm_state_store().save(self)
@@ -88,15 +88,24 @@ class CachedFSM(ChangesMixin):
 
     @classmethod
     def update_or_create(cls, fsm: FSM):
-        instance = cls.objects.filter(conversation=fsm.ctx.conversation).first()
+        cls.persist_state(
+            fsm.ctx.conversation.pk,
+            fsm.ctx.fsm_def.pk,
+            fsm.current_state._asdict(),
+            fsm.initial_conversation_metadata,
+        )
+
+    @classmethod
+    def persist_state(cls, conversation_id, fsm_def_id, current_state: dict, initial_conversation_metadata: dict):
+        instance = cls.objects.filter(conversation_id=conversation_id).first()
         if instance:
-            instance.current_state = fsm.current_state._asdict()
+            instance.current_state = current_state
         else:
             instance = cls(
-                conversation=fsm.ctx.conversation,
-                current_state=fsm.current_state._asdict(),
-                fsm_def=fsm.ctx.fsm_def,
-                initial_conversation_metadata=fsm.initial_conversation_metadata
+                conversation_id=conversation_id,
+                current_state=current_state,
+                fsm_def_id=fsm_def_id,
+                initial_conversation_metadata=initial_conversation_metadata
             )
         instance.save()
 
@@ -0,0 +1,217 @@
+import abc
+import asyncio
+import json
+import os
+import time
+from logging import getLogger
+from typing import TYPE_CHECKING, Union
+from weakref import WeakKeyDictionary
+
+from channels.db import database_sync_to_async
+from typefit import typefit
+
+from back.apps.fsm.lib import FSM, State
+
+if TYPE_CHECKING:
+    from back.common.abs.bot_consumers import BotConsumer
+
+logger = getLogger(__name__)
+
+
+class FSMStateStore(abc.ABC):
+    """
+    Stores the state of the FSM of every conversation between messages.
+    """
+
+    @abc.abstractmethod
+    async def save(self, fsm: FSM):
+        ...
+
+    @abc.abstractmethod
+    async def build_fsm(self, ctx: "BotConsumer") -> Union[FSM, None]:
+        """
+        Returns the FSM of the conversation of the context in its stored state, or None for a new conversation.
+        """
+
+    async def persist(self, conversation_id: int):
+        """
+        Makes the state of the conversation durable, called when the conversation ends.
+        """
+
+
+class DBStateStore(FSMStateStore):
+    """
+    Writes the state to its CachedFSM row on every transition.
+    """
+
+    async def save(self, fsm: FSM):
+        from back.apps.fsm.models import CachedFSM
+
+        await database_sync_to_async(CachedFSM.update_or_create)(fsm)
+
+    async def build_fsm(self, ctx: "BotConsumer") -> Union[FSM, None]:
+        from back.apps.fsm.models import CachedFSM
+
+        return await database_sync_to_async(CachedFSM.build_fsm)(ctx)
+
+
+class RedisStateStore(FSMStateStore):
+    """
+    Keeps the state in Redis with a TTL and writes it behind to its CachedFSM row when the conversation ends or has
+    been idle for persist_after seconds, so there are no DB writes on the per-message path.
+    The updated conversations are kept in a sorted set by update time, so the idle states of a process that crashed
+    are persisted by the others. If the state is missing from Redis (expired or lost) it is recovered from the last
+    persisted CachedFSM row.
+    """
+
+    STATE_KEY = "fsm_state:{}"
+    DIRTY_KEY = "fsm_state:dirty"
+
+    def __init__(self, redis_url: str, ttl: int = 24 * 60 * 60, persist_after: float = 60):
+        """
+        Parameters
+        ----------
+        redis_url : str
+            URL of the Redis server.
+        ttl : int, optional
+            Seconds a state is kept in Redis after its last update, by default one day.
+        persist_after : float, optional
+            Seconds without updates after which a state is persisted, by default 60.
+        """
+        assert persist_after < ttl, "The states must be persisted before they expire"
+        self.redis_url = redis_url
+        self.ttl = ttl
+        self.persist_after = persist_after
+        self._clients: "WeakKeyDictionary[asyncio.AbstractEventLoop, object]" = WeakKeyDictionary()
+        self._flush_handles: "WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.TimerHandle]" = WeakKeyDictionary()
+
+    @property
+    def client(self):
+        # redis.asyncio connections are bound to the loop that created them
+        import redis.asyncio as redis
+
+        loop = asyncio.get_running_loop()
+        if loop not in self._clients:
+            self._clients[loop] = redis.Redis.from_url(self.redis_url)
+        return self._clients[loop]
+
+    async def save(self, fsm: FSM):
+        conversation_id = fsm.ctx.conversation.pk
+        state = {
+            "current_state": fsm.current_state._asdict(),
+            "fsm_def_id": fsm.ctx.fsm_def.pk,
+            "initial_conversation_metadata": fsm.initial_conversation_metadata,
+        }
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.set(self.STATE_KEY.format(conversation_id), json.dumps(state), ex=self.ttl)
+                pipe.zadd(self.DIRTY_KEY, {conversation_id: time.time()})
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not save the FSM state of conversation {conversation_id} to Redis, saving it to the DB: {e}")
+            await DBStateStore().save(fsm)
+            await self._discard(conversation_id)
+            return
+
+        self._schedule_flush()
+
+    async def build_fsm(self, ctx: "BotConsumer") -> Union[FSM, None]:
+        from back.apps.fsm.models import FSMDefinition
+
+        try:
+            state = await self.client.get(self.STATE_KEY.format(ctx.conversation.pk))
+        except Exception as e:
+            logger.warning(f"Could not read the FSM state of conversation {ctx.conversation.pk} from Redis: {e}")
+            state = None
+
+        if state is None:
+            return await DBStateStore().build_fsm(ctx)
+
+        state = json.loads(state)
+        fsm_def = ctx.fsm_def
+        if fsm_def is None or fsm_def.pk != state["fsm_def_id"]:
+            fsm_def = await database_sync_to_async(FSMDefinition.objects.get)(pk=state["fsm_def_id"])
+        return fsm_def.build_fsm(
+            ctx, typefit(State, state["current_state"]), state["initial_conversation_metadata"]
+        )
+
+    async def persist(self, conversation_id: int):
+        # Only the process that removes the conversation from the dirty set writes it
+        if await self.client.zrem(self.DIRTY_KEY, conversation_id):
+            try:
+                await self._write_behind(conversation_id)
+            except Exception:
+                # Back to the dirty set as already idle, the next flush retries it
+                await self.client.zadd(self.DIRTY_KEY, {conversation_id: time.time() - self.persist_after}, nx=True)
+                raise
+
+    async def flush_idle(self):
+        """
+        Persists the states that haven't been updated for persist_after seconds.
+        """
+        idle_ids = await self.client.zrangebyscore(self.DIRTY_KEY, "-inf", time.time() - self.persist_after)
+        for conversation_id in idle_ids:
+            await self.persist(int(conversation_id))
+
+    async def _write_behind(self, conversation_id: int):
+        from back.apps.fsm.models import CachedFSM
+
+        state = await self.client.get(self.STATE_KEY.format(conversation_id))
+        if state is None:
+            return
+        state = json.loads(state)
+        await database_sync_to_async(CachedFSM.persist_state)(
+            conversation_id,
+            state["fsm_def_id"],
+            state["current_state"],
+            state["initial_conversation_metadata"],
+        )
+
+    async def _discard(self, conversation_id: int):
+        # The state in Redis is older than the one just saved to the DB, build_fsm would serve it before the DB one
+        try:
+            await self.client.delete(self.STATE_KEY.format(conversation_id))
+            await self.client.zrem(self.DIRTY_KEY, conversation_id)
+        except Exception as e:
+            logger.error(f"Could not discard the stale FSM state of conversation {conversation_id} from Redis", exc_info=e)
+
+    def _schedule_flush(self):
+        # One pending flush per process, it runs once the last saved state may be idle
+        loop = asyncio.get_running_loop()
+        handle = self._flush_handles.get(loop)
+        if handle is not None and handle.when() > loop.time():
+            return
+        self._flush_handles[loop] = loop.call_later(
+            self.persist_after, lambda: loop.create_task(self._flush_and_reschedule())
+        )
+
+    async def _flush_and_reschedule(self):
+        try:
+            await self.flush_idle()
+            # The states updated since the flush was scheduled are not idle yet
+            if await self.client.zcard(self.DIRTY_KEY):
+                self._schedule_flush()
+        except Exception as e:
+            logger.error("Error persisting the idle FSM states", exc_info=e)
+
+
+_state_store: Union[FSMStateStore, None] = None
+
+
+def get_fsm_state_store() -> FSMStateStore:
+    """
+    Returns the state store configured with FSM_STATE_STORE ('redis' or 'db'), by default Redis if REDIS_URL is set.
+    """
+    global _state_store
+    if _state_store is None:
+        redis_url = os.environ.get("REDIS_URL")
+        store_type = os.environ.get("FSM_STATE_STORE", "redis" if redis_url else "db")
+        if store_type == "redis" and redis_url:
+            _state_store = RedisStateStore(
+                redis_url,
+                ttl=int(os.environ.get("FSM_STATE_TTL", 24 * 60 * 60)),
+                persist_after=float(os.environ.get("FSM_STATE_PERSIST_AFTER", 60)),
+            )
+        else:
+            _state_store = DBStateStore()
+    return _state_store
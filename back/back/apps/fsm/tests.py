@@ -0,0 +1,284 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, PropertyMock, patch
+
+from django.test import SimpleTestCase
+
+from back.apps.fsm.lib import FSM, State, Transition
+from back.apps.fsm.state_store import DBStateStore, FSMStateStore, RedisStateStore
+from back.common.abs.bot_consumers.http import HTTPBotConsumer
+from back.common.abs.bot_consumers.ws import WSBotConsumer
+
+
+class FakeRedis:
+    """
+    In-memory stand-in of the redis.asyncio client with the commands used by RedisStateStore.
+    """
+
+    def __init__(self, fail_pipeline=False):
+        self.values = {}
+        self.sorted_sets = {}
+        self.fail_pipeline = fail_pipeline
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    async def delete(self, key):
+        self.values.pop(key, None)
+
+    async def zadd(self, key, mapping, nx=False):
+        members = self.sorted_sets.setdefault(key, {})
+        for member, score in mapping.items():
+            if not nx or str(member) not in members:
+                members[str(member)] = score
+
+    async def zrem(self, key, member):
+        return int(self.sorted_sets.get(key, {}).pop(str(member), None) is not None)
+
+    async def zrangebyscore(self, key, min_score, max_score):
+        return [member for member, score in self.sorted_sets.get(key, {}).items() if score <= max_score]
+
+    async def zcard(self, key):
+        return len(self.sorted_sets.get(key, {}))
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def set(self, *args, **kwargs):
+        self.commands.append(self.redis.set(*args, **kwargs))
+
+    def zadd(self, *args, **kwargs):
+        self.commands.append(self.redis.zadd(*args, **kwargs))
+
+    async def execute(self):
+        if self.redis.fail_pipeline:
+            for command in self.commands:
+                command.close()
+            raise ConnectionError("Connection reset by peer")
+        for command in self.commands:
+            await command
+
+
+def make_fsm(conversation_id=1, state_name="greeting"):
+    return SimpleNamespace(
+        ctx=SimpleNamespace(conversation=SimpleNamespace(pk=conversation_id), fsm_def=SimpleNamespace(pk=2)),
+        current_state=SimpleNamespace(_asdict=lambda: {"name": state_name}),
+        initial_conversation_metadata={},
+    )
+
+
+class RedisStateStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.store = RedisStateStore("redis://localhost", ttl=60, persist_after=10)
+        patcher = patch.object(RedisStateStore, "client", new_callable=PropertyMock, return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store._schedule_flush = MagicMock()
+
+    def test_state_store_is_abstract(self):
+        with self.assertRaises(TypeError):
+            FSMStateStore()
+
+    async def test_save_keeps_the_state_in_redis(self):
+        with patch.object(DBStateStore, "save", new_callable=AsyncMock) as db_save:
+            await self.store.save(make_fsm())
+
+        db_save.assert_not_awaited()
+        self.assertEqual(json.loads(self.redis.values["fsm_state:1"])["current_state"], {"name": "greeting"})
+        self.assertIn("1", self.redis.sorted_sets[RedisStateStore.DIRTY_KEY])
+
+    async def test_save_fallback_to_the_db_discards_the_stale_redis_state(self):
+        await self.store.save(make_fsm(state_name="greeting"))
+        self.redis.fail_pipeline = True
+
+        fsm = make_fsm(state_name="answering")
+        with patch.object(DBStateStore, "save", new_callable=AsyncMock) as db_save, patch.object(
+            DBStateStore, "build_fsm", new_callable=AsyncMock, return_value="db fsm"
+        ) as db_build_fsm:
+            await self.store.save(fsm)
+            db_save.assert_awaited_once_with(fsm)
+
+            # The next connection gets the state saved to the DB instead of the older one in Redis
+            ctx = SimpleNamespace(conversation=SimpleNamespace(pk=1))
+            self.assertEqual(await self.store.build_fsm(ctx), "db fsm")
+            db_build_fsm.assert_awaited_once_with(ctx)
+
+        self.assertNotIn("fsm_state:1", self.redis.values)
+        self.assertNotIn("1", self.redis.sorted_sets[RedisStateStore.DIRTY_KEY])
+
+    async def test_persist_writes_the_state_once(self):
+        await self.store.save(make_fsm())
+
+        with patch("back.apps.fsm.models.CachedFSM.persist_state") as persist_state:
+            await self.store.persist(1)
+            await self.store.persist(1)
+
+        persist_state.assert_called_once_with(1, 2, {"name": "greeting"}, {})
+        self.assertEqual(self.redis.sorted_sets[RedisStateStore.DIRTY_KEY], {})
+
+
+class WSBotConsumerDisconnectTests(SimpleTestCase):
+    def make_consumer(self):
+        consumer = WSBotConsumer.__new__(WSBotConsumer)
+        consumer.conversation = SimpleNamespace(pk=1)
+        consumer.channel_layer = AsyncMock()
+        consumer.channel_name = "channel"
+        consumer.get_group_name = lambda: "group"
+        return consumer
+
+    async def test_disconnect_persists_the_state(self):
+        consumer = self.make_consumer()
+        consumer.fsm = make_fsm()
+        store = MagicMock(persist=AsyncMock())
+
+        with patch("back.common.abs.bot_consumers.ws.get_fsm_state_store", return_value=store):
+            await consumer.disconnect(1000)
+
+        store.persist.assert_awaited_once_with(1)
+
+    async def test_disconnect_survives_a_persist_error(self):
+        consumer = self.make_consumer()
+        consumer.fsm = make_fsm()
+        store = MagicMock(persist=AsyncMock(side_effect=ConnectionError("Connection reset by peer")))
+
+        with patch("back.common.abs.bot_consumers.ws.get_fsm_state_store", return_value=store):
+            await consumer.disconnect(1000)
+
+        store.persist.assert_awaited_once_with(1)
+
+
+class HTTPBotConsumerPersistTests(SimpleTestCase):
+    def make_consumer(self):
+        consumer = HTTPBotConsumer.__new__(HTTPBotConsumer)
+        consumer.conversation = SimpleNamespace(pk=1)
+        consumer.serializer_class = MagicMock(return_value=MagicMock(validated_data={}))
+        consumer.set_conversation = AsyncMock()
+        consumer.gather_conversation_id = MagicMock()
+        consumer.gather_fsm_def = AsyncMock()
+        consumer.gather_user_id = AsyncMock()
+        consumer.resolve_fsm = AsyncMock()
+        consumer.send_headers = AsyncMock()
+        consumer.send_body = AsyncMock()
+        consumer.channel_layer = AsyncMock()
+        consumer.channel_name = "channel"
+        consumer.get_group_name = lambda: "group"
+        return consumer
+
+    async def handle(self, consumer, store):
+        with patch(
+            "back.common.abs.bot_consumers.http.database_sync_to_async", lambda func: AsyncMock(side_effect=func)
+        ), patch("back.common.abs.bot_consumers.http.get_fsm_state_store", return_value=store):
+            await consumer.handle(json.dumps({"message": "hi"}).encode("utf-8"))
+
+    async def test_request_persists_the_state_after_the_response(self):
+        consumer = self.make_consumer()
+        calls = []
+        consumer.send_body.side_effect = lambda body, more_body=False: calls.append("response")
+        store = MagicMock(persist=AsyncMock(side_effect=lambda conversation_id: calls.append("persist")))
+
+        await self.handle(consumer, store)
+
+        consumer.resolve_fsm.assert_awaited_once()
+        store.persist.assert_awaited_once_with(1)
+        self.assertEqual(calls, ["response", "persist"])
+
+    async def test_request_survives_a_persist_error(self):
+        consumer = self.make_consumer()
+        store = MagicMock(persist=AsyncMock(side_effect=ConnectionError("Connection reset by peer")))
+
+        await self.handle(consumer, store)
+
+        consumer.send_body.assert_awaited_once_with(b'{"ok": "POST request processed"}', more_body=False)
+        store.persist.assert_awaited_once_with(1)
+
+
+class FSMConditionsTests(SimpleTestCase):
+    def make_fsm(self, transitions):
+        states = [State(name="start", initial=True), State(name="first"), State(name="second")]
+        self.last_msg = SimpleNamespace(pk=1)
+        ctx = MagicMock(serialize=AsyncMock(return_value={"conv_mml": []}))
+        ctx.conversation.get_last_msg = lambda: self.last_msg
+        fsm = FSM(ctx, states, transitions)
+        fsm.run_current_state_events = AsyncMock()
+        fsm.save_cache = AsyncMock()
+        return fsm
+
+    async def test_tie_goes_to_the_first_declared_transition(self):
+        fsm = self.make_fsm([
+            Transition(source="start", dest="first", conditions=["is_first"]),
+            Transition(source="start", dest="second", conditions=["is_second"]),
+        ])
+        fsm.run_condition = AsyncMock(return_value=(0.8, {}))
+
+        await fsm.next_state()
+
+        self.assertEqual(fsm.current_state.name, "first")
+
+    async def test_condition_results_are_cached_per_last_message(self):
+        fsm = self.make_fsm([
+            Transition(source="start", dest="first", conditions=["is_first"]),
+            Transition(source="start", dest="second", conditions=["is_first"], unless=["is_second"]),
+        ])
+        fsm.run_condition = AsyncMock(return_value=(0.5, {}))
+        transitions = list(fsm.get_current_state_transitions())
+
+        await fsm.run_conditions(transitions)
+        await fsm.run_conditions(transitions)
+        self.assertEqual(fsm.run_condition.await_count, 2)
+
+        self.last_msg = SimpleNamespace(pk=2)
+        await fsm.run_conditions(transitions)
+        self.assertEqual(fsm.run_condition.await_count, 4)
+
+    async def test_timed_out_condition_is_not_taken_nor_cached(self):
+        fsm = self.make_fsm([
+            Transition(source="start", dest="first", conditions=["slow"]),
+            Transition(source="start", dest="second", conditions=["fast"]),
+        ])
+
+        async def group_send(group_name, data):
+            payload = data["payload"]
+            if payload["name"] == "fast":
+                await fsm.manage_rpc_response({
+                    "node_type": "condition",
+                    "ctx": {"rpc_call_id": payload["ctx"]["rpc_call_id"]},
+                    "stack": {"score": 0.5, "data": {}},
+                })
+
+        with patch("back.apps.fsm.lib.CONDITION_TIMEOUT", 0.01), patch.object(
+            FSM, "channel_layer", MagicMock(group_send=AsyncMock(side_effect=group_send))
+        ), patch(
+            "back.apps.fsm.lib.ConsumerRoundRobinQueue.get_next_consumer_group_name", return_value="group"
+        ):
+            transitions = list(fsm.get_current_state_transitions())
+            results = await fsm.run_conditions(transitions)
+            self.assertEqual(results, {"slow": None, "fast": (0.5, {})})
+            self.assertEqual(fsm.condition_futures, {})
+            self.assertNotIn("slow", fsm.condition_results)
+
+            await fsm.next_state()
+
+        self.assertEqual(fsm.current_state.name, "second")
+
+    async def test_condition_result_without_rpc_call_id_is_ignored(self):
+        fsm = self.make_fsm([])
+
+        await fsm.manage_rpc_response({"node_type": "condition", "ctx": {}, "stack": {"score": 1, "data": {}}})
+
+        self.assertIsNone(fsm.rpc_result_future)
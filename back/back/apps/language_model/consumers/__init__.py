@@ -1,11 +1,15 @@
 import json
+import os
 import uuid
+from collections import OrderedDict
 from logging import getLogger
-from typing import Dict, List
+from threading import Lock
+from typing import Dict, List, Tuple
 
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from django.contrib.auth.models import AnonymousUser
+from django.db.models import Count
 from ray.serve import get_deployment_handle
 
 from back.apps.broker.consumers.message_types import RPCMessageType
@@ -18,6 +22,7 @@ from back.apps.broker.serializers.rpc import (
 )
 from back.apps.language_model.models import (
     KnowledgeItem,
+    KnowledgeItemImage,
     LLMConfig,
     RetrieverConfig,
     PromptConfig,
@@ -27,6 +32,12 @@ from back.utils.custom_channels import CustomAsyncConsumer
 
 logger = getLogger(__name__)
 
+KNOWLEDGE_ITEM_CACHE_SIZE = int(os.environ.get("KNOWLEDGE_ITEM_CACHE_SIZE", 10000))
+
+# Process-local cache of the retrieve contexts of the knowledge items by id, along with the version they were read at
+_knowledge_item_cache: "OrderedDict[int, Tuple[Tuple, Dict]]" = OrderedDict()
+_knowledge_item_cache_lock = Lock()
+
 
 def format_msgs_chain_to_llm_context(msgs_chain) -> List[Dict[str, str]]:
     """
@@ -60,18 +71,60 @@ def format_msgs_chain_to_llm_context(msgs_chain) -> List[Dict[str, str]]:
     return messages
 
 
+def get_retrieve_contexts(knowledge_item_ids: List[int]) -> Dict[int, Dict]:
+    """
+    Returns the retrieve context of the knowledge items by id, the deleted ones are missing.
+    The contexts are cached per process and versioned by the updated date and number of images of the item, so a
+    response takes one query to check the versions plus, only for the new or modified items, one query for the items
+    and one for their images. The image urls are signed on every call as they may expire.
+    """
+    versions = {
+        pk: (updated_date, n_images)
+        for pk, updated_date, n_images in KnowledgeItem.objects.filter(pk__in=knowledge_item_ids)
+        .annotate(n_images=Count("knowledgeitemimage"))
+        .values_list("pk", "updated_date", "n_images")
+    }
+
+    contexts = {}
+    with _knowledge_item_cache_lock:
+        for pk, version in versions.items():
+            cached = _knowledge_item_cache.get(pk)
+            if cached is not None and cached[0] == version:
+                _knowledge_item_cache.move_to_end(pk)
+                contexts[pk] = cached[1]
+
+    missing_ids = [pk for pk in versions if pk not in contexts]
+    if missing_ids:
+        k_items = KnowledgeItem.objects.filter(pk__in=missing_ids).prefetch_related("knowledgeitemimage_set")
+        with _knowledge_item_cache_lock:
+            for k_item in k_items:
+                context = k_item.to_retrieve_context()
+                context["image_urls"] = [image.image_file.name for image in k_item.knowledgeitemimage_set.all()]
+                contexts[k_item.pk] = context
+                _knowledge_item_cache[k_item.pk] = (versions[k_item.pk], context)
+            while len(_knowledge_item_cache) > KNOWLEDGE_ITEM_CACHE_SIZE:
+                _knowledge_item_cache.popitem(last=False)
+
+    storage = KnowledgeItemImage._meta.get_field("image_file").storage
+    return {
+        pk: {**context, "image_urls": {name: storage.url(name) for name in context["image_urls"]}}
+        for pk, context in contexts.items()
+    }
+
+
 async def resolve_references(reference_kis, retriever_config):
     # ColBERT only returns the k item id, similarity and content, so we need to get the full k item fields
     # We also adapt the pgvector retriever to match colbert's output
 
-    for index, ki in enumerate(reference_kis):
-        ki_item = await database_sync_to_async(
-            KnowledgeItem.objects.prefetch_related("knowledgeitemimage_set").get
-        )(pk=ki["k_item_id"])
-        reference_kis[index] = {
-            **ki_item.to_retrieve_context(),
+    contexts = await database_sync_to_async(get_retrieve_contexts)([ki["k_item_id"] for ki in reference_kis])
+    reference_kis = [
+        {
+            **contexts[ki["k_item_id"]],
             "similarity": ki["similarity"],
         }
+        for ki in reference_kis
+        if ki["k_item_id"] in contexts
+    ]
 
     logger.info(f"References:\n{reference_kis}")
     # All images of the conversation so far
@@ -94,7 +147,7 @@ async def resolve_references(reference_kis, retriever_config):
     #     await database_sync_to_async(MessageKnowledgeItem.objects.bulk_create)(msgs2kis)
 
     return {
-        "knowledge_base_id": await database_sync_to_async(lambda: retriever_config.knowledge_base.pk)(),
+        "knowledge_base_id": retriever_config.knowledge_base_id,
         "knowledge_items": reference_kis,
         "knowledge_item_images": reference_ki_images,
     }
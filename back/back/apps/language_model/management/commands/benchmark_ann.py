@@ -0,0 +1,86 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+
+# ./manage.py benchmark_ann --rows 100000 1000000
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the HNSW index against the exact scan of pgvector on random embeddings in a temporary table, "
+        "with the same partial index over the cast embeddings that RetrieverConfig.create_ann_index builds"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+        parser.add_argument("--dimensions", type=int, default=768)
+        parser.add_argument("--queries", type=int, default=50)
+        parser.add_argument("--top-k", type=int, default=5)
+        parser.add_argument("--ef-search", type=int, nargs="+", default=[40, 100])
+
+    def handle(self, *args, **options):
+        dimensions = options["dimensions"]
+        top_k = options["top_k"]
+        queries = [
+            "[" + ",".join(str(random.uniform(-1, 1)) for _ in range(dimensions)) + "]"
+            for _ in range(options["queries"])
+        ]
+
+        for rows in options["rows"]:
+            with connection.cursor() as cursor:
+                cursor.execute("DROP TABLE IF EXISTS benchmark_ann")
+                cursor.execute(
+                    "CREATE TEMPORARY TABLE benchmark_ann "
+                    "(id serial PRIMARY KEY, retriever_config_id integer, embedding vector)"
+                )
+                start = time.perf_counter()
+                for offset in range(0, rows, 100_000):
+                    cursor.execute(
+                        "INSERT INTO benchmark_ann (retriever_config_id, embedding) "
+                        "SELECT 1, (SELECT array_agg(random() * 2 - 1) FROM generate_series(1, %s) WHERE g.i > 0)::real[]::vector "
+                        "FROM generate_series(1, %s) AS g(i)",
+                        [dimensions, min(100_000, rows - offset)],
+                    )
+                cursor.execute("ANALYZE benchmark_ann")
+                self.stdout.write(f"{rows} rows of {dimensions} dimensions inserted in {time.perf_counter() - start:.1f}s")
+
+                exact_results, exact_time = self._search(cursor, "embedding", "%s::vector", queries, top_k)
+                self.stdout.write(f"  exact scan: {exact_time * 1000:.1f}ms/query")
+
+                start = time.perf_counter()
+                cursor.execute(
+                    f"CREATE INDEX ON benchmark_ann USING hnsw ((embedding::vector({dimensions})) vector_ip_ops) "
+                    f"WHERE retriever_config_id = 1"
+                )
+                self.stdout.write(f"  HNSW index built in {time.perf_counter() - start:.1f}s")
+
+                for ef_search in options["ef_search"]:
+                    with transaction.atomic():
+                        cursor.execute("SELECT set_config('hnsw.ef_search', %s, true)", [str(ef_search)])
+                        results, hnsw_time = self._search(
+                            cursor, f"embedding::vector({dimensions})", f"%s::vector({dimensions})", queries, top_k
+                        )
+                    recall = sum(
+                        len(set(result) & set(exact_result)) for result, exact_result in zip(results, exact_results)
+                    ) / (top_k * len(queries))
+                    self.stdout.write(
+                        f"  HNSW ef_search={ef_search}: {hnsw_time * 1000:.1f}ms/query, recall@{top_k}={recall:.3f}, "
+                        f"{exact_time / hnsw_time:.1f}x faster"
+                    )
+
+                cursor.execute("DROP TABLE benchmark_ann")
+
+    @staticmethod
+    def _search(cursor, embedding_expression, query_expression, queries, top_k):
+        results = []
+        start = time.perf_counter()
+        for query in queries:
+            cursor.execute(
+                f"SELECT id FROM benchmark_ann WHERE retriever_config_id = 1 "
+                f"ORDER BY {embedding_expression} <#> {query_expression} LIMIT %s",
+                [query, top_k],
+            )
+            results.append([row[0] for row in cursor.fetchall()])
+        return results, (time.perf_counter() - start) / len(queries)
@@ -0,0 +1,65 @@
+from logging import getLogger
+
+from django.db import DatabaseError, migrations
+
+logger = getLogger(__name__)
+
+
+def create_hnsw_indexes(apps, schema_editor):
+    """
+    Creates a partial HNSW index (inner product) per retriever config over its embeddings, new retriever configs
+    get theirs from RetrieverConfig.create_ann_index after indexing.
+    The indexes are built CONCURRENTLY so the embeddings table is not locked for writes during the builds.
+    """
+    RetrieverConfig = apps.get_model("language_model", "RetrieverConfig")
+    Embedding = apps.get_model("language_model", "Embedding")
+    table = Embedding._meta.db_table
+
+    for retriever_config_id in RetrieverConfig.objects.values_list("id", flat=True):
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT vector_dims(embedding) FROM {table} WHERE retriever_config_id = %s AND embedding IS NOT NULL LIMIT 1",
+                [retriever_config_id],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            continue
+
+        index_name = f"{table}_hnsw_{int(retriever_config_id)}"
+        with schema_editor.connection.cursor() as cursor:
+            try:
+                cursor.execute(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} ON {table} "
+                    f"USING hnsw ((embedding::vector({int(row[0])})) vector_ip_ops) "
+                    f"WHERE retriever_config_id = {int(retriever_config_id)}"
+                )
+            except DatabaseError as e:  # e.g. pgvector < 0.5.0
+                logger.warning(f"Could not create the HNSW index of retriever config {retriever_config_id}: {e}")
+                # A failed concurrent build leaves an invalid index behind
+                cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+
+
+def drop_hnsw_indexes(apps, schema_editor):
+    RetrieverConfig = apps.get_model("language_model", "RetrieverConfig")
+    Embedding = apps.get_model("language_model", "Embedding")
+    table = Embedding._meta.db_table
+
+    with schema_editor.connection.cursor() as cursor:
+        for retriever_config_id in RetrieverConfig.objects.values_list("id", flat=True):
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {table}_hnsw_{int(retriever_config_id)}")
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        (
+            "language_model",
+            "0062_historicalretrieverconfig_historicalllmconfig_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.RunPython(create_hnsw_indexes, drop_hnsw_indexes),
+    ]
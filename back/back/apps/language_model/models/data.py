@@ -5,7 +5,7 @@ from uuid import uuid4
 import base64
 import os
 
-from django.db import models
+from django.db import models, transaction
 from django.apps import apps
 from django.core.files.base import ContentFile
 
@@ -13,6 +13,7 @@ from back.apps.language_model.models.enums import LanguageChoices, StrategyChoic
 from back.apps.broker.models import RemoteSDKParsers
 from back.apps.language_model.models.tasks import RayTaskState
 from back.apps.language_model.tasks import (
+    invalidate_rerank_scores_task,
     parse_pdf_task,
     parse_url_task,
 )
@@ -28,6 +29,31 @@ from back.config.storage_backends import select_private_storage
 
 logger = getLogger(__name__)
 
+def mark_retriever_configs_outdated(knowledge_base):
+    """
+    Sets the index status of the retriever configs of the knowledge base to outdated, call it once per batch of
+    new or modified knowledge items instead of once per item.
+    """
+    retriever_configs = apps.get_model("language_model", "RetrieverConfig").objects.filter(
+        knowledge_base=knowledge_base
+    )
+    for retriever_config in retriever_configs:
+        retriever_config.index_status = IndexStatusChoices.OUTDATED
+        retriever_config.save()
+
+
+def get_near_duplicate_filter():
+    """
+    Returns a chat_rag NearDuplicateFilter with the threshold of KNOWLEDGE_ITEMS_DEDUP_THRESHOLD, or None if
+    deduplication is not enabled (no threshold or <= 0). Only call it where chat_rag is installed (Ray tasks).
+    """
+    threshold = float(os.environ.get("KNOWLEDGE_ITEMS_DEDUP_THRESHOLD") or 0)
+    if threshold <= 0:
+        return None
+    from chat_rag.data.dedup import NearDuplicateFilter
+
+    return NearDuplicateFilter(threshold=threshold)
+
 
 class KnowledgeBase(ChangesMixin):
     """
@@ -265,22 +291,16 @@ class KnowledgeItem(ChangesMixin):
 
     def save(self, *args, **kwargs):
 
-        # get the retriever configs to which this knowledge base belongs
-        retriever_configs = apps.get_model("language_model", "RetrieverConfig").objects.filter(
-            knowledge_base=self.knowledge_base
-        )
-
         # set the retriever config index status to outdated
         if self.pk is None: # new item
-            for retriever_config in retriever_configs:
-                retriever_config.index_status = IndexStatusChoices.OUTDATED
-                retriever_config.save()
+            mark_retriever_configs_outdated(self.knowledge_base)
         else: # modified item
             old_item = KnowledgeItem.objects.get(pk=self.pk)
             if self.content != old_item.content:
-                for retriever_config in retriever_configs:
-                    retriever_config.index_status = IndexStatusChoices.OUTDATED
-                    retriever_config.save()
+                mark_retriever_configs_outdated(self.knowledge_base)
+                # Once committed, otherwise a concurrent rerank could cache the score of the old content again
+                pk = self.pk
+                transaction.on_commit(lambda: invalidate_rerank_scores_task.remote([pk]))
 
         super().save(*args, **kwargs)
 
@@ -359,7 +379,11 @@ class KnowledgeItemImage(models.Model):
     def __str__(self):
         return f"Image for {self.knowledge_item.pk} with caption {self.image_caption} and path {self.image_file.name}"
 
-    def save(self, *args, **kwargs):
+    def store_base64_image(self):
+        """
+        Uploads the base64 image passed to the constructor to the storage and sets image_file, without touching the DB.
+        It allows to know the image file name before the knowledge item is inserted, e.g. to bulk create them.
+        """
         if self._base64_image:
             # Check if there's a data URI scheme and split it off if present
             if ";" in self._base64_image and "base64," in self._base64_image:
@@ -373,7 +397,10 @@ class KnowledgeItemImage(models.Model):
 
             # Save the image file
             self.image_file.save(name=data.name, content=data, save=False)
+            self._base64_image = None
 
+    def save(self, *args, **kwargs):
+        self.store_base64_image()
         super(KnowledgeItemImage, self).save(*args, **kwargs)
 
 
@@ -1,7 +1,8 @@
+import os
 import uuid
 
-from django.db import models, transaction
-from pgvector.django import MaxInnerProduct
+from django.db import DatabaseError, connection, models, transaction
+from pgvector.django import VectorField
 
 from simple_history.models import HistoricalRecords
 
@@ -11,7 +12,7 @@ from back.apps.language_model.models.enums import (
     RetrieverTypeChoices,
     LLMChoices,
 )
-from back.apps.language_model.models.data import KnowledgeBase, KnowledgeItem
+from back.apps.language_model.models.data import Embedding, KnowledgeBase, KnowledgeItem
 from back.common.models import ChangesMixin
 
 from back.apps.language_model.tasks import index_task
@@ -26,6 +27,9 @@ from logging import getLogger
 
 logger = getLogger(__name__)
 
+# Maximum hnsw.ef_search of pgvector
+HNSW_MAX_EF_SEARCH = 1000
+
 
 class EnabledRetrieverConfigManager(models.Manager):
     def get_queryset(self):
@@ -156,6 +160,8 @@ class RetrieverConfig(ChangesMixin):
             ):
                 redeploy_retriever = True
                 self.index_status = IndexStatusChoices.NO_INDEX
+                # the new model may have another embedding dimension, the index is created again after reindexing
+                self.drop_ann_index()
 
             if (
                 self.batch_size != old_retriever.batch_size
@@ -195,6 +201,59 @@ class RetrieverConfig(ChangesMixin):
 
             transaction.on_commit(on_commit_callback)
 
+    def get_ann_index_name(self):
+        return f"{Embedding._meta.db_table}_hnsw_{self.pk}"
+
+    def create_ann_index(self):
+        """
+        Creates the HNSW index (inner product) of the embeddings of this retriever config, a partial index on its
+        retriever_config_id over the embeddings cast to their dimension, which pgvector needs to build the index.
+        Once created, pgvector keeps it up to date with the new embeddings.
+        The index is built CONCURRENTLY so the embeddings table is not locked for writes during the build, which
+        can't run inside a transaction, so within one it is deferred until the commit.
+        """
+        if connection.in_atomic_block:
+            transaction.on_commit(self.create_ann_index)
+            return
+
+        table = Embedding._meta.db_table
+        index_name = self.get_ann_index_name()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT vector_dims(embedding) FROM {table} WHERE retriever_config_id = %s AND embedding IS NOT NULL LIMIT 1",
+                [self.pk],
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return
+
+            # A failed concurrent build leaves an invalid index behind, which IF NOT EXISTS would keep forever
+            cursor.execute(
+                "SELECT i.indisvalid FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid WHERE c.relname = %s",
+                [index_name],
+            )
+            index = cursor.fetchone()
+            if index is not None and index[0]:
+                return
+            if index is not None:
+                cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+
+            dimensions = int(row[0])
+            logger.info(f"Creating the HNSW index {index_name} of {dimensions} dimensions")
+            try:
+                cursor.execute(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} ON {table} "
+                    f"USING hnsw ((embedding::vector({dimensions})) vector_ip_ops) "
+                    f"WHERE retriever_config_id = {int(self.pk)}"
+                )
+            except DatabaseError as e:  # e.g. pgvector < 0.5.0, the retrieval still works with a sequential scan
+                logger.warning(f"Could not create the HNSW index {index_name}: {e}")
+                cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+
+    def drop_ann_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP INDEX IF EXISTS {self.get_ann_index_name()}")
+
     def retrieve_kitems(self, query_embedding, threshold, top_k):
         """
         Returns the context for the given query_embedding.
@@ -207,27 +266,73 @@ class RetrieverConfig(ChangesMixin):
         top_k : int
             Number of context to be returned. If -1, all context are returned.
         """
-        items_for_query = (
-            KnowledgeItem.objects.filter(embedding__retriever_config=self)
-            .annotate(
-                similarity=-MaxInnerProduct("embedding__embedding", query_embedding)
+        return self.retrieve_kitems_batch([query_embedding], threshold, top_k)[0]
+
+    def retrieve_kitems_batch(self, query_embeddings, threshold, top_k):
+        """
+        Returns the context for every query embedding with a single query, each query embedding is searched in a
+        LATERAL subquery that can use the HNSW index of this retriever config. The index returns at most
+        hnsw.ef_search (up to 1000) rows, so when all the context or more than that is requested the search is exact.
+        Parameters
+        ----------
+        query_embeddings : List[torch.Tensor, np.ndarray or list]
+            Query embeddings to be used for retrieval.
+        threshold : float
+            Threshold for filtering the context.
+        top_k : int
+            Number of context to be returned per query embedding. If -1, all context are returned.
+        """
+        if len(query_embeddings) == 0:
+            return []
+
+        vector_field = VectorField()
+        query_embeddings = [vector_field.get_prep_value(query_embedding) for query_embedding in query_embeddings]
+        limit = None if top_k == -1 else top_k  # LIMIT NULL returns all the rows
+        # The HNSW index returns at most ef_search candidates, so it must be at least top_k
+        ef_search = max(int(os.environ.get("PGVECTOR_HNSW_EF_SEARCH", 40)), limit or 0)
+        exact = limit is None or ef_search > HNSW_MAX_EF_SEARCH
+
+        if exact:
+            # Without the cast the planner can't use the index and scans all the embeddings
+            embedding_expression = "emb.embedding"
+            query_expression = "q.embedding::vector"
+        else:
+            # The query must use the same expression as the index
+            dimensions = len(vector_field.to_python(query_embeddings[0]))
+            embedding_expression = f"emb.embedding::vector({dimensions})"
+            query_expression = f"q.embedding::vector({dimensions})"
+
+        sql = f"""
+            SELECT q.ord, ki.id, ki.content, e.similarity
+            FROM unnest(%s::text[]) WITH ORDINALITY AS q(embedding, ord)
+            CROSS JOIN LATERAL (
+                SELECT emb.knowledge_item_id, -({embedding_expression} <#> {query_expression}) AS similarity
+                FROM {Embedding._meta.db_table} emb
+                WHERE emb.retriever_config_id = %s
+                ORDER BY {embedding_expression} <#> {query_expression}
+                LIMIT %s
+            ) e
+            JOIN {KnowledgeItem._meta.db_table} ki ON ki.id = e.knowledge_item_id
+            WHERE e.similarity > %s
+            ORDER BY q.ord, e.similarity DESC
+        """
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            if not exact:
+                cursor.execute("SELECT set_config('hnsw.ef_search', %s, true)", [str(ef_search)])
+            cursor.execute(sql, [query_embeddings, self.pk, limit, threshold])
+            rows = cursor.fetchall()
+
+        results = [[] for _ in query_embeddings]
+        for query_number, k_item_id, content, similarity in rows:
+            results[query_number - 1].append(
+                {
+                    "k_item_id": k_item_id,
+                    "content": content,
+                    "similarity": similarity,
+                }
             )
-            .filter(similarity__gt=threshold)
-            .order_by("-similarity")
-        )
-
-        if top_k != -1:
-            items_for_query = items_for_query[:top_k]
-
-        query_results = [
-            {
-                "k_item_id": item.id,
-                "content": item.content,
-                "similarity": item.similarity,
-            }
-            for item in items_for_query
-        ]
-        return query_results
+        return results
 
 
 class EnabledLLMConfigManager(models.Manager):
@@ -3,7 +3,6 @@ import os
 from typing import List
 from urllib.parse import urljoin
 
-from aiohttp import ClientSession
 import ray
 from ray import serve
 
@@ -23,54 +22,101 @@ class E5Deployment:
     """
 
     def __init__(self, model_name, use_cpu, retriever_id, lang='en'):
-        from chat_rag.embedding_models import E5Model
+        from chat_rag.embedding_models import E5Model, EmbeddingCache
         from chat_rag.utils.reranker import ReRanker
+        from chat_rag.utils.score_cache import RerankScoreCache
+        from back.apps.language_model.tasks import get_embedding_cache_path
 
         hf_key = os.environ.get('HUGGINGFACE_API_KEY')
         self.token = os.environ.get('BACKEND_TOKEN')
         self.retrieve_endpoint = urljoin(os.environ.get('BACKEND_HOST'), f"/back/api/language-model/retriever-configs/{retriever_id}/retrieve/")
-
-        self.model = E5Model(model_name=model_name, use_cpu=use_cpu, huggingface_key=hf_key)
-        self.reranker = ReRanker(lang=lang, device='cpu' if use_cpu else 'cuda')
+        # Query pgvector from the replica instead of posting the embeddings to the backend, which is kept as fallback
+        self.retriever_config = self.load_retriever_config(retriever_id) if os.environ.get('RETRIEVER_DIRECT_DB_LOOKUP', 'yes') == 'yes' else None
+
+        # Repeated queries skip the embedding model, the disk tier is shared with the indexing tasks if configured
+        self.embedding_cache = EmbeddingCache(path=get_embedding_cache_path())
+        self.model = E5Model(model_name=model_name, use_cpu=use_cpu, huggingface_key=hf_key, embedding_cache=self.embedding_cache,
+                             use_onnx=use_cpu and os.environ.get('RETRIEVER_USE_ONNX', 'no') == 'yes')
+        # Repeated questions over unchanged knowledge items reuse the cross-encoder scores, shared between replicas through Redis
+        self.score_cache = RerankScoreCache(redis_url=os.environ.get('REDIS_URL'))
+        self.reranker = ReRanker(lang=lang, device='cpu' if use_cpu else 'cuda', score_cache=self.score_cache)
         print(f"RetrieverDeployment initialized with model_name={model_name}, use_cpu={use_cpu}")
 
+    @staticmethod
+    def load_retriever_config(retriever_id):
+        """
+        Returns the retriever config used to query pgvector directly, or None if the database is not reachable from
+        this replica (e.g. Django is not set up in the worker), then the backend endpoint is used.
+        """
+        try:
+            from back.apps.language_model.models import RetrieverConfig
+
+            return RetrieverConfig.objects.get(pk=retriever_id)
+        except Exception as e:
+            print(f"Direct pgvector lookup not available, using the backend endpoint: {e}")
+            return None
+
     @serve.batch(max_batch_size=5, batch_wait_timeout_s=0.2)
     async def batch_handler(self, queries: List[str], top_ks: List[int]):
         """
         Batch handler for the retriever model. This method is called by Ray Serve when a batch of requests is received.
-        It creates the query embeddings, sends them to a pgvector backend endpoint for retrieval asynchronously and returns the results.
+        It creates the query embeddings, retrieves their knowledge items from pgvector and returns the reranked results.
         """
-        embeddings = self.model.build_embeddings(queries, prefix='query: ')
+        embeddings = [embedding.tolist() for embedding in self.model.build_embeddings(queries, prefix='query: ')]
 
-        async with ClientSession() as session:
-            tasks = []
-            headers = {'Authorization': f'Token {self.token}'}
-
-            for i, query_embedding in enumerate(embeddings):
-                query_embedding = query_embedding.tolist()
-                data = {
-                    'query_embeddings': [query_embedding],
-                    'top_k': top_ks[i]
-                }
-                task = self.post_request(session, data, headers)
-                tasks.append(task)
-
-            results_list = await asyncio.gather(*tasks)
+        results_list = None
+        if self.retriever_config is not None:
+            try:
+                results_list = await self.retrieve_from_db(embeddings, top_ks)
+            except Exception as e:
+                print(f"Direct pgvector lookup failed, falling back to the backend endpoint: {e}")
+        if results_list is None:
+            results_list = await self.retrieve_from_backend(embeddings, top_ks)
 
         results_reranked = self.rerank(queries, results_list)
         return results_reranked
 
-    def rerank(self, queries, results_list):
-        results_reranked = []
-        for query, results in zip(queries, results_list):
-            if not results:
-                results_reranked.append([])
-                continue
+    async def retrieve_from_db(self, embeddings, top_ks):
+        """
+        Retrieves the knowledge items of the whole batch with a single query over the replica's database connection.
+        """
+        from channels.db import database_sync_to_async
 
-            reranked_results = self.reranker(query, results, threshold=0.5)
+        # The query uses the largest top_k of the batch and every result is cut to its own top_k
+        top_k = -1 if -1 in top_ks else max(top_ks)
+        results_list = await database_sync_to_async(self.retriever_config.retrieve_kitems_batch)(embeddings, 0.0, top_k)
+        return [
+            results if query_top_k == -1 else results[:query_top_k]
+            for results, query_top_k in zip(results_list, top_ks)
+        ]
+
+    async def retrieve_from_backend(self, embeddings, top_ks):
+        """
+        Retrieves the knowledge items of every query from the backend retrieve endpoint.
+        """
+        from chat_rag.utils.http_clients import get_aiohttp_session
+
+        # The session is shared between batches and keeps the connections to the backend alive
+        session = get_aiohttp_session()
+        tasks = []
+        headers = {'Authorization': f'Token {self.token}'}
+
+        for i, query_embedding in enumerate(embeddings):
+            data = {
+                'query_embeddings': [query_embedding],
+                'top_k': top_ks[i]
+            }
+            task = self.post_request(session, data, headers)
+            tasks.append(task)
+
+        return await asyncio.gather(*tasks)
+
+    def rerank(self, queries, results_list):
+        # Rerank the results of the whole batch of queries in a single cross-encoder pass
+        results_reranked = self.reranker.rank_batch(queries, results_list, threshold=0.5)
+        for reranked_results in results_reranked:
             for result in reranked_results:
                 result['score'] = result['score'].item() # convert scores from np.float32 to float
-            results_reranked.append(reranked_results)
 
         return results_reranked
 
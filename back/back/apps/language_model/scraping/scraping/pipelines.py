@@ -1,27 +1,82 @@
 # -*- coding: utf-8 -*-
-from back.apps.language_model.models.data import DataSource, KnowledgeItem
+import os
+from logging import getLogger
+
+from back.apps.language_model.models.data import (
+    DataSource,
+    KnowledgeItem,
+    get_near_duplicate_filter,
+    mark_retriever_configs_outdated,
+)
 from channels.db import database_sync_to_async
+from scrapy.utils.defer import deferred_from_coro
+from twisted.internet import task
 # Define your item pipelines here
 #
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
+logger = getLogger(__name__)
+
 
 class GenericPipeline(object):
+    """
+    Buffers the scraped items and writes them with bulk_create once the buffer reaches batch_size items, every
+    flush_interval seconds, and when the spider closes. The near-duplicates of the items already crawled
+    (navigation, footers...) are skipped.
+    """
     ds = None
 
+    def __init__(self):
+        self.batch_size = int(os.environ.get("SCRAPY_PIPELINE_BATCH_SIZE", 200))
+        self.flush_interval = float(os.environ.get("SCRAPY_PIPELINE_FLUSH_INTERVAL", 10))
+        self.buffer = []
+        # Flushes the buffer on time even when no items arrive, started with the spider
+        self.flush_loop = task.LoopingCall(lambda: deferred_from_coro(self.flush()))
+        self.near_duplicate_filter = get_near_duplicate_filter()
+
     async def process_item(self, item, spider):
         if not self.ds:
             self.ds = await database_sync_to_async(DataSource.objects.select_related('knowledge_base').get)(id=spider.data_source_id)
 
-        _item = await database_sync_to_async(KnowledgeItem.objects.create)(
-            data_source=self.ds,
-            knowledge_base=self.ds.knowledge_base,
-            title=item['title'],
-            content=item['content'],
-            # context=item['section'],
-            url=item['url'],
+        if self.near_duplicate_filter is not None and self.near_duplicate_filter.is_duplicate(f"{item['title'] or ''}\n{item['content']}"):
+            return item
+
+        self.buffer.append(
+            KnowledgeItem(
+                data_source=self.ds,
+                knowledge_base=self.ds.knowledge_base,
+                title=item['title'],
+                content=item['content'],
+                # context=item['section'],
+                url=item['url'],
+            )
         )
-        await database_sync_to_async(_item.save)()
+
+        if len(self.buffer) >= self.batch_size:
+            await self.flush()
 
         return item
+
+    def _bulk_create(self, items):
+        KnowledgeItem.objects.bulk_create(items)
+        # bulk_create skips KnowledgeItem.save, mark the retriever configs as outdated once per flush
+        mark_retriever_configs_outdated(self.ds.knowledge_base)
+
+    async def flush(self):
+        # Take the buffer before awaiting, the items processed meanwhile go to the next flush
+        items, self.buffer = self.buffer, []
+        if items:
+            await database_sync_to_async(self._bulk_create)(items)
+
+    def open_spider(self, spider):
+        self.flush_loop.start(self.flush_interval, now=False).addErrback(
+            lambda failure: logger.error("Error flushing the scraped items", exc_info=failure.value)
+        )
+
+    def close_spider(self, spider):
+        if self.flush_loop.running:
+            self.flush_loop.stop()
+        if self.near_duplicate_filter is not None:
+            logger.info(f"Knowledge items deduplication: {self.near_duplicate_filter.report()}")
+        return deferred_from_coro(self.flush())
@@ -29,14 +29,14 @@ USER_AGENT = None
 ROBOTSTXT_OBEY = False
 
 # Configure maximum concurrent requests performed by Scrapy (default: 16)
-#CONCURRENT_REQUESTS = 32
+CONCURRENT_REQUESTS = int(os.environ.get("SCRAPY_CONCURRENT_REQUESTS", 16))
 
 # Configure a delay for requests for the same website (default: 0)
 # See https://docs.scrapy.org/en/latest/topics/settings.html#download-delay
 # See also autothrottle settings and docs
 DOWNLOAD_DELAY = 0.1
 # The download delay setting will honor only one of:
-#CONCURRENT_REQUESTS_PER_DOMAIN = 16
+CONCURRENT_REQUESTS_PER_DOMAIN = int(os.environ.get("SCRAPY_CONCURRENT_REQUESTS_PER_DOMAIN", 8))
 #CONCURRENT_REQUESTS_PER_IP = 16
 
 # Disable cookies (enabled by default)
@@ -1,19 +1,55 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import scrapy
+from twisted.internet import defer, reactor
 from urllib.parse import urlparse
 
 from back.apps.language_model.scraping.scraping.items import CustomItemLoader, GenericItem
 from back.apps.language_model.models.data import DataSource
 
+# Splitter of the parse worker process, built once per process by init_parse_worker instead of once per page
+_splitter = None
 
-def parse_html(html_text, splitter, chunk_size, chunk_overlap):
-    from chat_rag.data.parsers import parse_html as parse_html_method
+
+def init_parse_worker(splitter, chunk_size, chunk_overlap):
     from chat_rag.data.splitters import get_splitter
 
-    splitter = get_splitter(splitter, chunk_size, chunk_overlap)
+    global _splitter
+    _splitter = get_splitter(splitter, chunk_size, chunk_overlap)
+
+
+def parse_html(html_text):
+    """
+    Runs in the parse worker processes, returns plain dicts so the result is cheap to send back to the spider.
+    """
+    from chat_rag.data.parsers import parse_html as parse_html_method
+
+    k_items = parse_html_method(text=html_text, split_function=_splitter)
+
+    return [
+        {"content": k_item.content, "title": k_item.title, "page_number": k_item.page_number}
+        for k_item in k_items
+    ]
+
 
-    k_items = parse_html_method(text=html_text, split_function=splitter)
+def future_to_deferred(future):
+    """
+    Wraps a concurrent.futures.Future into a Deferred fired on the reactor thread, so the spider can await it.
+    """
+    deferred = defer.Deferred()
 
-    return k_items
+    def callback(future):
+        # exception() raises CancelledError for a cancelled future, which would be lost in the worker thread
+        if future.cancelled():
+            reactor.callFromThread(deferred.errback, defer.CancelledError())
+        elif future.exception() is not None:
+            reactor.callFromThread(deferred.errback, future.exception())
+        else:
+            reactor.callFromThread(deferred.callback, future.result())
+
+    future.add_done_callback(callback)
+    return deferred
 
 
 class GenericSpider(scrapy.Spider):
@@ -34,26 +70,42 @@ class GenericSpider(scrapy.Spider):
         self.chunk_overlap = ds.chunk_overlap
         self.recursive = ds.recursive
 
+        # The pages are parsed in a process pool off the reactor, every worker loads the splitter once for the crawl
+        parse_workers = int(os.environ.get("SCRAPY_PARSE_WORKERS", os.cpu_count() or 1))
+        self.parse_pool = ProcessPoolExecutor(
+            max_workers=parse_workers,
+            initializer=init_parse_worker,
+            initargs=(self.splitter, self.chunk_size, self.chunk_overlap),
+        )
+        # Backpressure: bound the pages waiting in the pool, the responses beyond it wait in the scraper
+        # which stops the downloads once its slot is full
+        self.parse_semaphore = defer.DeferredSemaphore(parse_workers * 2)
+
         super().__init__(*a, **kw)
 
     def start_requests(self):
         for url in self.start_urls:
             yield scrapy.Request(url, meta={"playwright": True})
 
-    def parse(self, response):
-        # Not the most efficient way
-        # TODO: try to launch multiple scrapy parse functions in parallel so that we can parse multiple pages at the same time
-        k_items = parse_html(response.text, self.splitter, self.chunk_size, self.chunk_overlap)
+    async def parse(self, response):
+        await self.parse_semaphore.acquire()
+        try:
+            k_items = await future_to_deferred(self.parse_pool.submit(parse_html, response.text))
+        finally:
+            self.parse_semaphore.release()
 
         for k_item in k_items:
             item_loader = CustomItemLoader(item=GenericItem())
             item_loader.add_value("content", k_item['content'])
             item_loader.add_value("title", k_item['title'])
             # item_loader.add_value("section", k_item.section) Current parser does not extract the section
-            item_loader.add_value("url", response['url'])
+            item_loader.add_value("url", response.url)
             item_loader.add_value("page_number", k_item['page_number'])
             yield item_loader.load_item()
 
         if self.recursive:
             for link in response.xpath("//a"):
                 yield response.follow(link, callback=self.parse, meta={"playwright": True})
+
+    def closed(self, reason):
+        self.parse_pool.shutdown(wait=False, cancel_futures=True)
@@ -1,4 +1,4 @@
 from .parsing_tasks import parse_pdf_task, parse_url_task
 from .intent_tasks import generate_intents_task, generate_suggested_intents_task, generate_titles_task
-from .util_tasks import read_s3_index, get_filesystem, test_task
+from .util_tasks import read_s3_index, get_filesystem, get_embedding_cache_path, invalidate_rerank_scores_task, test_task
 from .indexing_tasks import index_task, delete_index_files
\ No newline at end of file
@@ -13,6 +13,7 @@ from back.apps.language_model.models.enums import (
 )
 
 from .colbert_actor import ColBERTActor
+from .util_tasks import get_embedding_cache_path
 
 logger = getLogger(__name__)
 
@@ -20,18 +21,31 @@ logger = getLogger(__name__)
 @ray.remote(num_cpus=1, resources={"tasks": 1})
 def generate_embeddings_task(data):
 
-    from chat_rag.embedding_models import E5Model
+    from chat_rag.embedding_models import E5Model, EmbeddingCache
+
+    # Unchanged contents of re-imported knowledge items are served from the cache instead of re-embedded
+    embedding_cache = EmbeddingCache(path=get_embedding_cache_path())
 
     embedding_model = E5Model(
         model_name=data["model_name"],
         use_cpu=data["device"] == "cpu",
         huggingface_key=os.environ.get("HUGGINGFACE_API_KEY", None),
+        embedding_cache=embedding_cache,
     )
 
+    # Batch by a token budget equivalent to batch_size full-length passages, so short passages are
+    # encoded in bigger batches instead of being padded to the longest passage of a fixed-size batch
+    max_length = min(embedding_model.tokenizer.model_max_length, 512)
     embeddings = embedding_model.build_embeddings(
-        contents=data["contents"], batch_size=data["batch_size"], prefix="passage: "
+        contents=data["contents"],
+        batch_size=-1,
+        prefix="passage: ",
+        max_tokens_per_batch=data["batch_size"] * max_length,
     )
 
+    logger.info(f"Embedding cache stats: {embedding_cache.stats()}")
+    embedding_cache.close()
+
     # from tensor to list
     embeddings = [embedding.tolist() for embedding in embeddings]
 
@@ -134,6 +148,9 @@ def index_e5(retriever_config):
 
     generate_embeddings(k_items=k_items, retriever_config=retriever_config)
 
+    # no-op if the index already exists, pgvector updates it with the new embeddings
+    retriever_config.create_ann_index()
+
 
 def get_indexed_k_items_ids(s3_index_path):
 
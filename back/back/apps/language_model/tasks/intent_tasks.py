@@ -1,6 +1,8 @@
 import asyncio
+import os
 from logging import getLogger
 import random
+import tempfile
 
 import ray
 from ray.util.placement_group import (
@@ -14,6 +16,66 @@ logger = getLogger(__name__)
 
 # Helper functions
 
+# One BM25 index per knowledge base and worker process, kept in sync with the knowledge items incrementally
+_bm25_retrievers = {}
+
+
+def get_bm25_retriever(kb_id):
+    """
+    Returns the BM25 index of the knowledge base, loading it from disk if it was persisted by a previous task
+    and adding or removing only the knowledge items that changed since then.
+    """
+    from back.apps.language_model.models import KnowledgeItem
+    from chat_rag.retrievers import BM25Retriever
+
+    index_path = os.path.join(tempfile.gettempdir(), "bm25_indexes", str(kb_id))
+
+    retriever = _bm25_retrievers.get(kb_id)
+    if retriever is None and os.path.exists(index_path):
+        try:
+            retriever = BM25Retriever.load(index_path)
+        except Exception as e:
+            logger.warning(f"Could not load the BM25 index of knowledge base {kb_id}: {e}")
+    if retriever is None:
+        retriever = BM25Retriever()
+
+    items = KnowledgeItem.objects.filter(knowledge_base=kb_id).values_list(
+        "pk", "title", "content", "updated_date"
+    )
+    current = {
+        str(pk): (f"{title} {content}", updated_date.isoformat())
+        for pk, title, content, updated_date in items
+    }
+
+    # Items deleted or modified since the index was saved
+    stale_ids = [
+        doc_id
+        for doc_id, doc in retriever.documents.items()
+        if doc_id not in current or doc.get("version") != current[doc_id][1]
+    ]
+    new_ids = [
+        doc_id
+        for doc_id in current
+        if doc_id not in retriever.documents or doc_id in stale_ids
+    ]
+
+    if stale_ids or new_ids:
+        logger.info(
+            f"Updating BM25 index of knowledge base {kb_id}: {len(stale_ids)} removed, {len(new_ids)} added"
+        )
+        retriever.remove(stale_ids)
+        retriever.add(
+            [
+                {"content": current[doc_id][0], "version": current[doc_id][1]}
+                for doc_id in new_ids
+            ],
+            ids=new_ids,
+        )
+        retriever.save(index_path)
+
+    _bm25_retrievers[kb_id] = retriever
+    return retriever
+
 
 def retrieve(queries, kb_id):
     """
@@ -21,19 +83,15 @@ def retrieve(queries, kb_id):
     We use BM25 for simplicity and speed, because the thing we care the most is getting the scores from the cross-encoder.
     """
     import torch
-    from back.apps.language_model.models import KnowledgeBase, KnowledgeItem
-    from chat_rag.retrievers import BM25Retriever, ReRankRetriever
+    from back.apps.language_model.models import KnowledgeBase
+    from chat_rag.retrievers import ReRankRetriever
 
-    items = KnowledgeItem.objects.filter(knowledge_base=kb_id)
-    items = [f"{item.title} {item.content}" for item in items]
-    corpus = [{"content": item} for item in items]
+    retriever = get_bm25_retriever(kb_id)
     lang = KnowledgeBase.objects.get(pk=kb_id).lang
 
-    top_k = int(0.2 * len(corpus))
+    top_k = int(0.2 * len(retriever))
     top_k = min(top_k, 10)  # limit the top_k to 20 to avoid long processing times
 
-    retriever = BM25Retriever(corpus)
-
     # get cuda as device if available
     device = "cuda" if torch.cuda.is_available() else "cpu"
     batch_size = 32 if device == "cuda" else 1
@@ -94,6 +152,39 @@ def run_clustering_task(knowledge_base_pk, texts, batch_size, lang, low_resource
         remove_placement_group(pg)
 
 
+def get_llm_batch_executor(llm, progress_callback=None):
+    """
+    Returns the executor of the batch generations, configured with LLM_MAX_CONCURRENCY and LLM_REQUESTS_PER_SECOND.
+    """
+    from chat_rag.llms import BatchExecutor
+
+    requests_per_second = os.environ.get("LLM_REQUESTS_PER_SECOND")
+    return BatchExecutor(
+        max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", 8)),
+        requests_per_second=float(requests_per_second) if requests_per_second else None,
+        provider=type(llm).__name__,
+        progress_callback=progress_callback,
+    )
+
+
+def run_async(coro):
+    """
+    Runs the coroutine in a new event loop, as asyncio.run, and closes the HTTP clients and rate limiters bound to
+    the loop before it is closed, so they don't pile up in the long-lived Ray workers.
+    """
+    from chat_rag.llms.batch_executor import release_rate_limiters
+    from chat_rag.utils.http_clients import aclose_clients
+
+    async def main():
+        try:
+            return await coro
+        finally:
+            await aclose_clients()
+            release_rate_limiters()
+
+    return asyncio.run(main())
+
+
 # Tasks
 
 @ray.remote(num_cpus=1, resources={"tasks": 1})
@@ -136,15 +227,21 @@ def generate_titles_task(knowledge_base_pk, llm_config_id, max_k_items: int = 50
 
     logger.info(f"Generating questions for {len(k_items)} knowledge items")
 
-    questions = asyncio.run(
+    def log_progress(n_done, total, n_failed):
+        logger.info(f"Questions generated: {n_done}/{total} ({n_failed} failed)")
+
+    questions = run_async(
         agenerate_questions(
             [f"{item.title} {item.content}" for item in k_items],
             llm,
+            executor=get_llm_batch_executor(llm, progress_callback=log_progress),
         )
     )
 
     auto_gen_questions = []
     for question, item in zip(questions, k_items):
+        if question is None:  # the generation failed for this item
+            continue
         auto_gen_questions.append(
             AutoGeneratedTitle(
                 knowledge_item=item,
@@ -171,7 +268,9 @@ def generate_intents(clusters_texts, llm_config_id):
     )
 
     logger.info("Generating intents...")
-    intents = asyncio.run(agenerate_intents(clusters_texts, llm))
+    intents = run_async(
+        agenerate_intents(clusters_texts, llm, executor=get_llm_batch_executor(llm))
+    )
     return intents
 
 
@@ -272,7 +371,14 @@ def generate_intents_task(
         )
     )
 
-    logger.info(f"Number of new intents: {len(intents)} generated")
+    # skip the clusters whose intent generation failed
+    intents_items = [
+        (intent, items)
+        for intent, items in zip(intents, cluster_k_item_instances.values())
+        if intent is not None
+    ]
+
+    logger.info(f"Number of new intents: {len(intents_items)} generated")
 
     # save the intents
     new_intents = [
@@ -282,7 +388,7 @@ def generate_intents_task(
             valid=False,
             suggested_intent=False,
         )
-        for intent in intents
+        for intent, _ in intents_items
     ]
 
     Intent.objects.bulk_create(new_intents)
@@ -290,7 +396,7 @@ def generate_intents_task(
     logger.info("Suggested intents saved successfully")
 
     # add the knowledge items to each intent
-    for (_, items), intent in zip(cluster_k_item_instances.items(), new_intents):
+    for (_, items), intent in zip(intents_items, new_intents):
         intent.knowledge_item.add(*items)
 
     logger.info("Knowledge items added to the intents successfully")
@@ -458,6 +564,13 @@ def generate_suggested_intents_task(
         )
     )
 
+    # skip the clusters whose intent generation failed
+    intents_clusters = [
+        (intent, intent_cluster)
+        for intent, intent_cluster in zip(intents, cluster_instances)
+        if intent is not None
+    ]
+
     new_intents = [
         Intent(
             intent_name=intent,
@@ -465,7 +578,7 @@ def generate_suggested_intents_task(
             valid=False,
             suggested_intent=True,
         )
-        for intent in intents
+        for intent, _ in intents_clusters
     ]
 
     Intent.objects.bulk_create(new_intents)
@@ -473,7 +586,7 @@ def generate_suggested_intents_task(
     logger.info(f"Number of new intents: {len(new_intents)}")
 
     # add the messages to each intent
-    for intent_cluster, intent in zip(cluster_instances, new_intents):
+    for (_, intent_cluster), intent in zip(intents_clusters, new_intents):
         # get the value of key 'message_id' from each message
         intent_cluster = [item["message_id"] for item in intent_cluster]
         intent.message.add(*intent_cluster)
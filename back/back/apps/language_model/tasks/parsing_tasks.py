@@ -1,3 +1,5 @@
+import os
+from itertools import islice
 from logging import getLogger
 
 import ray
@@ -7,6 +9,18 @@ from scrapy.utils.project import get_project_settings
 
 logger = getLogger(__name__)
 
+# Number of knowledge items inserted per bulk_create when persisting parsed files
+PARSE_BULK_SIZE = 500
+
+
+def iter_chunks(iterable, size):
+    """
+    Yields lists of up to size consecutive elements of the iterable, without materializing it.
+    """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
 
 @ray.remote(num_cpus=0.2, resources={"tasks": 1})
 def parse_url_task(ds_id, url):
@@ -27,13 +41,27 @@ def parse_url_task(ds_id, url):
     runner.crawl(GenericSpider, start_urls=url, data_source_id=ds_id)
 
 
-def parse_pdf(pdf_file, strategy, splitter, chunk_size, chunk_overlap):
-    from io import BytesIO
+@ray.remote(num_cpus=1, resources={"tasks": 1})
+def partition_pdf_range_task(pdf_range, strategy, first_page):
+    """
+    Partition a range of pages of a pdf file into unstructured elements.
+    Parameters
+    ----------
+    pdf_range : bytes
+        A pdf file with the range of pages, as returned by split_pdf_pages.
+    strategy : str
+        The strategy to use to parse the pdf file.
+    first_page : int
+        The page number of the first page of the range in the original file.
+    """
+    from chat_rag.data.parsers import partition_pdf_range
 
-    from chat_rag.data.parsers import parse_pdf as parse_pdf_method
-    from chat_rag.data.splitters import get_splitter
+    return partition_pdf_range(pdf_range, strategy=strategy, first_page=first_page)
 
-    pdf_file = BytesIO(pdf_file)
+
+def parse_pdf(pdf_file, strategy, splitter, chunk_size, chunk_overlap):
+    from chat_rag.data.parsers import elements_to_k_items, split_pdf_pages
+    from chat_rag.data.splitters import get_splitter
 
     splitter = get_splitter(splitter, chunk_size, chunk_overlap)
 
@@ -42,8 +70,23 @@ def parse_pdf(pdf_file, strategy, splitter, chunk_size, chunk_overlap):
     logger.info(f"Chunk size: {chunk_size}")
     logger.info(f"Chunk overlap: {chunk_overlap}")
 
-    parsed_items = parse_pdf_method(
-        file=pdf_file, strategy=strategy, split_function=splitter
+    # Partition the ranges of pages in parallel across the cluster and merge them back in page order,
+    # the sections are built over the whole document so they are not cut at the edges of the ranges
+    pages_per_range = int(os.environ.get("PDF_PAGES_PER_RANGE", 20))
+    page_ranges = split_pdf_pages(pdf_file, pages_per_range)
+    logger.info(f"Page ranges: {len(page_ranges)} of {pages_per_range} pages")
+
+    ranges_elements = ray.get(
+        [
+            partition_pdf_range_task.remote(pdf_range, strategy, first_page)
+            for first_page, pdf_range in page_ranges
+        ]
+    )
+    elements = [element for elements in ranges_elements for element in elements]
+
+    # Generator of KnowledgeItems, consumed while they are persisted
+    parsed_items = elements_to_k_items(
+        elements, file_type="pdf", split_function=splitter, stream=True
     )
 
     return parsed_items
@@ -62,7 +105,13 @@ def parse_pdf_task(ds_pk):
     k_items : list
         A list of KnowledgeItem objects.
     """
-    from back.apps.language_model.models import DataSource, KnowledgeItem, KnowledgeItemImage
+    from back.apps.language_model.models import (
+        DataSource,
+        KnowledgeItem,
+        KnowledgeItemImage,
+        get_near_duplicate_filter,
+        mark_retriever_configs_outdated,
+    )
 
     logger.info("Parsing PDF file...")
     logger.info(f"PDF file pk: {ds_pk}")
@@ -77,30 +126,37 @@ def parse_pdf_task(ds_pk):
 
     parsed_items = parse_pdf(pdf_file, strategy, splitter, chunk_size, chunk_overlap)
 
+    # Drop the repeated boilerplate (headers, disclaimers...) before it is persisted and indexed
+    near_duplicate_filter = get_near_duplicate_filter()
+    if near_duplicate_filter is not None:
+        parsed_items = near_duplicate_filter.filter(parsed_items)
+
+    n_items = 0
     with transaction.atomic():
-        for item in parsed_items:
-            # Create and save the KnowledgeItem instance
-            knowledge_item = KnowledgeItem(
-                knowledge_base=ds.knowledge_base,
-                data_source=ds,
-                title=item.title,
-                content=item.content,  # alnaf [[Image 0]] a;mda [[Image 2]]
-                url=item.url,
-                section=item.section,
-                page_number=item.page_number,
-                metadata=item.metadata,
-            )
-            knowledge_item.save()
-
-            # For each image in the item, create and save a KnowledgeItemImage instance
-            if item.images:
-                for index, image in item.images.items():
+        for chunk in iter_chunks(parsed_items, PARSE_BULK_SIZE):
+            knowledge_items = []
+            images = []
+            for item in chunk:
+                knowledge_item = KnowledgeItem(
+                    knowledge_base=ds.knowledge_base,
+                    data_source=ds,
+                    title=item.title,
+                    content=item.content,  # alnaf [[Image 0]] a;mda [[Image 2]]
+                    url=item.url,
+                    section=item.section,
+                    page_number=item.page_number,
+                    metadata=item.metadata,
+                )
+
+                # Upload the images first so the placeholders are resolved before the item is inserted
+                for index, image in (item.images or {}).items():
                     image_instance = KnowledgeItemImage(
                         image_base64=image.image_base64,
                         knowledge_item=knowledge_item,
                         image_caption=image.image_caption,
                     )
-                    image_instance.save()
+                    image_instance.store_base64_image()
+                    images.append(image_instance)
 
                     # If the image does not have a caption, use a default caption
                     image_caption = (
@@ -112,4 +168,17 @@ def parse_pdf_task(ds_pk):
                         f"[[Image {index}]]",
                         f"![{image_caption}]({image_instance.image_file.name})",
                     )
-                    knowledge_item.save()
+
+                knowledge_items.append(knowledge_item)
+
+            # bulk_create skips KnowledgeItem.save, the retriever configs are marked as outdated once at the end
+            KnowledgeItem.objects.bulk_create(knowledge_items)
+            KnowledgeItemImage.objects.bulk_create(images)
+            n_items += len(knowledge_items)
+            logger.info(f"Saved {n_items} knowledge items")
+
+        if n_items:
+            mark_retriever_configs_outdated(ds.knowledge_base)
+
+    if near_duplicate_filter is not None:
+        logger.info(f"Knowledge items deduplication: {near_duplicate_filter.report()}")
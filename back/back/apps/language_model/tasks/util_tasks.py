@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 import ray
 
@@ -98,6 +99,34 @@ def read_s3_index(index_path, storages_mode):
     return index_path
 
 
+def get_embedding_cache_path():
+    """
+    Returns the sqlite file of the embedding cache shared by the retriever deployments and the indexing tasks of a
+    node, EMBEDDING_CACHE_PATH or a file in the temporary directory by default, or None (in-memory only, so every
+    indexing task starts with an empty cache) if EMBEDDING_CACHE_PATH is set empty.
+    """
+    path = os.environ.get("EMBEDDING_CACHE_PATH", os.path.join(tempfile.gettempdir(), "chatfaq", "embedding_cache.sqlite"))
+    return path or None
+
+
+@ray.remote(num_cpus=0.1, resources={"tasks": 1})
+def invalidate_rerank_scores_task(knowledge_item_ids):
+    """
+    Removes the cross-encoder scores of the knowledge items from the Redis tier shared by the retriever replicas.
+    The local tiers of the replicas are keyed on the content hash, so they never serve a stale score.
+    """
+    from chat_rag.utils.score_cache import RerankScoreCache
+
+    redis_url = os.environ.get("REDIS_URL")
+    if not redis_url:
+        return
+
+    try:
+        RerankScoreCache.invalidate(redis_url, knowledge_item_ids)
+    except Exception as e:
+        logger.warning(f"Could not invalidate the rerank scores of {knowledge_item_ids}: {e}")
+
+
 @ray.remote(num_cpus=1, resources={"tasks": 1})
 def test_task(argument_one):
     from logging import getLogger
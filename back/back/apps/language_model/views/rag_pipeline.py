@@ -51,10 +51,12 @@ class RetrieverConfigAPIViewSet(viewsets.ModelViewSet):
         if None in (query_embeddings_data, threshold, top_k) or not isinstance(query_embeddings_data, list):
             return Response({"error": "Invalid or missing required parameters."}, status=status.HTTP_400_BAD_REQUEST)
 
-        all_items = []
-        for query_embedding in query_embeddings_data:
-            items = retriever_config.retrieve_kitems(query_embedding, threshold, top_k)
-            all_items.extend(items)
+        # All the query embeddings are answered in a single query
+        all_items = [
+            item
+            for items in retriever_config.retrieve_kitems_batch(query_embeddings_data, threshold, top_k)
+            for item in items
+        ]
 
         # Return serialized data
         return JsonResponse(all_items, safe=False)
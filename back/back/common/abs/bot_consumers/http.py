@@ -5,7 +5,7 @@ from channels.db import database_sync_to_async
 from channels.generic.http import AsyncHttpConsumer
 
 from back.apps.broker.models.message import Message
-from back.apps.fsm.models import CachedFSM
+from back.apps.fsm.state_store import get_fsm_state_store
 from back.common.abs.bot_consumers import BotConsumer
 
 logger = getLogger(__name__)
@@ -30,10 +30,10 @@ class HTTPBotConsumer(BotConsumer, AsyncHttpConsumer):
             If returns False most likely it is going be because a wrongly provided FSM name
         """
 
-        self.fsm = await database_sync_to_async(CachedFSM.build_fsm)(self)
+        self.fsm = await get_fsm_state_store().build_fsm(self)
         if self.fsm:
             logger.debug(
-                f"Continuing conversation ({self.conversation}), reusing cached conversation's FSM ({await database_sync_to_async(CachedFSM.get_conv_updated_date)(self)})"
+                f"Continuing conversation ({self.conversation}), reusing cached conversation's FSM"
             )
             await self.fsm.next_state()
         else:
@@ -79,6 +79,12 @@ class HTTPBotConsumer(BotConsumer, AsyncHttpConsumer):
         await self.resolve_fsm()
         await self.send_json({"ok": "POST request processed"})
 
+        # There is no disconnect to persist the state on, every request is persisted once the response is sent
+        try:
+            await get_fsm_state_store().persist(self.conversation.pk)
+        except Exception as e:
+            logger.error(f"Error persisting the FSM state of conversation {self.conversation.pk}", exc_info=e)
+
     async def send_json(self, data, more_body=False):
         await self.send_body(json.dumps(data).encode("utf-8"), more_body=more_body)
 
@@ -5,7 +5,7 @@ from typing import TYPE_CHECKING
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 
-from back.apps.fsm.models import CachedFSM
+from back.apps.fsm.state_store import get_fsm_state_store
 from back.common.abs.bot_consumers import BotConsumer
 from back.utils import WSStatusCodes
 
@@ -29,13 +29,13 @@ class WSBotConsumer(BotConsumer, AsyncJsonWebsocketConsumer):
         self.set_user_id(await self.gather_user_id())
         self.set_initial_conversation_metadata(await self.gather_initial_conversation_metadata())
 
-        self.fsm = await database_sync_to_async(CachedFSM.build_fsm)(self)
+        self.fsm = await get_fsm_state_store().build_fsm(self)
         # Join room group
         await self.channel_layer.group_add(self.get_group_name(), self.channel_name)
         await self.accept()
         if self.fsm:
             logger.debug(
-                f"Continuing conversation ({self.conversation}), reusing cached conversation's FSM ({await database_sync_to_async(CachedFSM.get_conv_updated_date)(self)})"
+                f"Continuing conversation ({self.conversation}), reusing cached conversation's FSM"
             )
             # await self.fsm.next_state()
         else:
@@ -45,6 +45,15 @@ class WSBotConsumer(BotConsumer, AsyncJsonWebsocketConsumer):
                 f"Starting new WS conversation (channel group: {self.get_group_name()}) and creating new FSM"
             )
 
+    async def disconnect(self, code=None):
+        await super().disconnect(code)
+        # The conversation ends with the connection, its state is persisted now instead of once idle
+        if self.fsm:
+            try:
+                await get_fsm_state_store().persist(self.conversation.pk)
+            except Exception as e:
+                logger.error(f"Error persisting the FSM state of conversation {self.conversation.pk}", exc_info=e)
+
     async def receive_json(self, content, **kwargs):
         if content.get("heartbeat", False):
             for _shard in self.channel_layer._shards:
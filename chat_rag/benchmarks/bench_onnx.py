@@ -0,0 +1,59 @@
+"""
+Throughput and parity of the torch, ONNX and ONNX int8 engines of an embedding model on CPU.
+
+    python -m benchmarks.bench_onnx --model intfloat/multilingual-e5-small --n-texts 512
+"""
+import argparse
+import random
+import tempfile
+import time
+
+from chat_rag.embedding_models import E5Model
+from chat_rag.embedding_models.onnx_model import ONNXEncoder
+
+
+def make_texts(n_texts: int, seed: int = 0):
+    rng = random.Random(seed)
+    words = "the of and to a in for is on that by this with you it not or be are from at as your all have new more".split()
+    return [
+        "passage: " + " ".join(rng.choice(words) for _ in range(rng.randint(10, 200)))
+        for _ in range(n_texts)
+    ]
+
+
+def throughput(model, texts, batch_size):
+    start = time.perf_counter()
+    embeddings = model.encode(texts, batch_size=batch_size, disable_progress_bar=True)
+    return len(texts) / (time.perf_counter() - start), embeddings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="intfloat/e5-small-v2")
+    parser.add_argument("--n-texts", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    texts = make_texts(args.n_texts)
+    model = E5Model(model_name=args.model, use_cpu=True)
+    torch_model = model.model
+
+    tps, torch_embeddings = throughput(model, texts, args.batch_size)
+    print(f"torch:     {tps:8.1f} texts/s")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for quantize in [False, True]:
+            model.model = ONNXEncoder(
+                torch_model, model.tokenizer, args.model, cache_dir=cache_dir, quantize=quantize
+            )
+            tps, embeddings = throughput(model, texts, args.batch_size)
+            cosine = (torch_embeddings * embeddings).sum(dim=1)
+            print(
+                f"{model.model.engine:10} {tps:8.1f} texts/s, cosine with torch: "
+                f"min {cosine.min().item():.4f} mean {cosine.mean().item():.4f}"
+            )
+            model.model = torch_model
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Time of parse_elements on synthetic PDF elements, compared with the previous implementation that serialized every
+element to check for headers and footers and re-summed the section length for every element.
+
+    python -m benchmarks.bench_parse_elements --n-elements 1000 10000 50000
+"""
+import argparse
+import random
+import time
+
+from unstructured.documents.coordinates import PixelSpace
+from unstructured.documents.elements import (
+    Element,
+    ListItem,
+    NarrativeText,
+    Text,
+    Title,
+)
+
+from chat_rag.data.parsers import is_strict_instance, parse_elements
+
+PAGE_HEIGHT = 800
+
+
+def make_elements(n_elements: int, seed: int = 0):
+    """
+    Elements of every type at random positions of the page, with page numbers at the bottom.
+    """
+    rng = random.Random(seed)
+    words = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor".split()
+    elements = []
+    for _ in range(n_elements):
+        element_class = rng.choice([Title, Title, NarrativeText, NarrativeText, NarrativeText, Text, ListItem])
+        if element_class is Text and rng.random() < 0.5:
+            text = str(rng.randint(1, 300))  # page number
+        else:
+            text = " ".join(rng.choice(words) for _ in range(rng.randint(1, 80)))
+        y = rng.uniform(0, PAGE_HEIGHT - 20)
+        elements.append(
+            element_class(
+                text=text,
+                coordinates=((50, y), (50, y + 20), (550, y + 20), (550, y)),
+                coordinate_system=PixelSpace(width=600, height=PAGE_HEIGHT),
+            )
+        )
+    return elements
+
+
+def old_is_header_or_footer(element: Element) -> bool:
+    # The implementation before the metadata was read directly
+    element = element.to_dict()
+    if element["type"] not in ["Title", "UncategorizedText"]:
+        return False
+    y_top_left = element["metadata"]["coordinates"]["points"][0][1]
+    y_bottom_left = element["metadata"]["coordinates"]["points"][1][1]
+    page_height = element["metadata"]["coordinates"]["layout_height"]
+    if y_top_left < 0.1 * page_height or y_bottom_left < 0.1 * page_height:
+        return True
+    if (
+        y_top_left > 0.9 * page_height or y_bottom_left > 0.9 * page_height
+    ) and element["text"].isdigit():
+        return True
+    return False
+
+
+def old_parse_elements(elements, file_type="pdf", combine_section_under_n_chars=500, new_after_n_chars=1000):
+    # The implementation that summed the section length for every element
+    sections = []
+    section = []
+    for element in elements:
+        if file_type == "pdf" and old_is_header_or_footer(element):
+            continue
+
+        if len(section) == 0:
+            append = True
+        elif isinstance(section[-1], Title) and isinstance(element, Title):
+            append = True
+        elif is_strict_instance(section[-1], Text) and isinstance(element, Title):
+            append = True
+        elif isinstance(section[-1], Title) and not isinstance(element, Title):
+            append = True
+        elif not isinstance(section[-1], Title) and isinstance(element, Title):
+            append = False
+        else:
+            append = True
+
+        section_length = sum([len(str(element)) for element in section])
+        element_length = len(str(element))
+        if (
+            combine_section_under_n_chars != -1
+            and (section_length + element_length) < combine_section_under_n_chars
+        ):
+            append = True
+        if new_after_n_chars != -1 and (section_length + element_length) > new_after_n_chars:
+            append = False
+
+        if append:
+            section.append(element)
+        else:
+            sections.append(section)
+            section = [element]
+
+    sections.append(section)
+    return sections
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n-elements", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    for n_elements in args.n_elements:
+        elements = make_elements(n_elements)
+        for name, func in [("old", old_parse_elements), ("new", parse_elements)]:
+            start = time.perf_counter()
+            # Without combine_section_under_n_chars / new_after_n_chars limits the sections grow long
+            sections = func(elements, combine_section_under_n_chars=-1, new_after_n_chars=-1)
+            print(f"{n_elements:7} elements {name}: {time.perf_counter() - start:8.3f}s ({len(sections)} sections)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Pages per second of partition_pdf_parallel with different numbers of workers, compared with partitioning the whole
+file with a single partition_pdf call.
+
+    python -m benchmarks.bench_partition_pdf document.pdf --workers 1 2 4 8 --strategy fast
+"""
+import argparse
+import time
+
+from pypdf import PdfReader
+from unstructured.partition.auto import partition_pdf
+
+from chat_rag.data.parsers import partition_pdf_parallel
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("filename")
+    parser.add_argument("--strategy", default="fast")
+    parser.add_argument("--pages-per-range", type=int, default=20)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    n_pages = len(PdfReader(args.filename).pages)
+    print(f"{args.filename}: {n_pages} pages, strategy {args.strategy}")
+
+    start = time.perf_counter()
+    elements = partition_pdf(filename=args.filename, strategy=args.strategy)
+    elapsed = time.perf_counter() - start
+    print(f"  partition_pdf: {n_pages / elapsed:7.2f} pages/s ({elapsed:.1f}s, {len(elements)} elements)")
+
+    for n_workers in args.workers:
+        start = time.perf_counter()
+        elements = partition_pdf_parallel(
+            filename=args.filename,
+            strategy=args.strategy,
+            pages_per_range=args.pages_per_range,
+            n_workers=n_workers,
+        )
+        elapsed = time.perf_counter() - start
+        print(
+            f"  partition_pdf_parallel {n_workers} workers: {n_pages / elapsed:7.2f} pages/s "
+            f"({elapsed:.1f}s, {len(elements)} elements)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Time of the TokenSplitter and SentenceTokenSplitter token windows on synthetic texts, compared with the previous
+implementations that tokenized every piece on its own and re-tokenized the pieces popped from the overlap window.
+
+    python -m benchmarks.bench_splitters --n-words 1000 10000 100000
+"""
+import argparse
+import random
+import re
+import time
+
+import nltk
+
+from chat_rag.data.splitters import SentenceTokenSplitter, TokenSplitter
+
+WORDS = [
+    "the", "password", "can", "be", "reset", "from", "settings", "page", "of", "your", "account", "billing",
+    "invoices", "are", "sent", "every", "month", "contact", "support", "if", "problem", "persists", "configuration",
+]
+
+
+def make_text(n_words: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    sentences = []
+    while n_words > 0:
+        length = min(n_words, rng.randint(5, 25))
+        sentences.append(" ".join(rng.choice(WORDS) for _ in range(length)).capitalize() + ".")
+        n_words -= length
+    # A paragraph every few sentences, so the separators are mixed
+    return "\n".join(" ".join(sentences[i : i + 4]) for i in range(0, len(sentences), 4))
+
+
+def old_token_split(splitter: TokenSplitter, text: str):
+    temp_split = re.split(splitter.sep_pattern, text)
+    split_text = []
+    buffer = ""
+    for item in temp_split:
+        if item in splitter.separators:
+            buffer += item
+        else:
+            split_text.append(buffer + item)
+            buffer = ""
+
+    chunks = []
+    current_chunk = []
+    current_length = 0
+    for split in split_text:
+        n_tokens = len(splitter.tokenizer.tokenize(split))
+        if current_length + n_tokens > splitter.chunk_size:
+            chunks.append("".join(current_chunk).strip())
+            while current_length > splitter.chunk_overlap or current_length + n_tokens > splitter.chunk_size:
+                first_chunk = current_chunk.pop(0)
+                current_length -= len(splitter.tokenizer.tokenize(first_chunk))
+        current_chunk.append(split)
+        current_length += n_tokens
+
+    if len(current_chunk) > 0:
+        chunks.append("".join(current_chunk).strip())
+    return chunks
+
+
+def old_sentence_token_split(splitter: SentenceTokenSplitter, text: str):
+    chunks = []
+    current_chunk = []
+    current_length = 0
+    for sentence in nltk.sent_tokenize(text):
+        n_tokens = len(splitter.tokenizer.tokenize(sentence))
+        if current_length + n_tokens > splitter.chunk_size and len(current_chunk) > 0:
+            chunks.append(" ".join(current_chunk).strip())
+            current_chunk = []
+            current_length = 0
+        current_chunk.append(sentence)
+        current_length += n_tokens
+
+    if len(current_chunk) > 0:
+        chunks.append(" ".join(current_chunk).strip())
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n-words", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--tokenizer", default="intfloat/e5-small-v2")
+    parser.add_argument("--chunk-size", type=int, default=128)
+    parser.add_argument("--chunk-overlap", type=int, default=16)
+    args = parser.parse_args()
+
+    token_splitter = TokenSplitter(args.tokenizer, chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    sentence_splitter = SentenceTokenSplitter(args.tokenizer, chunk_size=args.chunk_size)
+    runs = [
+        ("TokenSplitter", token_splitter, old_token_split),
+        ("SentenceTokenSplitter", sentence_splitter, old_sentence_token_split),
+    ]
+
+    for n_words in args.n_words:
+        text = make_text(n_words)
+        for name, splitter, old_split in runs:
+            start = time.perf_counter()
+            old_chunks = old_split(splitter, text)
+            old_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            chunks = splitter(text)
+            new_time = time.perf_counter() - start
+
+            assert chunks == old_chunks, f"{name} returned different chunks"
+            print(
+                f"{n_words:7} words {name:>21}: old {old_time:8.3f}s, new {new_time:8.3f}s "
+                f"({old_time / new_time:.1f}x, {len(chunks)} chunks)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Time of the top_k selection of SemanticRetriever over the scores of every context, compared with the previous
+implementation that sorted the whole row of scores of every query.
+
+    python -m benchmarks.bench_top_k --n-contexts 10000 100000 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from chat_rag.retrievers.semantic_retriever import SemanticRetriever
+
+
+def full_sort_top_k(scores: np.ndarray, top_k: int = 5, threshold: float = None):
+    sorted_indexes = np.argsort(scores, axis=1)[:, ::-1]
+    sorted_scores = np.take_along_axis(scores, sorted_indexes, axis=1)
+
+    result_scores, result_indexes = [], []
+    for row_scores, row_indexes in zip(sorted_scores, sorted_indexes):
+        if threshold is not None:
+            mask = row_scores >= threshold
+            row_scores, row_indexes = row_scores[mask], row_indexes[mask]
+        if top_k != -1:
+            row_scores, row_indexes = row_scores[:top_k], row_indexes[:top_k]
+        result_scores.append(row_scores)
+        result_indexes.append(row_indexes)
+    return result_scores, result_indexes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n-contexts", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--n-queries", type=int, default=8)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for n_contexts in args.n_contexts:
+        scores = rng.uniform(-1, 1, (args.n_queries, n_contexts)).astype(np.float32)
+        results = {}
+        for name, func in [("full sort", full_sort_top_k), ("partial", SemanticRetriever._select_top_k)]:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                results[name] = func(scores, args.top_k, 0.0)
+            elapsed = (time.perf_counter() - start) / args.repeat
+            print(f"{n_contexts:8} contexts x {args.n_queries} queries {name:>9}: {elapsed * 1000:9.2f}ms")
+
+        assert all(
+            np.array_equal(full, partial)
+            for full, partial in zip(results["full sort"][1], results["partial"][1])
+        ), "The partial selection returned different indexes"
+
+
+if __name__ == "__main__":
+    main()
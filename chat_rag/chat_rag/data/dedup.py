@@ -0,0 +1,158 @@
+import re
+import zlib
+from collections import defaultdict
+from logging import getLogger
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, TypeVar
+
+import numpy as np
+
+logger = getLogger(__name__)
+
+T = TypeVar("T")
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def _lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Returns the number of bands and rows per band, with bands * rows <= num_perm, whose LSH threshold
+    (1 / bands) ** (1 / rows) is the closest to the given threshold.
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+def item_text(item) -> str:
+    """
+    Returns the text of a knowledge item compared by the filter: its title and content, so the items that share an
+    answer but are different questions are not duplicates.
+    """
+    return f"{item.title or ''}\n{item.content}"
+
+
+class NearDuplicateFilter:
+    """
+    Streaming near-duplicate detection of texts with MinHash signatures over word shingles and an LSH index.
+    A text is a duplicate when the estimated Jaccard similarity with an already seen text is at least the threshold,
+    so boilerplate repeated across crawled pages or re-uploaded files is only kept once.
+    Texts with fewer words than a shingle are too short to compare and are never considered duplicates.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        num_perm: int = 128,
+        shingle_size: int = 5,
+        seed: int = 0,
+    ):
+        """
+        Parameters
+        ----------
+        threshold : float, optional
+            Minimum estimated Jaccard similarity to consider two texts duplicates, by default 0.9.
+        num_perm : int, optional
+            Number of hash permutations of the MinHash signatures, by default 128.
+        shingle_size : int, optional
+            Number of words of every shingle, by default 5.
+        seed : int, optional
+            Seed of the hash permutations, by default 0.
+        """
+        assert 0 < threshold <= 1, "threshold must be in (0, 1]"
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64).astype(np.uint64) % _MERSENNE_PRIME
+        self.b = rng.randint(0, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64).astype(np.uint64) % _MERSENNE_PRIME
+
+        self.bands, self.rows = _lsh_params(threshold, num_perm)
+        self.buckets: List[Dict[bytes, List[int]]] = [defaultdict(list) for _ in range(self.bands)]
+        self.signatures: List[np.ndarray] = []
+
+        self.n_seen = 0
+        self.n_dropped = 0
+
+    def _shingles(self, text: str) -> np.ndarray:
+        words = re.findall(r"\w+", text.lower())
+        if len(words) <= self.shingle_size:
+            shingles = {" ".join(words)}
+        else:
+            shingles = {
+                " ".join(words[i : i + self.shingle_size])
+                for i in range(len(words) - self.shingle_size + 1)
+            }
+        return np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        Returns the MinHash signature of the text.
+        """
+        hashes = self._shingles(text)
+        # (a * h + b) mod p, the uint64 overflow is part of the hash family as in the usual MinHash implementations
+        permuted = (np.outer(hashes, self.a) + self.b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[band * self.rows : (band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def is_duplicate(self, text: str) -> bool:
+        """
+        Returns whether the text is a near-duplicate of a text seen before, otherwise the text is remembered.
+        """
+        self.n_seen += 1
+        if len(re.findall(r"\w+", text)) < self.shingle_size:
+            return False
+        signature = self.signature(text)
+        band_keys = self._band_keys(signature)
+
+        candidates = set()
+        for buckets, key in zip(self.buckets, band_keys):
+            candidates.update(buckets.get(key, ()))
+        for candidate in candidates:
+            if np.mean(self.signatures[candidate] == signature) >= self.threshold:
+                self.n_dropped += 1
+                return True
+
+        index = len(self.signatures)
+        self.signatures.append(signature)
+        for buckets, key in zip(self.buckets, band_keys):
+            buckets[key].append(index)
+        return False
+
+    def filter(self, items: Iterable[T], key: Callable[[T], str] = item_text) -> Iterator[T]:
+        """
+        Yields the items that are not near-duplicates of a previous item.
+        Parameters
+        ----------
+        items : Iterable[T]
+            The items to deduplicate, e.g. KnowledgeItems.
+        key : Callable[[T], str], optional
+            Returns the text of an item, by default its title and content.
+        """
+        for item in items:
+            if not self.is_duplicate(key(item)):
+                yield item
+
+    def report(self) -> Dict[str, int]:
+        """
+        Returns the number of seen, kept and dropped items.
+        """
+        return {
+            "seen": self.n_seen,
+            "kept": self.n_seen - self.n_dropped,
+            "dropped": self.n_dropped,
+        }
@@ -1,4 +1,6 @@
-from typing import List, Optional, Union, BinaryIO, IO, Callable
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Iterable, Iterator, List, Optional, Tuple, Union, BinaryIO, IO, Callable
 from tempfile import SpooledTemporaryFile
 
 from unstructured.documents.elements import (
@@ -29,16 +31,20 @@ def is_header_or_footer(element: Element) -> bool:
         True if the element is a header or footer, False otherwise.
     """
     # Check if the type matches typical header/footer types
-    element = element.to_dict()
-    if element["type"] not in ["Title", "UncategorizedText"]:
+    # Read the metadata directly, element.to_dict() serializes the whole element for every call
+    if element.category not in ["Title", "UncategorizedText"]:
+        return False
+
+    coordinates = element.metadata.coordinates
+    if coordinates is None or coordinates.points is None or coordinates.system is None:
         return False
 
     # Get the Y-coordinate of the top left and bottom left of the potential header/footer
-    y_top_left = element["metadata"]["coordinates"]["points"][0][1]
-    y_bottom_left = element["metadata"]["coordinates"]["points"][1][1]
+    y_top_left = coordinates.points[0][1]
+    y_bottom_left = coordinates.points[1][1]
 
     # Page's height for reference
-    page_height = element["metadata"]["coordinates"]["layout_height"]
+    page_height = coordinates.system.height
 
     # Check if the element is within the top 10%, page header
     if y_top_left < 0.1 * page_height or y_bottom_left < 0.1 * page_height:
@@ -46,39 +52,23 @@ def is_header_or_footer(element: Element) -> bool:
     # Check if the element is within the bottom 10% and the text is just a number, page footer
     if (
         y_top_left > 0.9 * page_height or y_bottom_left > 0.9 * page_height
-    ) and element["text"].isdigit():
+    ) and element.text.isdigit():
         return True
 
     return False
 
 
-def parse_elements(
-    elements: List[Element],
+def iter_sections(
+    elements: Iterable[Element],
     file_type: str = "pdf",
     combine_section_under_n_chars: int = 500,
     new_after_n_chars: int = 1000,
-) -> List[List[Element]]:
+) -> Iterator[List[Element]]:
     """
-    Parse a list of elements into sections following a set of rules based on the titles and length parameters.
-    Parameters
-    ----------
-    elements : List[Element]
-        A list of unstructured elements. Usually the output of a partition functions.
-    file_type: str
-        The type of file to parse. Can be 'pdf' or 'html'.
-    combine_under_n_chars: int
-        Combines elements (for example a series of titles) until a section reaches
-        a length of n characters.
-    new_after_n_chars: int
-        Cuts off new sections once they reach a length of n characters
-    Returns
-    -------
-    List[List[Element]]
-        A list of sections, where each section is a list of elements.
+    Same as parse_elements but yields every section as soon as it is complete.
     """
-
-    sections = []
     section = []
+    section_length = 0  # running length of the section, so it is not recomputed for every element
     for element in elements:
         append = False
 
@@ -111,7 +101,6 @@ def parse_elements(
             append = True
 
         # if the section is too short, just append
-        section_length = sum([len(str(element)) for element in section])
         element_length = len(str(element))
         if (
             combine_section_under_n_chars != -1
@@ -126,13 +115,48 @@ def parse_elements(
 
         if append:
             section.append(element)
+            section_length += element_length
         else:
-            sections.append(section)
+            yield section
             section = [element]
+            section_length = element_length
 
-    sections.append(section)  # append the last section
+    yield section  # the last section
 
-    return sections
+
+def parse_elements(
+    elements: List[Element],
+    file_type: str = "pdf",
+    combine_section_under_n_chars: int = 500,
+    new_after_n_chars: int = 1000,
+) -> List[List[Element]]:
+    """
+    Parse a list of elements into sections following a set of rules based on the titles and length parameters.
+    Parameters
+    ----------
+    elements : List[Element]
+        A list of unstructured elements. Usually the output of a partition functions.
+    file_type: str
+        The type of file to parse. Can be 'pdf' or 'html'.
+    combine_under_n_chars: int
+        Combines elements (for example a series of titles) until a section reaches
+        a length of n characters.
+    new_after_n_chars: int
+        Cuts off new sections once they reach a length of n characters
+    Returns
+    -------
+    List[List[Element]]
+        A list of sections, where each section is a list of elements.
+    """
+
+    return list(
+        iter_sections(
+            elements,
+            file_type=file_type,
+            combine_section_under_n_chars=combine_section_under_n_chars,
+            new_after_n_chars=new_after_n_chars,
+        )
+    )
 
 
 def transform_to_k_items(sections: List[List[Element]], file_type: str = 'pdf',) -> List[KnowledgeItem]:
@@ -150,7 +174,14 @@ def transform_to_k_items(sections: List[List[Element]], file_type: str = 'pdf',)
         A list of KnowledgeItems.
     """
 
-    sections_k_items = []
+    return list(iter_k_items(sections, file_type=file_type))
+
+
+def iter_k_items(sections: Iterable[List[Element]], file_type: str = 'pdf',) -> Iterator[KnowledgeItem]:
+    """
+    Same as transform_to_k_items but yields the KnowledgeItem of every section as soon as it is built.
+    """
+
     prev_title = None
     for ndx, section in enumerate(sections):
         title = None
@@ -172,12 +203,10 @@ def transform_to_k_items(sections: List[List[Element]], file_type: str = 'pdf',)
             url = section[0].metadata.url if section[0].metadata.url else section[0].metadata.filename # use url if available, otherwise filename
             section_k_items.url = url
 
-        if section_k_items.content.strip() != "":
-            sections_k_items.append(section_k_items)
-
         prev_title = title # save title for next section
 
-    return sections_k_items
+        if section_k_items.content.strip() != "":
+            yield section_k_items
 
 
 def split_k_items(k_items: List[KnowledgeItem], split_function: Callable = lambda x: [x]) -> List[KnowledgeItem]:
@@ -195,26 +224,85 @@ def split_k_items(k_items: List[KnowledgeItem], split_function: Callable = lambd
         A list of KnowledgeItems.
     """
 
-    new_k_items = []
+    return list(iter_split_k_items(k_items, split_function=split_function))
+
+
+def iter_split_k_items(k_items: Iterable[KnowledgeItem], split_function: Callable = lambda x: [x]) -> Iterator[KnowledgeItem]:
+    """
+    Same as split_k_items but yields the knowledge items as soon as they are split.
+    """
+
     for k_item in k_items:
         text_splitted = split_function(k_item.content)
         for text in text_splitted:
-            c = KnowledgeItem(content=text, title=k_item.title, url=k_item.url, section=k_item.section, page_number=k_item.page_number)
-            new_k_items.append(c)
+            yield KnowledgeItem(content=text, title=k_item.title, url=k_item.url, section=k_item.section, page_number=k_item.page_number)
+
+
+def split_pdf_pages(pdf_bytes: bytes, pages_per_range: int) -> List[Tuple[int, bytes]]:
+    """
+    Splits a pdf file into smaller pdf files of consecutive pages.
+    Parameters
+    ----------
+    pdf_bytes : bytes
+        The content of the pdf file.
+    pages_per_range : int
+        The number of pages of every range.
+    Returns
+    -------
+    List[Tuple[int, bytes]]
+        A list of (first page number, pdf content) tuples in page order, page numbers start at 1.
+    """
+    from pypdf import PdfReader, PdfWriter
 
-    return new_k_items
+    reader = PdfReader(BytesIO(pdf_bytes))
+    n_pages = len(reader.pages)
+    page_ranges = []
+    for start in range(0, n_pages, pages_per_range):
+        writer = PdfWriter()
+        for page in reader.pages[start : start + pages_per_range]:
+            writer.add_page(page)
+        buffer = BytesIO()
+        writer.write(buffer)
+        page_ranges.append((start + 1, buffer.getvalue()))
 
+    return page_ranges
 
-def parse_pdf(
+
+def partition_pdf_range(pdf_bytes: bytes, strategy: str = "auto", first_page: int = 1) -> List[Element]:
+    """
+    Partitions a range of pages of a pdf file, the page numbers of the elements are shifted so they refer to
+    the original file.
+    Parameters
+    ----------
+    pdf_bytes : bytes
+        The content of the pdf file with the range of pages, as returned by split_pdf_pages.
+    strategy : str
+        The strategy to use to parse the pdf file.
+    first_page : int
+        The page number of the first page of the range in the original file.
+    Returns
+    -------
+    List[Element]
+        The elements of the range in reading order.
+    """
+    elements = partition_pdf(file=BytesIO(pdf_bytes), strategy=strategy)
+    for element in elements:
+        if element.metadata.page_number is not None:
+            element.metadata.page_number += first_page - 1
+    return elements
+
+
+def partition_pdf_parallel(
     filename: str = "",
     file: Optional[Union[BinaryIO, SpooledTemporaryFile]] = None,
     strategy: str = "auto",
-    combine_section_under_n_chars: int = 500,
-    new_after_n_chars: int = -1,
-    split_function: Callable = lambda x: [x],
-) -> List[KnowledgeItem]:
+    pages_per_range: int = 20,
+    n_workers: int = 1,
+) -> List[Element]:
     """
-    Parse a pdf file into sections.
+    Partitions a pdf file splitting it into ranges of pages that are partitioned in parallel in a process pool.
+    The elements are merged back in page order, so the sections are built over the whole document and
+    a section that crosses the edge of a range is not cut.
     Parameters
     ----------
     filename : str
@@ -222,7 +310,61 @@ def parse_pdf(
     file : Optional[Union[BinaryIO, SpooledTemporaryFile]]
         The file object of the pdf file.
     strategy : str
-        The strategy to use to parse the pdf file. Can be 'auto', 'fast', 'ocr' or 'high_res'.
+        The strategy to use to parse the pdf file.
+    pages_per_range : int
+        The number of pages partitioned by every worker call.
+    n_workers : int
+        The number of processes of the pool.
+    Returns
+    -------
+    List[Element]
+        The elements of the whole file in reading order.
+    """
+    if file is not None:
+        pdf_bytes = file.read()
+    else:
+        with open(filename, "rb") as f:
+            pdf_bytes = f.read()
+
+    page_ranges = split_pdf_pages(pdf_bytes, pages_per_range)
+    print(f"N page ranges: {len(page_ranges)}")
+
+    if n_workers <= 1 or len(page_ranges) <= 1:
+        ranges_elements = [
+            partition_pdf_range(range_bytes, strategy, first_page)
+            for first_page, range_bytes in page_ranges
+        ]
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_workers, len(page_ranges))) as executor:
+            # map keeps the order of the ranges
+            ranges_elements = list(
+                executor.map(
+                    partition_pdf_range,
+                    [range_bytes for _, range_bytes in page_ranges],
+                    [strategy] * len(page_ranges),
+                    [first_page for first_page, _ in page_ranges],
+                )
+            )
+
+    return [element for elements in ranges_elements for element in elements]
+
+
+def elements_to_k_items(
+    elements: List[Element],
+    file_type: str = "pdf",
+    combine_section_under_n_chars: int = 500,
+    new_after_n_chars: int = -1,
+    split_function: Callable = lambda x: [x],
+    stream: bool = False,
+) -> Union[List[KnowledgeItem], Iterator[KnowledgeItem]]:
+    """
+    Groups the elements of a whole document into sections and transforms them into KnowledgeItems.
+    Parameters
+    ----------
+    elements : List[Element]
+        The elements of the document in reading order.
+    file_type: str
+        The type of file of the elements. Can be 'pdf' or 'html'.
     combine_section_under_n_chars: int
         Combines elements (for example a series of titles) until a section reaches
         a length of n characters.
@@ -230,28 +372,32 @@ def parse_pdf(
         Cuts off new sections once they reach a length of n characters
     split_function: Callable
         A function that takes a knowledge item and returns a list of knowledge items. The default does not split.
+    stream: bool
+        Whether to return a generator that yields the KnowledgeItems as their sections are completed instead of a list.
     Returns
     -------
-    List[KnowledgeItem]
-        A list of KnowledgeItem.
+    Union[List[KnowledgeItem], Iterator[KnowledgeItem]]
+        A list of KnowledgeItem, or a generator of them in stream mode.
     """
-
-    if strategy in ['ocr_only', 'hi_res']:
-        print(f'Using strategy {strategy}. This might take a few minutes.')
-
-    elements = partition_pdf(filename=filename, file=file, strategy=strategy)
-    print(f"N elements: {len(elements)}")
+    if stream:
+        sections = iter_sections(
+            elements,
+            file_type=file_type,
+            combine_section_under_n_chars=combine_section_under_n_chars,
+            new_after_n_chars=new_after_n_chars,
+        )
+        return iter_split_k_items(iter_k_items(sections, file_type=file_type), split_function=split_function)
 
     sections = parse_elements(
         elements,
-        file_type="pdf",
+        file_type=file_type,
         combine_section_under_n_chars=combine_section_under_n_chars,
         new_after_n_chars=new_after_n_chars,
     )
 
     print(f"N sections: {len(sections)}")
 
-    k_items = transform_to_k_items(sections, file_type="pdf")
+    k_items = transform_to_k_items(sections, file_type=file_type)
 
     print(f"N k_items: {len(k_items)}")
 
@@ -262,6 +408,72 @@ def parse_pdf(
     return k_items
 
 
+def parse_pdf(
+    filename: str = "",
+    file: Optional[Union[BinaryIO, SpooledTemporaryFile]] = None,
+    strategy: str = "auto",
+    combine_section_under_n_chars: int = 500,
+    new_after_n_chars: int = -1,
+    split_function: Callable = lambda x: [x],
+    n_workers: int = 1,
+    pages_per_range: int = 20,
+    stream: bool = False,
+) -> Union[List[KnowledgeItem], Iterator[KnowledgeItem]]:
+    """
+    Parse a pdf file into sections.
+    Parameters
+    ----------
+    filename : str
+        The path to the pdf file.
+    file : Optional[Union[BinaryIO, SpooledTemporaryFile]]
+        The file object of the pdf file.
+    strategy : str
+        The strategy to use to parse the pdf file. Can be 'auto', 'fast', 'ocr' or 'high_res'.
+    combine_section_under_n_chars: int
+        Combines elements (for example a series of titles) until a section reaches
+        a length of n characters.
+    new_after_n_chars: int
+        Cuts off new sections once they reach a length of n characters
+    split_function: Callable
+        A function that takes a knowledge item and returns a list of knowledge items. The default does not split.
+    n_workers: int
+        Number of processes used to partition the pdf. With more than one, the file is split into ranges of
+        pages_per_range pages that are partitioned in parallel, by default 1 (whole file in this process).
+    pages_per_range: int
+        Number of pages of every range when n_workers > 1.
+    stream: bool
+        Whether to return a generator that yields the KnowledgeItems as their sections are completed instead of a list.
+    Returns
+    -------
+    Union[List[KnowledgeItem], Iterator[KnowledgeItem]]
+        A list of KnowledgeItem, or a generator of them in stream mode.
+    """
+
+    if strategy in ['ocr_only', 'hi_res']:
+        print(f'Using strategy {strategy}. This might take a few minutes.')
+
+    if n_workers > 1:
+        elements = partition_pdf_parallel(
+            filename=filename,
+            file=file,
+            strategy=strategy,
+            pages_per_range=pages_per_range,
+            n_workers=n_workers,
+        )
+    else:
+        elements = partition_pdf(filename=filename, file=file, strategy=strategy)
+    print(f"N elements: {len(elements)}")
+
+    return elements_to_k_items(
+        elements,
+        file_type="pdf",
+        combine_section_under_n_chars=combine_section_under_n_chars,
+        new_after_n_chars=new_after_n_chars,
+        split_function=split_function,
+        stream=stream,
+    )
+
+
 def parse_html(
     filename: Optional[str] = None,
     file: Optional[IO[bytes]] = None,
@@ -271,7 +483,8 @@ def parse_html(
     combine_section_under_n_chars: int = 500,
     new_after_n_chars: int = -1,
     split_function: Callable = lambda x: [x],
-) -> List[KnowledgeItem]:
+    stream: bool = False,
+) -> Union[List[KnowledgeItem], Iterator[KnowledgeItem]]:
     """
     Parse an html file into sections.
     Parameters
@@ -293,10 +506,12 @@ def parse_html(
         Cuts off new sections once they reach a length of n characters
     split_function: Callable
         A function that takes a knowledge item and returns a list of knowledge items. The default does not split.
+    stream: bool
+        Whether to return a generator that yields the KnowledgeItems as their sections are completed instead of a list.
     Returns
     -------
-    List[KnowledgeItem]
-        A list of KnowledgeItems.
+    Union[List[KnowledgeItem], Iterator[KnowledgeItem]]
+        A list of KnowledgeItems, or a generator of them in stream mode.
     """
     elements = partition_html(
         filename=filename,
@@ -305,6 +520,15 @@ def parse_html(
         url=url,
         encoding=encoding,
     )
+    if stream:
+        sections = iter_sections(
+            elements,
+            file_type="html",
+            combine_section_under_n_chars=combine_section_under_n_chars,
+            new_after_n_chars=new_after_n_chars,
+        )
+        return iter_split_k_items(iter_k_items(sections, file_type="html"), split_function=split_function)
+
     sections = parse_elements(
         elements,
         file_type="html",
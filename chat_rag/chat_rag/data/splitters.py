@@ -5,6 +5,16 @@ import os
 import nltk
 from transformers import AutoTokenizer
 
+def count_tokens(tokenizer, texts: List[str]) -> List[int]:
+    """
+    Returns the number of tokens of every text, the same as len(tokenizer.tokenize(text)), with a single batched
+    call to the tokenizer.
+    """
+    if not texts:
+        return []
+    return [len(input_ids) for input_ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+
+
 class WordSplitter:
     """
     Splits a text into chunks of num_words words with an overlap of chunk_overlap words.
@@ -160,26 +170,26 @@ class TokenSplitter:
                 split_text.append(buffer + item)
                 buffer = ""
         
+        # Count the tokens of every split in a single batched call, so no split is tokenized twice
+        lengths = count_tokens(self.tokenizer, split_text)
+
+        # The current chunk is split_text[start:i], the overlap is made by moving start forward
         chunks = []
-        current_chunk = []
+        start = 0
         current_length = 0
-        for split in split_text:
-            n_tokens = len(self.tokenizer.tokenize(split))
-
-            if current_length + n_tokens > self.chunk_size:
-                chunks.append("".join(current_chunk).strip())
+        for i, n_tokens in enumerate(lengths):
+            if current_length + n_tokens > self.chunk_size and start < i:
+                chunks.append("".join(split_text[start:i]).strip())
                 # start a new chunk with overlap
-                # keep popping off the first element until we have enough space
-                while current_length > self.chunk_overlap or current_length + n_tokens > self.chunk_size:
-                    # pop off the first element
-                    first_chunk = current_chunk.pop(0)
-                    current_length -= len(self.tokenizer.tokenize(first_chunk))
-                    
-            current_chunk.append(split)
+                # keep dropping the first element until we have enough space
+                while start < i and (current_length > self.chunk_overlap or current_length + n_tokens > self.chunk_size):
+                    current_length -= lengths[start]
+                    start += 1
+
             current_length += n_tokens
 
-        if len(current_chunk) > 0:
-            chunks.append("".join(current_chunk).strip())
+        if start < len(split_text):
+            chunks.append("".join(split_text[start:]).strip())
 
         return chunks
     
@@ -216,11 +226,12 @@ class SentenceTokenSplitter:
         # First, we split the text into sentences
         sentences = nltk.sent_tokenize(text)  
         
+        lengths = count_tokens(self.tokenizer, sentences)
+
         chunks = []
         current_chunk = []
         current_length = 0
-        for sentence in sentences:
-            n_tokens = len(self.tokenizer.tokenize(sentence))
+        for sentence, n_tokens in zip(sentences, lengths):
 
             if current_length + n_tokens > self.chunk_size and len(current_chunk) > 0: # if the current sentence does not fit in the current chunk, start a new chunk
                 chunks.append(" ".join(current_chunk).strip())
@@ -1,2 +1,4 @@
 from chat_rag.embedding_models.base_model import BaseModel
-from chat_rag.embedding_models.e5_model import E5Model
\ No newline at end of file
+from chat_rag.embedding_models.e5_model import E5Model
+from chat_rag.embedding_models.embedding_cache import EmbeddingCache
+from chat_rag.embedding_models.onnx_model import ONNXEncoder
\ No newline at end of file
@@ -1,12 +1,16 @@
 from logging import getLogger
 from typing import List
 
+import numpy as np
 import torch
 import torch.nn.functional as F
 from torch import Tensor
 from tqdm import tqdm
 from transformers import AutoModel, AutoTokenizer
 
+from chat_rag.embedding_models.embedding_cache import EmbeddingCache
+from chat_rag.embedding_models.onnx_model import PARITY_TEXTS, ONNXEncoder
+
 logger = getLogger(__name__)
 
 
@@ -21,6 +25,9 @@ class BaseModel:
         use_cpu: bool = False,
         huggingface_key: str = None,
         trust_remote_code: bool = False,
+        embedding_cache: EmbeddingCache = None,
+        use_onnx: bool = False,
+        onnx_cache_dir: str = None,
         **kwargs,
     ):
         """
@@ -34,6 +41,12 @@ class BaseModel:
             Huggingface key to be used for private models, by default None
         trust_remote_code : bool, optional
             Whether to trust the remote code, by default False
+        embedding_cache : EmbeddingCache, optional
+            Cache consulted by build_embeddings to skip already embedded texts, by default None
+        use_onnx : bool, optional
+            Whether to run the model with onnxruntime and dynamic int8 quantization, only on CPU, by default False
+        onnx_cache_dir : str, optional
+            Directory where the exported ONNX models are cached, by default None ('~/.cache/chat_rag/onnx')
         """
 
         self.device = "cuda" if (not use_cpu and torch.cuda.is_available()) else "cpu"
@@ -41,6 +54,9 @@ class BaseModel:
         logger.info(f"Using device {self.device}")
         logger.info(f"Loading model {model_name}")
 
+        self.model_name = model_name
+        self.embedding_cache = embedding_cache
+
         self.tokenizer = AutoTokenizer.from_pretrained(
             model_name, token=huggingface_key
         )
@@ -52,6 +68,66 @@ class BaseModel:
             **kwargs,
         ).to(self.device)
 
+        if use_onnx:
+            self.enable_onnx(onnx_cache_dir)
+
+    def enable_onnx(self, cache_dir: str = None, quantize: bool = True, min_similarity: float = 0.99):
+        """
+        Replaces the torch model with an ONNX export running under onnxruntime. The export is cached in
+        cache_dir so it only happens once per model.
+        The ONNX embeddings are compared with the torch ones on a few texts, if their cosine similarity is below
+        min_similarity the torch model is kept, as they would be compared with embeddings built with torch.
+        Parameters
+        ----------
+        cache_dir : str, optional
+            Directory where the exported ONNX models are cached, by default None ('~/.cache/chat_rag/onnx')
+        quantize : bool, optional
+            Whether to apply dynamic int8 quantization, by default True
+        min_similarity : float, optional
+            Minimum cosine similarity between the ONNX and torch embeddings to use the ONNX model, by default 0.99
+        Returns
+        -------
+        float
+            The lowest cosine similarity between the ONNX and torch embeddings, or None if ONNX is not supported.
+        """
+        if self.device != "cpu":
+            logger.warning("ONNX inference is only supported on CPU, using the torch model.")
+            return None
+
+        onnx_encoder = ONNXEncoder(
+            self.model,
+            self.tokenizer,
+            self.model_name,
+            cache_dir=cache_dir,
+            quantize=quantize,
+        )
+
+        similarity = self.parity(onnx_encoder)
+        if similarity < min_similarity:
+            logger.warning(
+                f"The {onnx_encoder.engine} embeddings differ from the torch ones (cosine similarity {similarity:.4f} < {min_similarity}), using the torch model."
+            )
+        else:
+            logger.info(f"Using the {onnx_encoder.engine} model (cosine similarity with torch {similarity:.4f})")
+            self.model = onnx_encoder
+        return similarity
+
+    def parity(self, other_model, texts: List[str] = None) -> float:
+        """
+        Returns the lowest cosine similarity between the embeddings of the texts computed with the current model
+        and with other_model.
+        """
+        texts = texts or PARITY_TEXTS
+        model = self.model
+        embeddings = self.encode(texts, disable_progress_bar=True)
+        try:
+            self.model = other_model
+            other_embeddings = self.encode(texts, disable_progress_bar=True)
+        finally:
+            self.model = model
+        # The embeddings are normalized
+        return (embeddings * other_embeddings).sum(dim=1).min().item()
+
     def average_pool(
         self, last_hidden_states: Tensor, attention_mask: Tensor
     ) -> Tensor:
@@ -73,14 +149,55 @@ class BaseModel:
         )
         return last_hidden.sum(dim=1) / attention_mask.sum(dim=1)[..., None]
 
+    def _make_batches(
+        self, lengths: List[int], batch_size: int, max_tokens_per_batch: int = None
+    ) -> List[List[int]]:
+        """
+        Groups the inputs into batches of similar length to minimize padding.
+        Parameters
+        ----------
+        lengths : List[int]
+            Number of tokens of every input.
+        batch_size : int
+            Maximum number of inputs per batch.
+        max_tokens_per_batch : int, optional
+            Maximum number of tokens per batch, padding included, by default None (no limit).
+        Returns
+        -------
+        List[List[int]]
+            Indexes of the inputs of every batch.
+        """
+        # Longest first, so the first input of every batch sets its padded length
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+
+        batches = []
+        current = []
+        for i in order:
+            if current:
+                padded_tokens = (len(current) + 1) * lengths[current[0]]
+                if len(current) >= batch_size or (
+                    max_tokens_per_batch is not None
+                    and padded_tokens > max_tokens_per_batch
+                ):
+                    batches.append(current)
+                    current = []
+            current.append(i)
+        if current:
+            batches.append(current)
+
+        return batches
+
     def encode(
         self,
         queries: List[str],
         batch_size: int = -1,
         disable_progress_bar: bool = False,
+        max_tokens_per_batch: int = None,
     ) -> torch.Tensor:
         """
         Returns the embeddings of the queries.
+        Inputs are sorted by token length and batched together with inputs of similar length, the
+        embeddings are returned in the original order.
         Parameters
         ----------
         queries : List[str]
@@ -89,26 +206,35 @@ class BaseModel:
             Batch size, by default -1 (no batching).
         disable_progress_bar : bool, optional
             Whether to disable the progress bar, by default False.
+        max_tokens_per_batch : int, optional
+            Maximum number of tokens per batch, padding included, by default None (only batch_size limits the batches).
         Returns
         -------
         torch.Tensor
             Embeddings of the queries.
         """
+        if not queries:
+            return torch.tensor([])
+
         if batch_size == -1:
             batch_size = len(queries)
 
-        all_embeddings = torch.tensor([])
+        # Tokenize everything once without padding, the padding is applied per batch
+        encoded_queries = self.tokenizer(queries, truncation=True)
+        lengths = [len(input_ids) for input_ids in encoded_queries["input_ids"]]
+        batches = self._make_batches(lengths, batch_size, max_tokens_per_batch)
+
+        all_embeddings = None
 
         # Compute token embeddings
         with torch.inference_mode():
-            for i in tqdm(
-                range(0, len(queries), batch_size), disable=disable_progress_bar
-            ):
-                # Tokenize sentences
-                encoded_input = self.tokenizer(
-                    queries[i : i + batch_size],
+            for batch_indexes in tqdm(batches, disable=disable_progress_bar):
+                encoded_input = self.tokenizer.pad(
+                    [
+                        {key: val[i] for key, val in encoded_queries.items()}
+                        for i in batch_indexes
+                    ],
                     padding=True,
-                    truncation=True,
                     return_tensors="pt",
                 ).to(self.device)
                 inputs = {key: val for key, val in encoded_input.items()}
@@ -122,7 +248,13 @@ class BaseModel:
                 del model_output
 
                 embeddings = F.normalize(embeddings, p=2, dim=1).cpu()
-                all_embeddings = torch.cat((all_embeddings, embeddings))
+
+                if all_embeddings is None:
+                    all_embeddings = torch.empty(
+                        (len(queries), embeddings.shape[1]), dtype=embeddings.dtype
+                    )
+                # Scatter back to the original positions
+                all_embeddings[batch_indexes] = embeddings
 
         torch.cuda.empty_cache()
 
@@ -134,6 +266,7 @@ class BaseModel:
         batch_size: int = 1,
         prefix: str = "",
         disable_progress_bar: bool = False,
+        max_tokens_per_batch: int = None,
     ):
         """
         Builds the embeddings for the context.
@@ -145,10 +278,67 @@ class BaseModel:
             Batch size to be used for encoding the context, by default 1
         prefix : str, optional
             Prefix or instruction to be added to the context. Sometimes is used for instruct embedding models like Instructor models or intfloat/multilingual-e5-large-instruct.
+        max_tokens_per_batch : int, optional
+            Maximum number of tokens per batch, padding included, by default None (no limit).
         """
         logger.info("Building embeddings...")
 
+        if self.embedding_cache is not None:
+            return self._build_embeddings_cached(
+                contents, batch_size, prefix, disable_progress_bar, max_tokens_per_batch
+            )
+
         contents = [prefix + content for content in contents]  # add prefix to answers
-        embeddings = self.encode(contents, batch_size, disable_progress_bar)
+        embeddings = self.encode(
+            contents, batch_size, disable_progress_bar, max_tokens_per_batch
+        )
+
+        return embeddings
+
+    def _build_embeddings_cached(
+        self,
+        contents: List[str],
+        batch_size: int,
+        prefix: str,
+        disable_progress_bar: bool,
+        max_tokens_per_batch: int,
+    ) -> torch.Tensor:
+        """
+        Builds the embeddings only for the contents missing from the embedding cache.
+        """
+        # Embeddings of the ONNX engine differ slightly from the torch ones, so they are not mixed
+        model_key = self.model_name
+        if isinstance(self.model, ONNXEncoder):
+            model_key = f"{self.model_name}|{self.model.engine}"
+
+        keys = [
+            self.embedding_cache.make_key(model_key, prefix, content)
+            for content in contents
+        ]
+        cached = self.embedding_cache.get_many(keys)
+
+        # Encode each missing text only once, even if it is repeated in contents
+        missing = {}
+        for key, content in zip(keys, contents):
+            if key not in cached and key not in missing:
+                missing[key] = prefix + content
+
+        if missing:
+            new_embeddings = self.encode(
+                list(missing.values()),
+                batch_size,
+                disable_progress_bar,
+                max_tokens_per_batch,
+            ).numpy()
+            new_items = list(zip(missing.keys(), new_embeddings))
+            self.embedding_cache.set_many(new_items)
+            cached.update(new_items)
+
+        logger.info(
+            f"Embedding cache: {len(contents) - len(missing)} of {len(contents)} contents cached. Stats: {self.embedding_cache.stats()}"
+        )
+
+        if not contents:
+            return torch.tensor([])
 
-        return embeddings
\ No newline at end of file
+        return torch.from_numpy(np.stack([cached[key] for key in keys]))
\ No newline at end of file
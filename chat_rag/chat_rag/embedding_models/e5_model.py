@@ -4,6 +4,7 @@ import torch
 from transformers import AutoTokenizer, AutoModel
 
 from chat_rag.embedding_models.base_model import BaseModel
+from chat_rag.embedding_models.embedding_cache import EmbeddingCache
 
 logger = getLogger(__name__)
 
@@ -18,6 +19,9 @@ class E5Model(BaseModel):
         model_name: str = "intfloat/e5-small-v2",
         use_cpu: bool = False,
         huggingface_key: str = None,
+        embedding_cache: EmbeddingCache = None,
+        use_onnx: bool = False,
+        onnx_cache_dir: str = None,
     ):
         """
         Parameters
@@ -28,6 +32,12 @@ class E5Model(BaseModel):
             Whether to use CPU for encoding, by default False
         huggingface_key : str, optional
             Huggingface key to be used for private models, by default None
+        embedding_cache : EmbeddingCache, optional
+            Cache consulted by build_embeddings to skip already embedded texts, by default None
+        use_onnx : bool, optional
+            Whether to run the model with onnxruntime and dynamic int8 quantization, only on CPU, by default False
+        onnx_cache_dir : str, optional
+            Directory where the exported ONNX models are cached, by default None ('~/.cache/chat_rag/onnx')
         """
 
         self.device = "cuda" if (not use_cpu and torch.cuda.is_available()) else "cpu"
@@ -35,6 +45,9 @@ class E5Model(BaseModel):
         logger.info(f"Using device {self.device}")
         logger.info(f"Loading model {model_name}")
 
+        self.model_name = model_name
+        self.embedding_cache = embedding_cache
+
         self.tokenizer = AutoTokenizer.from_pretrained(
             model_name, token=huggingface_key
         )
@@ -47,9 +60,12 @@ class E5Model(BaseModel):
             token=huggingface_key,
         ).to(self.device)
 
-    def build_embeddings(self, contents: torch.List[str] = None, batch_size: int = 1, prefix: str = "passage: ", disable_progress_bar: bool = False):
+        if use_onnx:
+            self.enable_onnx(onnx_cache_dir)
+
+    def build_embeddings(self, contents: torch.List[str] = None, batch_size: int = 1, prefix: str = "passage: ", disable_progress_bar: bool = False, max_tokens_per_batch: int = None):
         """
         In the E5 Models we use the prefix 'passage: ' for the context and 'query: ' for the query.
         """
 
-        return super().build_embeddings(contents, batch_size, prefix, disable_progress_bar)
\ No newline at end of file
+        return super().build_embeddings(contents, batch_size, prefix, disable_progress_bar, max_tokens_per_batch)
\ No newline at end of file
@@ -0,0 +1,136 @@
+import hashlib
+import os
+import sqlite3
+from collections import OrderedDict
+from logging import getLogger
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    Two tier cache of embeddings keyed on (model_name, prefix, sha256(text)).
+    The first tier is a bounded in-memory LRU and the second an optional sqlite blob store on disk,
+    so it can be shared between indexing runs and the serving replicas of a node.
+    The sqlite file is opened in WAL mode with a busy timeout, so concurrent writers wait for each other, and any
+    sqlite error is logged and treated as a cache miss instead of failing the embedding.
+    """
+
+    def __init__(self, path: str = None, max_memory_items: int = 10000, timeout: float = 30):
+        """
+        Parameters
+        ----------
+        path : str, optional
+            Path to the sqlite file of the on-disk tier, by default None (in-memory tier only).
+        max_memory_items : int, optional
+            Maximum number of embeddings kept in the in-memory tier, by default 10000.
+        timeout : float, optional
+            Seconds to wait for the sqlite lock held by another process, by default 30.
+        """
+        self.max_memory_items = max_memory_items
+        self.memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        self.lock = Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.db = None
+        if path is not None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.db = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+            self.db.execute(f"PRAGMA busy_timeout={int(timeout * 1000)}")
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, embedding BLOB NOT NULL)"
+            )
+            self.db.commit()
+            logger.info(f"Embedding cache persisted at {path}")
+
+    @staticmethod
+    def make_key(model_name: str, prefix: str, text: str) -> str:
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model_name}|{prefix}|{text_hash}"
+
+    def _remember(self, key: str, embedding: np.ndarray):
+        self.memory[key] = embedding
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_items:
+            self.memory.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Returns the cached embeddings of the given keys, missing keys are not included.
+        """
+        found = {}
+        with self.lock:
+            for key in keys:
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    found[key] = self.memory[key]
+            self.memory_hits += len(found)
+
+            pending = [key for key in dict.fromkeys(keys) if key not in found]
+            if self.db is not None and pending:
+                try:
+                    # Stay below the sqlite limit of variables per statement
+                    for i in range(0, len(pending), 500):
+                        chunk = pending[i : i + 500]
+                        rows = self.db.execute(
+                            f"SELECT key, embedding FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                            chunk,
+                        ).fetchall()
+                        for key, blob in rows:
+                            embedding = np.frombuffer(blob, dtype=np.float32)
+                            found[key] = embedding
+                            self._remember(key, embedding)
+                            self.disk_hits += 1
+                except sqlite3.OperationalError as e:  # e.g. still locked after the timeout
+                    logger.warning(f"Could not read the embedding cache, treating it as a miss: {e}")
+
+            self.misses += len(set(keys) - found.keys())
+
+        return found
+
+    def set_many(self, items: List[Tuple[str, np.ndarray]]):
+        """
+        Stores the embeddings in both tiers.
+        """
+        with self.lock:
+            for key, embedding in items:
+                self._remember(key, np.asarray(embedding, dtype=np.float32))
+
+            if self.db is not None and items:
+                try:
+                    with self.db:
+                        self.db.executemany(
+                            "INSERT OR REPLACE INTO embeddings (key, embedding) VALUES (?, ?)",
+                            [
+                                (key, np.asarray(embedding, dtype=np.float32).tobytes())
+                                for key, embedding in items
+                            ],
+                        )
+                except sqlite3.OperationalError as e:
+                    logger.warning(f"Could not write to the embedding cache, the embeddings stay in memory only: {e}")
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """
+        Returns the hit and miss counters and the hit rate of the cache.
+        """
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else None,
+        }
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
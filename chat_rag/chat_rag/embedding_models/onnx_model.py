@@ -0,0 +1,168 @@
+import os
+import tempfile
+from logging import getLogger
+from types import SimpleNamespace
+
+import torch
+from transformers import PreTrainedModel, PreTrainedTokenizer
+
+logger = getLogger(__name__)
+
+# Texts of different lengths and languages used to check that the ONNX embeddings match the torch ones
+PARITY_TEXTS = [
+    "query: how do I reset my password?",
+    "passage: To reset your password go to the settings page, click on 'Security' and follow the instructions "
+    "sent to your email address. The link expires after 24 hours.",
+    "query: ¿Cuál es el horario de atención al cliente?",
+    "passage: Le service client est disponible du lundi au vendredi de 9h à 18h, sauf les jours fériés.",
+    "Yes",
+]
+
+
+def _atomic_path(path: str) -> str:
+    """
+    Returns a temporary path next to path, to write the file there and os.replace it into place, so concurrent
+    processes never read a half-written model.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp.onnx")
+    os.close(fd)
+    return tmp_path
+
+try:
+    import onnxruntime as ort
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+except ImportError:
+    ort = None
+
+
+class _LastHiddenStateWrapper(torch.nn.Module):
+    """
+    Exposes only the last hidden state so the exported graph has a single output.
+    """
+
+    def __init__(self, model: PreTrainedModel):
+        super().__init__()
+        self.model = model
+
+    def forward(self, *inputs):
+        return self.model(*inputs, return_dict=True).last_hidden_state
+
+
+class ONNXEncoder:
+    """
+    Drop-in replacement of the HF encoder used by BaseModel.encode, running an exported (and optionally
+    int8 dynamically quantized) copy of the model under onnxruntime on CPU.
+    """
+
+    def __init__(
+        self,
+        model: PreTrainedModel,
+        tokenizer: PreTrainedTokenizer,
+        model_name: str,
+        cache_dir: str = None,
+        quantize: bool = True,
+        num_threads: int = None,
+    ):
+        """
+        Parameters
+        ----------
+        model : PreTrainedModel
+            The torch model to export, only used when there is no cached artifact.
+        tokenizer : PreTrainedTokenizer
+            The tokenizer of the model, used to know the model inputs.
+        model_name : str
+            Name of the model, used to name the cached artifact.
+        cache_dir : str, optional
+            Directory where the exported models are cached, by default '~/.cache/chat_rag/onnx'.
+        quantize : bool, optional
+            Whether to apply dynamic int8 quantization to the exported model, by default True.
+        num_threads : int, optional
+            Number of intra-op threads of the onnxruntime session, by default None (onnxruntime default).
+        """
+        if ort is None:
+            raise ImportError(
+                "onnxruntime is required for the ONNX inference mode. Install it with `pip install onnxruntime`."
+            )
+
+        cache_dir = cache_dir or os.path.join(
+            os.path.expanduser("~"), ".cache", "chat_rag", "onnx"
+        )
+        model_dir = os.path.join(cache_dir, model_name.replace("/", "__"))
+        os.makedirs(model_dir, exist_ok=True)
+
+        self.input_names = [
+            name
+            for name in ["input_ids", "attention_mask", "token_type_ids"]
+            if name in tokenizer.model_input_names
+        ]
+
+        fp32_path = os.path.join(model_dir, "model.onnx")
+        if not os.path.exists(fp32_path):
+            self._export(model, fp32_path)
+
+        model_path = fp32_path
+        self.engine = "onnx-int8" if quantize else "onnx"
+        if quantize:
+            model_path = os.path.join(model_dir, "model.int8.onnx")
+            if not os.path.exists(model_path):
+                logger.info(f"Quantizing {fp32_path} to int8")
+                tmp_path = _atomic_path(model_path)
+                try:
+                    quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+                    os.replace(tmp_path, model_path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+
+        session_options = ort.SessionOptions()
+        session_options.graph_optimization_level = (
+            ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        if num_threads is not None:
+            session_options.intra_op_num_threads = num_threads
+
+        logger.info(f"Loading ONNX model {model_path}")
+        self.session = ort.InferenceSession(
+            model_path, session_options, providers=["CPUExecutionProvider"]
+        )
+
+    def _export(self, model: PreTrainedModel, path: str):
+        logger.info(f"Exporting model to ONNX at {path}")
+        dummy_inputs = tuple(
+            (torch.zeros if name == "token_type_ids" else torch.ones)(
+                (1, 8), dtype=torch.long, device=model.device
+            )
+            for name in self.input_names
+        )
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in self.input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+        tmp_path = _atomic_path(path)
+        try:
+            with torch.no_grad():
+                torch.onnx.export(
+                    _LastHiddenStateWrapper(model).eval(),
+                    dummy_inputs,
+                    tmp_path,
+                    input_names=self.input_names,
+                    output_names=["last_hidden_state"],
+                    dynamic_axes=dynamic_axes,
+                    opset_version=14,
+                )
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def __call__(self, return_dict: bool = True, **inputs) -> SimpleNamespace:
+        """
+        Runs the session with the same keyword inputs as the HF model and returns an object with the
+        last_hidden_state attribute, like the HF model output.
+        """
+        feeds = {
+            name: inputs[name].cpu().numpy()
+            for name in self.input_names
+            if name in inputs
+        }
+        (last_hidden_state,) = self.session.run(["last_hidden_state"], feeds)
+        return SimpleNamespace(last_hidden_state=torch.from_numpy(last_hidden_state))
@@ -1,10 +1,10 @@
-import asyncio
 import json
-from typing import Dict, List
+from typing import Any, Dict, List, Optional, Union
 
 from pydantic import BaseModel, Field
 
 from chat_rag.llms import LLM
+from chat_rag.llms.batch_executor import BatchExecutor
 
 
 class SubmitClusterTitle(BaseModel):
@@ -81,20 +81,29 @@ async def agenerate_intent(cluster_texts: List[Dict], llm: LLM) -> str:
 
 
 # Batch processing
-async def agenerate_intents(clusters_texts: List[List[Dict]], llm: LLM) -> List[str]:
+async def agenerate_intents(
+    clusters_texts: Union[Dict[Any, List[Dict]], List[List[Dict]]],
+    llm: LLM,
+    executor: BatchExecutor = None,
+) -> List[Optional[str]]:
     """
     Generate intents for the given clusters texts.
     Parameters
     ----------
-    clusters_texts : List[List[Dict]]
-        List of list of dictionaries containing the cluster texts.
+    clusters_texts : Union[Dict[Any, List[Dict]], List[List[Dict]]]
+        The cluster texts of every cluster, by cluster label or as a list.
     llm : LLM
         The language model to use.
+    executor : BatchExecutor, optional
+        Limits the concurrency and retries the calls, by default a BatchExecutor with its default settings.
     Returns
     -------
-    List[str]
-        The generated intents.
+    List[Optional[str]]
+        The generated intents in the order of the clusters, None for the clusters that failed.
     """
-    tasks = [agenerate_intent(cluster_texts, llm) for cluster_texts in list(clusters_texts.values())]
-    intents =  await asyncio.gather(*tasks)
-    return intents
\ No newline at end of file
+    if isinstance(clusters_texts, dict):
+        clusters_texts = list(clusters_texts.values())
+
+    executor = executor or BatchExecutor(provider=type(llm).__name__)
+    batch_result = await executor.run(lambda cluster_texts: agenerate_intent(cluster_texts, llm), clusters_texts)
+    return batch_result.results
@@ -1,4 +1,6 @@
 from chat_rag.llms.base_llm import LLM
+from chat_rag.llms.batch_executor import BatchExecutor, BatchResult
+from chat_rag.llms.prompt_budget import PromptBudget
 from chat_rag.llms.claude_client import ClaudeChatModel
 # from chat_rag.llms.hf_llm import HFModel
 from chat_rag.llms.mistral_client import MistralChatModel
@@ -16,6 +18,9 @@ __all__ = [
     "GGMLModel",
     "HFModel",
     "format_tools",
+    "PromptBudget",
+    "BatchExecutor",
+    "BatchResult",
 ]
 
 
@@ -0,0 +1,198 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from logging import getLogger
+from typing import Awaitable, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+from weakref import WeakKeyDictionary
+
+logger = getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Exception class names of the SDKs for transient network errors, which have no status code
+RETRYABLE_EXCEPTION_NAMES = [
+    "APIConnectionError",
+    "APITimeoutError",
+    "MistralConnectionException",
+]
+
+
+def is_retryable(exception: BaseException) -> bool:
+    """
+    Whether the exception is a transient error worth retrying: rate limits (429), server errors (5xx) or
+    connection errors.
+    """
+    status = getattr(exception, "status_code", None) or getattr(exception, "http_status", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return isinstance(exception, (asyncio.TimeoutError, ConnectionError)) or (
+        type(exception).__name__ in RETRYABLE_EXCEPTION_NAMES
+    )
+
+
+class TokenBucket:
+    """
+    Async token bucket limiting the requests per second to a provider, shared by the executors of the provider.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        Parameters
+        ----------
+        rate : float
+            Tokens (requests) added per second.
+        capacity : float, optional
+            Maximum burst, by default one second of requests.
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+_rate_limiters: "WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, TokenBucket]]" = WeakKeyDictionary()
+
+
+def get_rate_limiter(provider: str, requests_per_second: float) -> TokenBucket:
+    """
+    Returns the token bucket of the provider in the running event loop, asyncio locks can't be shared between loops.
+    """
+    rate_limiters = _rate_limiters.setdefault(asyncio.get_running_loop(), {})
+    key = (provider, requests_per_second)
+    if key not in rate_limiters:
+        rate_limiters[key] = TokenBucket(requests_per_second)
+    return rate_limiters[key]
+
+
+def release_rate_limiters():
+    """
+    Drops the token buckets of the running event loop, call it before the loop is closed. Their locks reference the
+    loop, so they would keep it alive.
+    """
+    _rate_limiters.pop(asyncio.get_running_loop(), None)
+
+
+@dataclass
+class BatchResult(Generic[R]):
+    """
+    Results of a batch in the order of the inputs, the failed inputs have None as result and their exception in errors.
+    """
+
+    results: List[Optional[R]]
+    errors: Dict[int, BaseException] = field(default_factory=dict)
+
+    @property
+    def n_failed(self) -> int:
+        return len(self.errors)
+
+
+class BatchExecutor:
+    """
+    Runs an async function over a batch of inputs with bounded concurrency, an optional per-provider rate limit
+    and jittered exponential backoff on transient errors. A failed input doesn't fail the batch, the partial
+    results are returned.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        requests_per_second: float = None,
+        provider: str = None,
+        progress_callback: Callable[[int, int, int], None] = None,
+    ):
+        """
+        Parameters
+        ----------
+        max_concurrency : int, optional
+            Maximum number of calls in flight, by default 8.
+        max_retries : int, optional
+            Maximum number of retries of a call on transient errors, by default 5.
+        base_delay : float, optional
+            Delay of the first retry in seconds, doubled on every retry, by default 1.0.
+        max_delay : float, optional
+            Maximum delay between retries in seconds, by default 30.0.
+        requests_per_second : float, optional
+            Rate limit of the calls, shared with the other executors of the same provider, by default None (no limit).
+        provider : str, optional
+            Name of the provider the rate limit applies to, e.g. the LLM class name.
+        progress_callback : Callable[[int, int, int], None], optional
+            Called with the number of finished inputs, the total and the number of failed inputs after each input.
+        """
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.requests_per_second = requests_per_second
+        self.provider = provider
+        self.progress_callback = progress_callback
+
+    async def _call_with_retries(self, func: Callable[[T], Awaitable[R]], item: T, rate_limiter: Optional[TokenBucket]) -> R:
+        attempt = 0
+        while True:
+            if rate_limiter is not None:
+                await rate_limiter.acquire()
+            try:
+                return await func(item)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                # Full jitter so the retries of concurrent calls don't hit the provider at the same time
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+                logger.warning(f"Retrying after {delay:.1f}s ({attempt + 1}/{self.max_retries}): {e}")
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def run(self, func: Callable[[T], Awaitable[R]], inputs: List[T]) -> BatchResult[R]:
+        """
+        Calls func on every input.
+        Parameters
+        ----------
+        func : Callable[[T], Awaitable[R]]
+            Async function to call on every input.
+        inputs : List[T]
+            The inputs of the batch.
+        Returns
+        -------
+        BatchResult[R]
+            The results in the order of the inputs and the errors of the failed ones.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        rate_limiter = (
+            get_rate_limiter(self.provider, self.requests_per_second)
+            if self.requests_per_second
+            else None
+        )
+        batch_result = BatchResult(results=[None] * len(inputs))
+        n_done = 0
+
+        async def run_one(index: int, item: T):
+            nonlocal n_done
+            async with semaphore:
+                try:
+                    batch_result.results[index] = await self._call_with_retries(func, item, rate_limiter)
+                except Exception as e:
+                    logger.error(f"Input {index} of the batch failed: {e}")
+                    batch_result.errors[index] = e
+            n_done += 1
+            if self.progress_callback is not None:
+                self.progress_callback(n_done, len(inputs), batch_result.n_failed)
+
+        await asyncio.gather(*[run_one(index, item) for index, item in enumerate(inputs)])
+        return batch_result
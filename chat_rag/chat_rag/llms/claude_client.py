@@ -1,10 +1,11 @@
 import os
 from typing import Dict, List, Union
 
-from anthropic import Anthropic, AsyncAnthropic
 from anthropic._types import NOT_GIVEN
 from pydantic import BaseModel
 
+from chat_rag.utils.http_clients import get_anthropic_client
+
 from .base_llm import LLM
 from .format_tools import Mode, format_tools
 
@@ -12,12 +13,13 @@ from .format_tools import Mode, format_tools
 class ClaudeChatModel(LLM):
     def __init__(self, llm_name: str = "claude-3-opus-20240229", **kwargs) -> None:
         self.llm_name = llm_name
-        self.client = Anthropic(
-            api_key=os.environ.get("ANTHROPIC_API_KEY"),
-        )
-        self.aclient = AsyncAnthropic(
-            api_key=os.environ.get("ANTHROPIC_API_KEY"),
-        )
+        self.api_key = os.environ.get("ANTHROPIC_API_KEY")
+        self.client = get_anthropic_client(api_key=self.api_key)
+
+    @property
+    def aclient(self):
+        # Pooled per event loop, see chat_rag.utils.http_clients
+        return get_anthropic_client(api_key=self.api_key, is_async=True)
 
     def _format_tools(self, tools: List[BaseModel], tool_choice: str):
         """
@@ -1,11 +1,11 @@
 import os
 from typing import Dict, List, Union
 
-from mistralai.async_client import MistralAsyncClient
-from mistralai.client import MistralClient
 from mistralai.models.chat_completion import ChatMessage
 from pydantic import BaseModel
 
+from chat_rag.utils.http_clients import get_mistral_client
+
 from .base_llm import LLM
 from .format_tools import Mode, format_tools
 
@@ -15,10 +15,15 @@ class MistralChatModel(LLM):
         llm_name: str = "mistral-large-latest",
         **kwargs,
     ):
-        self.client = MistralClient(api_key=os.environ["MISTRAL_API_KEY"])
-        self.aclient = MistralAsyncClient(api_key=os.environ["MISTRAL_API_KEY"])
+        self.api_key = os.environ["MISTRAL_API_KEY"]
+        self.client = get_mistral_client(api_key=self.api_key)
         self.llm_name = llm_name
 
+    @property
+    def aclient(self):
+        # Pooled per event loop, see chat_rag.utils.http_clients
+        return get_mistral_client(api_key=self.api_key, is_async=True)
+
     def format_prompt(
         self,
         messages: List[Dict[str, str]],
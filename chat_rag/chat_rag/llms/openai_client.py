@@ -1,9 +1,10 @@
 import os
 from typing import Dict, List, Union
 
-from openai import AsyncOpenAI, OpenAI
 from pydantic import BaseModel
 
+from chat_rag.utils.http_clients import get_openai_client
+
 from .base_llm import LLM
 from .format_tools import Mode, format_tools
 
@@ -26,10 +27,16 @@ class OpenAIChatModel(LLM):
             else api_key
         )
 
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
-        self.aclient = AsyncOpenAI(api_key=api_key, base_url=base_url)
+        self.api_key = api_key
+        self.base_url = base_url
+        self.client = get_openai_client(api_key=api_key, base_url=base_url)
         self.llm_name = llm_name
 
+    @property
+    def aclient(self):
+        # Pooled per event loop, see chat_rag.utils.http_clients
+        return get_openai_client(api_key=self.api_key, base_url=self.base_url, is_async=True)
+
     def _format_tools(self, tools: List[BaseModel], tool_choice: str = None):
         """
         Format the tools from a generic BaseModel to the OpenAI format.
@@ -0,0 +1,99 @@
+import hashlib
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import accumulate
+from threading import Lock
+from typing import Callable, Dict, List
+
+
+class PromptBudget:
+    """
+    Fits the messages of a conversation and the retrieved contexts in a token budget.
+    Every text is tokenized only once, its count is cached by content hash so the messages of a conversation
+    are not tokenized again on every turn, and the largest fitting selection is found with prefix sums
+    instead of re-tokenizing the whole prompt after dropping each message.
+    """
+
+    def __init__(
+        self,
+        tokenizer=None,
+        count_tokens: Callable[[List[str]], List[int]] = None,
+        message_overhead: int = 0,
+        max_cache_items: int = 10000,
+    ):
+        """
+        Parameters
+        ----------
+        tokenizer : PreTrainedTokenizer, optional
+            HF tokenizer used to count the tokens.
+        count_tokens : Callable[[List[str]], List[int]], optional
+            Function returning the number of tokens of a batch of texts, used if there is no tokenizer.
+            Without both the count is estimated as 4 characters per token, e.g. for API models.
+        message_overhead : int, optional
+            Tokens added by the chat template to every message, by default 0.
+        max_cache_items : int, optional
+            Maximum number of cached counts, by default 10000.
+        """
+        self.tokenizer = tokenizer
+        self._count_tokens = count_tokens
+        self.message_overhead = message_overhead
+        self.max_cache_items = max_cache_items
+        self.cache: OrderedDict[str, int] = OrderedDict()
+        self.lock = Lock()
+
+    def _count_uncached(self, texts: List[str]) -> List[int]:
+        if self.tokenizer is not None:
+            from chat_rag.data.splitters import count_tokens
+
+            return count_tokens(self.tokenizer, texts)
+        if self._count_tokens is not None:
+            return self._count_tokens(texts)
+        return [len(text) // 4 + 1 for text in texts]
+
+    def counts(self, texts: List[str]) -> List[int]:
+        """
+        Returns the number of tokens of every text, only the texts not seen before are tokenized, in one batch.
+        """
+        keys = [hashlib.sha1(text.encode("utf-8")).hexdigest() for text in texts]
+        found: Dict[str, int] = {}
+        with self.lock:
+            for key in keys:
+                if key in self.cache:
+                    self.cache.move_to_end(key)
+                    found[key] = self.cache[key]
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            new_counts = self._count_uncached(list(missing.values()))
+            with self.lock:
+                for key, count in zip(missing.keys(), new_counts):
+                    found[key] = count
+                    self.cache[key] = count
+                while len(self.cache) > self.max_cache_items:
+                    self.cache.popitem(last=False)
+
+        return [found[key] for key in keys]
+
+    def count(self, text: str) -> int:
+        return self.counts([text])[0]
+
+    def fit_messages(self, messages: List[Dict[str, str]], budget: int) -> int:
+        """
+        Returns the number of messages of the largest suffix of the conversation that fits in the budget.
+        """
+        costs = [
+            count + self.message_overhead
+            for count in self.counts([message["content"] for message in messages])
+        ]
+        # suffix_sums[i] is the cost of the last i + 1 messages
+        suffix_sums = list(accumulate(reversed(costs)))
+        return bisect_right(suffix_sums, budget)
+
+    def fit_contexts(self, contexts: List[str], budget: int, separator: str = "\n- ") -> int:
+        """
+        Returns how many of the first contexts, in retrieval order, fit in the budget when joined with the separator.
+        """
+        separator_tokens = self.count(separator) if separator else 0
+        costs = [count + separator_tokens for count in self.counts(contexts)]
+        prefix_sums = list(accumulate(costs))
+        return bisect_right(prefix_sums, budget)
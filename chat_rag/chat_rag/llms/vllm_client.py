@@ -11,6 +11,7 @@ from chat_rag.exceptions import (
     RequestException,
 )
 from chat_rag.llms import OpenAIChatModel
+from chat_rag.llms.prompt_budget import PromptBudget
 
 logger = logging.getLogger(__name__)
 
@@ -54,6 +55,26 @@ class VLLMModel(OpenAIChatModel):
         self.has_chat_template = self.tokenizer.chat_template is not None
         print(f"Model max length: {self.model_max_length}")
 
+        self.prompt_budget = PromptBudget(tokenizer=self.tokenizer)
+        self.prompt_budget.message_overhead = self._estimate_message_overhead()
+
+    def _estimate_message_overhead(self):
+        """
+        Tokens added by the chat template to every message, estimated once from a short conversation.
+        """
+        try:
+            one_message = self._get_prompt_len([{"role": "user", "content": "a"}])
+            three_messages = self._get_prompt_len(
+                [
+                    {"role": "user", "content": "a"},
+                    {"role": "assistant", "content": "a"},
+                    {"role": "user", "content": "a"},
+                ]
+            )
+        except Exception:  # e.g. no chat template
+            return 0
+        return max(0, (three_messages - one_message) // 2 - self.prompt_budget.count("a"))
+
     def _get_prompt_len(self, messages):
         prompt = self.tokenizer.apply_chat_template(
             messages,
@@ -74,31 +95,43 @@ class VLLMModel(OpenAIChatModel):
             The messages to use for the prompt. List of pairs (role, content).
         """
 
-        n_messages_to_keep = len(messages)
-        num_tokens = self._get_prompt_len(messages)
         margin = int(self.model_max_length * 0.1)
+        budget = self.model_max_length - margin
 
         system_prompt = None
         if messages[0]["role"] == "system":
             system_prompt = messages.pop(0)
-            n_messages_to_keep -= 1  # don't count the system prompt
+        prefix = [system_prompt] if system_prompt else []
 
-        while num_tokens > (self.model_max_length - margin):
-            # When we reach the minimum number of contexts and messages and the prompt is still too long, we return None
-            if n_messages_to_keep == 1:
-                raise PromptTooLongException()
+        if not messages:
+            return prefix
 
-            n_messages_to_keep -= 1
+        def fits(n_messages):
+            return self._get_prompt_len(prefix + messages[-n_messages:]) <= budget
 
-            num_tokens = self._get_prompt_len(
-                [system_prompt] + messages[-n_messages_to_keep:]
-            )
-
-        messages = messages[-n_messages_to_keep:]
-        if system_prompt:
-            messages = [system_prompt] + messages
+        # Estimate the largest suffix of the conversation that fits with the cached token counts
+        system_tokens = (
+            self.prompt_budget.count(system_prompt["content"]) + self.prompt_budget.message_overhead
+            if system_prompt
+            else 0
+        )
+        n_messages_to_keep = self.prompt_budget.fit_messages(messages, budget - system_tokens)
+        n_messages_to_keep = min(max(n_messages_to_keep, 1), len(messages))
 
-        return messages
+        # Correct the estimate with the exact length of the rendered prompt, it usually takes one or two renders
+        if fits(n_messages_to_keep):
+            while n_messages_to_keep < len(messages) and fits(n_messages_to_keep + 1):
+                n_messages_to_keep += 1
+        else:
+            while True:
+                # When we reach the minimum number of messages and the prompt is still too long, we raise
+                if n_messages_to_keep == 1:
+                    raise PromptTooLongException()
+                n_messages_to_keep -= 1
+                if fits(n_messages_to_keep):
+                    break
+
+        return prefix + messages[-n_messages_to_keep:]
 
     def stream(
         self,
@@ -1,7 +1,7 @@
 from logging import getLogger
 from typing import Dict, List
 
-from chat_rag.llms import LLM
+from chat_rag.llms import LLM, PromptBudget
 
 logger = getLogger(__name__)
 
@@ -18,6 +18,10 @@ NO_CONTEXT_SUFFIX = {
     "es": "No se proporciona información.",
 }
 
+# Share of the context length of the llm used by the contexts when no budget is given, the rest is left to the
+# system prompt, the conversation and the completion
+CONTEXT_SHARE = 0.5
+
 
 class RAG:
     """
@@ -29,6 +33,7 @@ class RAG:
         retriever,
         llm: LLM,
         lang: str = "en",
+        max_context_tokens: int = None,
     ):
         """
         Parameters
@@ -39,11 +44,19 @@ class RAG:
             Language model for generating responses.
         lang : str, optional
             Language of the language model, by default "en"
+        max_context_tokens : int, optional
+            Token budget of the contexts added to the system prompt, the first contexts that fit are used,
+            by default half the context length of the llm if it is known, otherwise all the contexts are used.
         """
 
         self.retriever = retriever
         self.llm = llm
         self.lang = lang
+        if max_context_tokens is None and getattr(llm, "model_max_length", None):
+            max_context_tokens = int(llm.model_max_length * CONTEXT_SHARE)
+        self.max_context_tokens = max_context_tokens
+        # Reuse the budget of the llm, which counts with its own tokenizer, if it has one
+        self.prompt_budget = getattr(llm, "prompt_budget", None) or PromptBudget()
 
     def _get_unique_contexts(self, prev_contents, n_contexts_to_use, contexts):
         """
@@ -132,6 +145,9 @@ class RAG:
         """
 
         system_prompt = messages.pop(0)["content"]
+        if self.max_context_tokens is not None:
+            contexts = contexts[: self.prompt_budget.fit_contexts(contexts, self.max_context_tokens)]
+
         if len(contexts) > 0:
             system_prompt = f"{system_prompt}\n{CONTEXT_PREFIX[lang]}\n"
 
@@ -2,4 +2,6 @@ from chat_rag.retrievers.semantic_retriever import SemanticRetriever
 from chat_rag.retrievers.rerank_retriever import ReRankRetriever
 from chat_rag.retrievers.retriever_client import RetrieverClient
 from chat_rag.retrievers.colbert_retriever import ColBERTRetriever
-from chat_rag.retrievers.bm25_retriever import BM25Retriever
\ No newline at end of file
+from chat_rag.retrievers.bm25_retriever import BM25Retriever
+from chat_rag.retrievers.ann_index import FaissIndex
+from chat_rag.retrievers.hybrid_retriever import HybridRetriever
\ No newline at end of file
@@ -0,0 +1,193 @@
+import json
+import os
+from logging import getLogger
+from typing import List, Tuple
+
+import numpy as np
+
+logger = getLogger(__name__)
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+INDEX_TYPES = ["hnsw", "ivfpq"]
+
+
+def _check_faiss():
+    if faiss is None:
+        raise ImportError("faiss is required for the ANN indexes. Install it with `pip install faiss-cpu`.")
+
+
+class FaissIndex:
+    """
+    Approximate nearest neighbour index over normalized embeddings, scored by inner product.
+    It is built from the same embeddings array used by the SemanticRetriever brute force search.
+    """
+
+    def __init__(self, index: "faiss.Index", index_type: str):
+        """
+        Parameters
+        ----------
+        index : faiss.Index
+            A built faiss index.
+        index_type : str
+            Type of the index, one of 'hnsw' or 'ivfpq'.
+        """
+        assert index_type in INDEX_TYPES, f"index_type must be one of {INDEX_TYPES}"
+        _check_faiss()
+        self.index = index
+        self.index_type = index_type
+
+    @classmethod
+    def build(
+        cls,
+        embeddings: np.ndarray,
+        index_type: str = "hnsw",
+        hnsw_m: int = 32,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        nlist: int = None,
+        pq_m: int = 16,
+        pq_nbits: int = 8,
+        nprobe: int = 16,
+    ):
+        """
+        Builds the index from the embeddings.
+        Parameters
+        ----------
+        embeddings : np.ndarray
+            Embeddings with shape (n_contexts, dim).
+        index_type : str, optional
+            'hnsw' for a graph index or 'ivfpq' for an inverted file with product quantization, by default 'hnsw'.
+        hnsw_m : int, optional
+            Number of neighbours per node of the HNSW graph, by default 32.
+        ef_construction : int, optional
+            Size of the candidate list while building the HNSW graph, by default 200.
+        ef_search : int, optional
+            Size of the candidate list while searching the HNSW graph, by default 64. Higher is slower but more accurate.
+        nlist : int, optional
+            Number of IVF cells, by default 4 * sqrt(n_contexts).
+        pq_m : int, optional
+            Number of PQ sub-quantizers, must divide the embedding dimension, by default 16.
+        pq_nbits : int, optional
+            Bits per PQ sub-quantizer code, by default 8.
+        nprobe : int, optional
+            Number of IVF cells visited while searching, by default 16. Higher is slower but more accurate.
+        """
+        assert index_type in INDEX_TYPES, f"index_type must be one of {INDEX_TYPES}"
+        _check_faiss()
+
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        n_contexts, dim = embeddings.shape
+
+        logger.info(f"Building {index_type} index for {n_contexts} embeddings of dim {dim}")
+
+        if index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(dim, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = ef_construction
+        else:
+            nlist = nlist or max(1, int(4 * np.sqrt(n_contexts)))
+            quantizer = faiss.IndexFlatIP(dim)
+            index = faiss.IndexIVFPQ(
+                quantizer, dim, nlist, pq_m, pq_nbits, faiss.METRIC_INNER_PRODUCT
+            )
+            index.train(embeddings)
+
+        index.add(embeddings)
+
+        instance = cls(index, index_type)
+        instance.ef_search = ef_search
+        instance.nprobe = nprobe
+        return instance
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        Loads an index previously persisted with save(), with the search parameters it was saved with.
+        Parameters
+        ----------
+        path : str
+            Path to the index file.
+        """
+        _check_faiss()
+        index = faiss.read_index(path)
+        index_type = "ivfpq" if faiss.try_extract_index_ivf(index) is not None else "hnsw"
+        logger.info(f"Loading {index_type} index from {path}")
+        instance = cls(index, index_type)
+
+        params_path = cls._params_path(path)
+        if os.path.exists(params_path):
+            with open(params_path) as f:
+                params = json.load(f)
+            instance.ef_search = params.get("ef_search")
+            instance.nprobe = params.get("nprobe")
+        return instance
+
+    def save(self, path: str):
+        """
+        Persists the index to disk, and its search parameters to a json file next to it.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        faiss.write_index(self.index, path)
+        with open(self._params_path(path), "w") as f:
+            json.dump({"ef_search": self.ef_search, "nprobe": self.nprobe}, f)
+
+    @staticmethod
+    def _params_path(path: str) -> str:
+        return f"{path}.json"
+
+    @property
+    def ef_search(self) -> int:
+        return self.index.hnsw.efSearch if self.index_type == "hnsw" else None
+
+    @ef_search.setter
+    def ef_search(self, value: int):
+        if self.index_type == "hnsw" and value is not None:
+            self.index.hnsw.efSearch = value
+
+    @property
+    def nprobe(self) -> int:
+        return self.index.nprobe if self.index_type == "ivfpq" else None
+
+    @nprobe.setter
+    def nprobe(self, value: int):
+        if self.index_type == "ivfpq" and value is not None:
+            self.index.nprobe = value
+
+    def __len__(self) -> int:
+        return self.index.ntotal
+
+    def search(
+        self, queries_embeddings: np.ndarray, top_k: int = 5, threshold: float = None
+    ) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        """
+        Returns the approximate top_k scores and indexes for every query.
+        Parameters
+        ----------
+        queries_embeddings : np.ndarray
+            Embeddings of the queries with shape (n_queries, dim).
+        top_k : int, optional
+            Number of context to be returned, by default 5.
+        threshold : float, optional
+            Minimum score to be returned, by default None.
+        Returns
+        -------
+        Tuple[List[np.ndarray], List[np.ndarray]]
+            Scores and indexes of every query, sorted by descending score.
+        """
+        queries_embeddings = np.ascontiguousarray(queries_embeddings, dtype=np.float32)
+        top_k = min(top_k, len(self))
+        scores, indexes = self.index.search(queries_embeddings, top_k)
+
+        sorted_scores, sorted_indexes = [], []
+        for row_scores, row_indexes in zip(scores, indexes):
+            # faiss pads with -1 when fewer than top_k neighbours are found
+            mask = row_indexes != -1
+            if threshold is not None:
+                mask &= row_scores >= threshold
+            sorted_scores.append(row_scores[mask])
+            sorted_indexes.append(row_indexes[mask])
+
+        return sorted_scores, sorted_indexes
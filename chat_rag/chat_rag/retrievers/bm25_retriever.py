@@ -1,31 +1,147 @@
+import json
+import os
 from typing import Any, Dict, List
 
 import bm25s
 
 
 class BM25Retriever:
-    def __init__(self, corpus: List[Dict[str, Any]], stemmer=None):
+    def __init__(
+        self,
+        corpus: List[Dict[str, Any]] = None,
+        stemmer=None,
+        ids: List[str] = None,
+    ):
         """
         Retrieve documents from a corpus using BM25.
         Parameters
         ----------
-        corpus : List[Dict[str, Any]]
-            List of dictionaries with the keys "content" and "title".
+        corpus : List[Dict[str, Any]], optional
+            List of dictionaries with the keys "content" and "title", by default None (empty index).
         stemmer : str, optional
             Stemmer to use, by default None.
+        ids : List[str], optional
+            Ids of the documents, used to remove or replace them later, by default their position in the corpus.
         """
         self.stemmer = stemmer
-        self.retriever = bm25s.BM25(corpus=corpus)
-        self.index(corpus=corpus)
+        self.retriever = bm25s.BM25()
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.doc_tokens: Dict[str, List[str]] = {}
+        self.doc_ids: List[str] = []
+        self.dirty = False
+
+        if corpus:
+            self.index(corpus=corpus, ids=ids)
+
+    def _tokenize(self, texts: List[str]) -> List[List[str]]:
+        return bm25s.tokenize(
+            texts, stemmer=self.stemmer, return_ids=False, show_progress=False
+        )
 
-    def index(self, corpus):
+    def index(self, corpus: List[Dict[str, Any]], ids: List[str] = None):
+        """
+        Replaces the whole index with the given corpus.
+        """
+        self.documents = {}
+        self.doc_tokens = {}
+        self.add(corpus, ids=ids)
+        self._build()
+
+    def add(self, corpus: List[Dict[str, Any]], ids: List[str] = None):
+        """
+        Adds documents to the index, replacing the documents with the same ids. Only the new documents are tokenized,
+        the index is rebuilt from the cached tokens on the next retrieval.
+        Parameters
+        ----------
+        corpus : List[Dict[str, Any]]
+            List of dictionaries with at least the key "content".
+        ids : List[str], optional
+            Ids of the documents, by default unused consecutive integers starting at the current size of the index.
+        """
         assert all(
             "content" in doc for doc in corpus
         ), "All documents in the corpus must have a 'content' key."
 
-        texts = [doc["content"] for doc in corpus]
-        corpus_tokens = bm25s.tokenize(texts, stemmer=self.stemmer, show_progress=False)
-        self.retriever.index(corpus_tokens, show_progress=False)
+        if ids is None:
+            ids = []
+            next_id = len(self.documents)
+            while len(ids) < len(corpus):
+                if str(next_id) not in self.documents:
+                    ids.append(str(next_id))
+                next_id += 1
+        assert len(ids) == len(corpus), "There must be one id per document."
+
+        tokens = self._tokenize([doc["content"] for doc in corpus])
+        for doc_id, doc, doc_tokens in zip(ids, corpus, tokens):
+            self.documents[str(doc_id)] = doc
+            self.doc_tokens[str(doc_id)] = doc_tokens
+        self.dirty = True
+
+    def remove(self, ids: List[str]):
+        """
+        Removes the documents with the given ids from the index, unknown ids are ignored.
+        """
+        for doc_id in ids:
+            self.documents.pop(str(doc_id), None)
+            self.doc_tokens.pop(str(doc_id), None)
+        self.dirty = True
+
+    def _build(self):
+        self.doc_ids = list(self.documents.keys())
+        if self.doc_ids:
+            self.retriever = bm25s.BM25()
+            self.retriever.index(
+                [self.doc_tokens[doc_id] for doc_id in self.doc_ids],
+                show_progress=False,
+            )
+        self.dirty = False
+
+    def save(self, path: str):
+        """
+        Persists the index, the documents and their tokens to the given directory.
+        """
+        if self.dirty:
+            self._build()
+
+        os.makedirs(path, exist_ok=True)
+        if self.doc_ids:
+            self.retriever.save(path)
+        with open(os.path.join(path, "documents.json"), "w") as f:
+            json.dump(
+                {
+                    "doc_ids": self.doc_ids,
+                    "documents": self.documents,
+                    "doc_tokens": self.doc_tokens,
+                },
+                f,
+            )
+
+    @classmethod
+    def load(cls, path: str, stemmer=None, mmap: bool = True):
+        """
+        Loads an index saved with save().
+        Parameters
+        ----------
+        path : str
+            Directory of the saved index.
+        stemmer : str, optional
+            Stemmer used when the index was built, by default None.
+        mmap : bool, optional
+            Whether to memory-map the score matrix instead of loading it in memory, by default True.
+        """
+        instance = cls(stemmer=stemmer)
+        with open(os.path.join(path, "documents.json")) as f:
+            data = json.load(f)
+
+        instance.doc_ids = data["doc_ids"]
+        instance.documents = data["documents"]
+        instance.doc_tokens = data["doc_tokens"]
+        if instance.doc_ids:
+            instance.retriever = bm25s.BM25.load(path, mmap=mmap)
+        return instance
+
+    def __len__(self) -> int:
+        return len(self.documents)
 
     def retrieve(
         self,
@@ -34,11 +150,17 @@ class BM25Retriever:
         disable_progress_bar: bool = False,
         **kwargs,
     ) -> List[List[Dict[str, Any]]]:
-        queries_tokens = bm25s.tokenize(queries, stemmer=self.stemmer)
+        if self.dirty:
+            self._build()
+
+        top_k = min(top_k, len(self.doc_ids))
+        if top_k <= 0:
+            return [[] for _ in queries]
+
+        queries_tokens = self._tokenize(queries)
         results, scores = self.retriever.retrieve(
             queries_tokens, k=top_k, show_progress=not disable_progress_bar
         )
-        results = results.tolist()
 
         # Add scores to the results
         results_with_score = []
@@ -46,11 +168,11 @@ class BM25Retriever:
             results_with_score.append(
                 [
                     {
-                        **doc,
+                        **self.documents[self.doc_ids[index]],
                         "score": score.item(), # from np.float32 to float
                     }
-                    for doc, score in zip(results_query, scores_queries)
+                    for index, score in zip(results_query, scores_queries)
                 ]
             )
 
-        return results_with_score
\ No newline at end of file
+        return results_with_score
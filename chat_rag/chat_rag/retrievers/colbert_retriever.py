@@ -1,5 +1,6 @@
 from typing import Optional, List, TypeVar, Union, Dict
 import os
+import numpy as np
 import torch
 import srsly
 from ragatouille import RAGPretrainedModel
@@ -154,6 +155,7 @@ class ColBERTRetriever:
                 bsize=bsize,
                 max_document_length=max_document_length,
             )
+            self._unpad_encodings()
             
             index_name = index_name or 'new_encodings'
             self._save(
@@ -163,6 +165,8 @@ class ColBERTRetriever:
     def _save(self, path: str = '.ragatouille/encodings', is_encodings: bool = True):
         """
         Save the necessary data for the retriever and the encodings if needed.
+        The encodings are stored unpadded: the token embeddings of all the documents in one contiguous fp16 array
+        plus an offsets array, so they can be memory-mapped on load.
         """
 
         # Create the directory if it does not exist
@@ -171,15 +175,32 @@ class ColBERTRetriever:
         srsly.write_json(os.path.join(path, 'document_id_mapping.json'), self.document_id_mapping)  
         
         if is_encodings:
-            torch.save(self.retriever.model.in_memory_embed_docs, os.path.join(path, 'in_memory_embed_docs.pt'))
-            torch.save(self.retriever.model.doc_masks, os.path.join(path, 'doc_masks.pt'))
+            # Written next to the files before replacing them, they may be memory-mapped by this or another replica
+            for name, array in [('token_embeddings.npy', self.token_embeddings), ('doc_offsets.npy', self.doc_offsets)]:
+                tmp_path = os.path.join(path, f'.{name}.tmp')
+                with open(tmp_path, 'wb') as f:
+                    np.save(f, array)
+                os.replace(tmp_path, os.path.join(path, name))
+            srsly.write_json(os.path.join(path, 'encodings_meta.json'), {'padded_length': self.padded_length})
+
+    def _unpad_encodings(self):
+        """
+        Keeps the padded encodings of the RAGatouille model unpadded: the token embeddings of all the documents in one
+        contiguous fp16 array plus an offsets array.
+        """
+        embed_docs = self.retriever.model.in_memory_embed_docs
+        # ColBERT document embeddings are normalized, the padding tokens are zero vectors
+        token_mask = embed_docs.norm(dim=-1) > 0
+        lengths = token_mask.sum(dim=1).cpu().numpy()
+        self.doc_offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.doc_offsets[1:])
+        self.token_embeddings = embed_docs[token_mask].to(torch.float16).cpu().numpy()
+        self.padded_length = embed_docs.shape[1]
 
     def _load(self, path: str = '.ragatouille/encodings/', is_encodings: bool = True):
         """
         Load the necessary data for the retriever and the encodings if needed.
         """
-        device = next(self.retriever.model.inference_ckpt.parameters()).device
-
         self.documents = srsly.read_json(os.path.join(path, 'documents.json'))
         self.document_id_mapping = srsly.read_json(os.path.join(path, 'document_id_mapping.json'))
 
@@ -187,15 +208,78 @@ class ColBERTRetriever:
         self.document_id_mapping = {int(k): v for k, v in self.document_id_mapping.items()}
 
         if is_encodings: 
-                
-            self.retriever.model.in_memory_embed_docs = torch.load(os.path.join(path, 'in_memory_embed_docs.pt'), map_location=device)
-            self.retriever.model.doc_masks = torch.load(os.path.join(path, 'doc_masks.pt'), map_location=device)
-
-            self.retriever.model.in_memory_collection = ['' for _ in range(self.retriever.model.in_memory_embed_docs.size(0))] # Don't care about the RAGatouille internal collection
-            self.retriever.model.in_memory_metadata = None # Don't care about the RAGatouille internal metadata
+            if os.path.exists(os.path.join(path, 'token_embeddings.npy')):
+                # Memory-mapped, so the replicas of a node share the pages and start-up doesn't read the whole file
+                self.token_embeddings = np.load(os.path.join(path, 'token_embeddings.npy'), mmap_mode='r')
+                self.doc_offsets = np.load(os.path.join(path, 'doc_offsets.npy'))
+                self.padded_length = srsly.read_json(os.path.join(path, 'encodings_meta.json'))['padded_length']
+            else:
+                # Encodings saved by previous versions with the padded tensors
+                device = next(self.retriever.model.inference_ckpt.parameters()).device
+                self.retriever.model.in_memory_embed_docs = torch.load(os.path.join(path, 'in_memory_embed_docs.pt'), map_location=device)
+                self.retriever.model.doc_masks = torch.load(os.path.join(path, 'doc_masks.pt'), map_location=device)
+
+                self.retriever.model.in_memory_collection = ['' for _ in range(self.retriever.model.in_memory_embed_docs.size(0))] # Don't care about the RAGatouille internal collection
+                self.retriever.model.in_memory_metadata = None # Don't care about the RAGatouille internal metadata
+                # Searched and saved again in the unpadded format
+                self._unpad_encodings()
 
             self.retriever.model.inference_ckpt_len_set = True
 
+    def _maxsim_scores(self, query_embeddings: np.ndarray, chunk_tokens: int = 65536) -> np.ndarray:
+        """
+        ColBERT late interaction scores of a query against the unpadded encodings, processed in chunks of documents
+        so only chunk_tokens token embeddings are read and upcast at a time.
+        """
+        offsets = self.doc_offsets
+        n_docs = len(offsets) - 1
+        lengths = np.diff(offsets)
+        max_sims = np.zeros((n_docs, query_embeddings.shape[0]), dtype=np.float32)
+
+        start_doc = 0
+        while start_doc < n_docs:
+            end_doc = np.searchsorted(offsets, offsets[start_doc] + chunk_tokens, side='right') - 1
+            end_doc = min(max(end_doc, start_doc + 1), n_docs)
+
+            chunk = np.asarray(self.token_embeddings[offsets[start_doc]:offsets[end_doc]], dtype=np.float32)
+            if len(chunk):
+                sims = chunk @ query_embeddings.T
+                chunk_offsets = offsets[start_doc:end_doc] - offsets[start_doc]
+                non_empty = lengths[start_doc:end_doc] > 0
+                # reduceat is only valid for non empty segments, empty documents keep a score of 0
+                max_sims[start_doc:end_doc][non_empty] = np.maximum.reduceat(sims, chunk_offsets[non_empty], axis=0)
+            start_doc = end_doc
+
+        # The padded tensors had zero vectors, which floor the max similarity of every shorter document at 0
+        padded = lengths < self.padded_length
+        max_sims[padded] = np.maximum(max_sims[padded], 0)
+
+        return max_sims.sum(axis=1)
+
+    def _search_token_embeddings(self, queries: List[str], top_k: int = 5) -> List[List[Dict]]:
+        """
+        Search through the memory-mapped unpadded encodings.
+        """
+        embedded_queries = self.retriever.model._encode_index_free_queries(queries)
+
+        queries_results = []
+        for embedded_query in embedded_queries:
+            scores = self._maxsim_scores(embedded_query[0].float().cpu().numpy())
+            k = len(scores) if top_k == -1 else min(top_k, len(scores))
+            top_indexes = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+            top_indexes = top_indexes[np.argsort(-scores[top_indexes], kind='stable')]
+            queries_results.append([
+                {
+                    "content": "",
+                    "score": float(scores[doc_idx]),
+                    "rank": rank,
+                    "result_index": int(doc_idx),
+                }
+                for rank, doc_idx in enumerate(top_indexes)
+            ])
+
+        return queries_results
+
     def _normalize_scores(self, queries_results, top_k, query_maxlen, threshold):
         """
         Normalize the scores of the retrieved documents by the query length and filter out irrelevant results.
@@ -243,11 +327,14 @@ class ColBERTRetriever:
         """
         Search through the in memory encoded documents. Useful for small collections but not recommended for large collections.
         """
-        queries_results = self.retriever.search_encoded_docs(
-            queries,
-            k=top_k,
-        )
-        queries_results = [queries_results] if len(queries) == 1 else queries_results
+        if getattr(self, 'token_embeddings', None) is not None:
+            queries_results = self._search_token_embeddings(queries, top_k)
+        else:
+            queries_results = self.retriever.search_encoded_docs(
+                queries,
+                k=top_k,
+            )
+            queries_results = [queries_results] if len(queries) == 1 else queries_results
 
         query_maxlen = self.retriever.model.inference_ckpt.query_tokenizer.query_maxlen
 
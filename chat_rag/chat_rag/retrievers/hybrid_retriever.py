@@ -0,0 +1,146 @@
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from typing import Any, Dict, List, Tuple
+
+logger = getLogger(__name__)
+
+FUSION_METHODS = ["rrf", "weighted"]
+
+
+class HybridRetriever:
+    """
+    Combines a lexical retriever (BM25Retriever) and a dense retriever (SemanticRetriever or ColBERTRetriever).
+    Both legs run concurrently and their results are fused with reciprocal rank fusion or a weighted sum of
+    normalized scores.
+    """
+
+    def __init__(
+        self,
+        lexical_retriever,
+        dense_retriever,
+        fusion: str = "rrf",
+        rrf_k: int = 60,
+        weights: Tuple[float, float] = (0.5, 0.5),
+        candidates_multiplier: int = 2,
+    ):
+        """
+        Parameters
+        ----------
+        lexical_retriever : BM25Retriever
+            The lexical leg.
+        dense_retriever : SemanticRetriever or ColBERTRetriever
+            The dense leg.
+        fusion : str, optional
+            'rrf' for reciprocal rank fusion or 'weighted' for a weighted sum of min-max normalized scores, by default 'rrf'.
+        rrf_k : int, optional
+            Constant of the reciprocal rank fusion, by default 60.
+        weights : Tuple[float, float], optional
+            Weights of the lexical and dense legs, by default (0.5, 0.5).
+        candidates_multiplier : int, optional
+            Each leg retrieves top_k * candidates_multiplier candidates before fusing, by default 2.
+        """
+        assert fusion in FUSION_METHODS, f"fusion must be one of {FUSION_METHODS}"
+        self.lexical_retriever = lexical_retriever
+        self.dense_retriever = dense_retriever
+        self.fusion = fusion
+        self.rrf_k = rrf_k
+        self.weights = weights
+        self.candidates_multiplier = candidates_multiplier
+        self.executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="hybrid_retriever"
+        )
+
+    @staticmethod
+    def _get_score(doc: Dict[str, Any]) -> float:
+        # Dense retrievers return a normalized 'similarity', BM25 only returns 'score'
+        return float(doc["similarity"] if "similarity" in doc else doc["score"])
+
+    def _normalize(self, docs: List[Dict[str, Any]]) -> List[float]:
+        scores = [self._get_score(doc) for doc in docs]
+        if not scores:
+            return []
+        min_score, max_score = min(scores), max(scores)
+        if max_score == min_score:
+            return [1.0 for _ in scores]
+        return [(score - min_score) / (max_score - min_score) for score in scores]
+
+    def _fuse(
+        self, legs_docs: List[List[Dict[str, Any]]], top_k: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Fuses the results of the legs for one query and deduplicates them by content.
+        """
+        fused = {}
+        for weight, docs in zip(self.weights, legs_docs):
+            if self.fusion == "rrf":
+                leg_scores = [
+                    weight / (self.rrf_k + rank) for rank in range(1, len(docs) + 1)
+                ]
+            else:
+                leg_scores = [weight * score for score in self._normalize(docs)]
+
+            seen = set()
+            for doc, leg_score in zip(docs, leg_scores):
+                key = doc["content"]
+                # The same content can be returned twice by the same leg (e.g. split ColBERT passages), count it once
+                if key in seen:
+                    continue
+                seen.add(key)
+
+                if key not in fused:
+                    fused[key] = {**doc, "score": 0.0}
+                fused[key]["score"] += leg_score
+
+        results = sorted(fused.values(), key=lambda doc: doc["score"], reverse=True)
+        return results[:top_k]
+
+    def retrieve(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        disable_progress_bar: bool = False,
+        **kwargs,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Returns the fused context for the queries.
+        Parameters
+        ----------
+        queries : List[str]
+            List of queries to be used for retrieval.
+        top_k : int, optional
+            Number of context to be returned, by default 5.
+        disable_progress_bar : bool, optional
+            Whether to disable the progress bar, by default False.
+        kwargs :
+            Extra arguments passed to the dense retriever, e.g. prefix or threshold.
+        Returns
+        -------
+        List[List[Dict[str, Any]]]
+            List of lists of dictionaries containing the context, with the fused 'score'.
+        """
+        assert top_k > 0, "top_k must be positive"
+        candidates_k = top_k * self.candidates_multiplier
+
+        lexical_future = self.executor.submit(
+            self.lexical_retriever.retrieve,
+            queries,
+            top_k=candidates_k,
+            disable_progress_bar=disable_progress_bar,
+        )
+        dense_future = self.executor.submit(
+            self.dense_retriever.retrieve,
+            queries,
+            top_k=candidates_k,
+            disable_progress_bar=disable_progress_bar,
+            **kwargs,
+        )
+        lexical_results = lexical_future.result()
+        dense_results = dense_future.result()
+
+        return [
+            self._fuse([lexical_docs, dense_docs], top_k)
+            for lexical_docs, dense_docs in zip(lexical_results, dense_results)
+        ]
+
+    def close(self):
+        self.executor.shutdown(wait=False)
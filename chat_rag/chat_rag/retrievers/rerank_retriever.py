@@ -22,11 +22,9 @@ class ReRankRetriever:
         batch_size: int = 32,
     ):
         contexts_retrieved = self.retriever.retrieve(queries, top_k=top_k)  # retrieve contexts
-        contexts_ranked = []
-        for query, contexts in zip(queries, contexts_retrieved):
-            query_contexts = self.reranker(query, contexts, batch_size=batch_size)  # rerank and filter contexts
-            # convert scores from np.float32 to float
+        contexts_ranked = self.reranker.rank_batch(queries, contexts_retrieved, batch_size=batch_size)  # rerank and filter contexts of all the queries at once
+        # convert scores from np.float32 to float
+        for query_contexts in contexts_ranked:
             for context in query_contexts:
                 context["score"] = context["score"].item()
-            contexts_ranked.append(query_contexts)
-        return contexts_ranked
\ No newline at end of file
+        return contexts_ranked
@@ -1,4 +1,5 @@
-import aiohttp
+from chat_rag.utils.http_clients import get_aiohttp_session
+
 
 class RetrieverClient:
     """Client to retrieve documents from a retriever deployment."""
@@ -6,8 +7,9 @@ class RetrieverClient:
         self.deployment_url = deployment_url
 
     async def retrieve(self, query, top_k=5):
-        async with aiohttp.ClientSession() as session:
-            data = {"query": query, "top_k": top_k}
-            async with session.post(self.deployment_url, json=data) as response:
-                result = await response.json()
-                return result
\ No newline at end of file
+        # The session is shared by the whole process and keeps the connections to the deployment alive
+        session = get_aiohttp_session()
+        data = {"query": query, "top_k": top_k}
+        async with session.post(self.deployment_url, json=data) as response:
+            result = await response.json()
+            return result
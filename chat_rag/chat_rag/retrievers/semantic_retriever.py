@@ -5,6 +5,7 @@ import numpy as np
 import torch
 
 from chat_rag.embedding_models.base_model import BaseModel
+from chat_rag.retrievers.ann_index import FaissIndex
 
 logger = getLogger(__name__)
 
@@ -19,6 +20,7 @@ class SemanticRetriever:
         data: Dict[str, List[str]] = None,
         embeddings: Optional[np.ndarray] = None,
         embedding_model: Optional[BaseModel] = None,
+        ann_index: Optional[FaissIndex] = None,
     ):
         """
         Parameters
@@ -29,6 +31,8 @@ class SemanticRetriever:
             List of embeddings to be used for retrieval, by default None
         embedding_model: BaseModel, optional
             Embedding model to be used for retrieval, by default None
+        ann_index: FaissIndex, optional
+            Approximate nearest neighbour index built from the embeddings, by default None (brute force search)
         """
 
         # assert that the length of every column is the same
@@ -51,6 +55,21 @@ class SemanticRetriever:
             logger.info(f"Embeddings provided with shape {embeddings.shape}")
 
         self.embedding_model = embedding_model
+        self.ann_index = ann_index
+
+    def build_ann_index(self, index_type: str = "hnsw", **kwargs) -> FaissIndex:
+        """
+        Builds an approximate nearest neighbour index from the embeddings and uses it for retrieval.
+        Parameters
+        ----------
+        index_type : str, optional
+            'hnsw' or 'ivfpq', by default 'hnsw'. The rest of the kwargs are passed to FaissIndex.build.
+        """
+        assert self.embeddings is not None, "Embeddings not provided."
+        self.ann_index = FaissIndex.build(
+            self.embeddings.numpy(), index_type=index_type, **kwargs
+        )
+        return self.ann_index
 
     def get_top_matches(
         self,
@@ -59,6 +78,7 @@ class SemanticRetriever:
         prefix: str = "query: ",
         threshold: float = None,
         disable_progress_bar: bool = False,
+        exact: bool = False,
     ) -> List[Tuple[List[float], List[int]]]:
         """
         Returns the top_k most relevant context for the queries.
@@ -75,6 +95,9 @@ class SemanticRetriever:
             Prefix or instruction to be added to the context, by default 'query: ' for e5 models.
         threshold : float, optional
             Minimum score to be returned, by default None.
+        exact : bool, optional
+            Whether to use the brute force search even if an ANN index is available, by default False.
+            The ANN index is never used when top_k is -1.
 
         Returns
         -------
@@ -91,51 +114,96 @@ class SemanticRetriever:
         queries_embeddings = self.embedding_model.encode(
             queries, disable_progress_bar=disable_progress_bar
         )
-        scores = (
-            torch.mm(queries_embeddings, self.embeddings.transpose(0, 1)).cpu().numpy()
+        if self.ann_index is not None and not exact and top_k != -1:
+            sorted_scores, sorted_indexes = self.ann_index.search(
+                queries_embeddings.numpy(), top_k, threshold
+            )
+        else:
+            scores = (
+                torch.mm(queries_embeddings, self.embeddings.transpose(0, 1))
+                .cpu()
+                .numpy()
+            )
+            sorted_scores, sorted_indexes = self._select_top_k(
+                scores, top_k, threshold
+            )
+
+        scores_indexes = [
+            (score_list, index_list)
+            for score_list, index_list in zip(sorted_scores, sorted_indexes)
+        ]
+        return scores_indexes
+
+    def measure_recall(
+        self, queries: List[str], top_k: int = 5, prefix: str = "query: "
+    ) -> float:
+        """
+        Returns the recall@top_k of the ANN index, using the brute force search as the exact reference.
+        Useful for tuning ef_search or nprobe.
+        """
+        assert self.ann_index is not None, "ANN index not built. Call build_ann_index() first."
+
+        approx = self.get_top_matches(
+            queries, top_k, prefix, disable_progress_bar=True
+        )
+        exact = self.get_top_matches(
+            queries, top_k, prefix, disable_progress_bar=True, exact=True
         )
 
-        sorted_indices = np.argsort(scores, axis=1)[:, ::-1]
-
-        # Use numpy's advanced indexing to get the sorted scores and indices
-        sorted_scores = np.take_along_axis(scores, sorted_indices, axis=1)[
-            :, :, None
-        ]  # Add a new axis to be able to broadcast
-        sorted_indexes = np.take_along_axis(
-            np.broadcast_to(np.arange(scores.shape[1]), scores.shape),
-            sorted_indices,
-            axis=1,
-        )[
-            :, :, None
-        ]  # Add a new axis to be able to broadcast
-
-        # If threshold is given, create a mask for scores
-        mask = (
-            sorted_scores >= threshold
-            if threshold is not None
-            else np.ones_like(sorted_scores, dtype=bool)
+        hits = sum(
+            len(set(approx_indexes.tolist()) & set(exact_indexes.tolist()))
+            for (_, approx_indexes), (_, exact_indexes) in zip(approx, exact)
         )
+        total = sum(len(exact_indexes) for _, exact_indexes in exact)
+        return hits / total if total else 1.0
 
-        # Use the mask to filter values
-        sorted_scores = np.where(mask, sorted_scores, -np.inf).squeeze(-1)
-        sorted_indexes = np.where(mask, sorted_indexes, -1).squeeze(-1)
+    @staticmethod
+    def _select_top_k(
+        scores: np.ndarray, top_k: int = 5, threshold: float = None
+    ) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        """
+        Selects the top_k scores of every row without sorting the whole row.
+        Parameters
+        ----------
+        scores : np.ndarray
+            Matrix of scores with shape (n_queries, n_contexts).
+        top_k : int, optional
+            Number of context to be returned, by default 5. If -1, all context are returned.
+        threshold : float, optional
+            Minimum score to be returned, by default None.
+        Returns
+        -------
+        Tuple[List[np.ndarray], List[np.ndarray]]
+            Scores and indexes of every row, sorted by descending score.
+        """
+        n_contexts = scores.shape[1]
+        k = n_contexts if top_k == -1 else min(top_k, n_contexts)
+
+        # Apply the threshold before selecting so that discarded contexts never take a top_k slot
+        if threshold is not None:
+            scores = np.where(scores >= threshold, scores, -np.inf)
+
+        if k <= 0:
+            candidates = np.empty((scores.shape[0], 0), dtype=np.int64)
+        elif k < n_contexts:
+            # O(N) partial selection, only the k survivors get sorted afterwards
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(n_contexts), scores.shape)
 
-        # remove the masked values
-        sorted_scores = sorted_scores[sorted_scores != -np.inf].reshape(
-            len(queries), -1
-        )
-        sorted_indexes = sorted_indexes[sorted_indexes != -1].reshape(len(queries), -1)
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind="stable")
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        candidate_scores = np.take_along_axis(candidate_scores, order, axis=1)
 
-        # If top_k is not -1, truncate results
-        if top_k != -1:
-            sorted_scores = sorted_scores[:, :top_k]
-            sorted_indexes = sorted_indexes[:, :top_k]
+        sorted_scores, sorted_indexes = [], []
+        for row_scores, row_indexes in zip(candidate_scores, candidates):
+            # Masked scores are sorted last, so the valid ones are a prefix of the row
+            n_valid = np.count_nonzero(row_scores != -np.inf)
+            sorted_scores.append(row_scores[:n_valid])
+            sorted_indexes.append(row_indexes[:n_valid])
 
-        scores_indexes = [
-            (score_list, index_list)
-            for score_list, index_list in zip(sorted_scores, sorted_indexes)
-        ]
-        return scores_indexes
+        return sorted_scores, sorted_indexes
 
     def _get_contexts(
         self, matches: Tuple[List[float], List[int]]
@@ -1,10 +1,10 @@
-import asyncio
 import json
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel, Field
 
 from chat_rag.llms import LLM
+from chat_rag.llms.batch_executor import BatchExecutor
 
 
 class SubmitQuestion(BaseModel):
@@ -44,10 +44,22 @@ async def agenerate_question(passage: str, llm: LLM) -> str:
 
 
 # Batch processing
-async def agenerate_questions(passages: List[str], llm: LLM) -> List[str]:
+async def agenerate_questions(passages: List[str], llm: LLM, executor: BatchExecutor = None) -> List[Optional[str]]:
     """
     Generate questions for the given passages.
+    Parameters
+    ----------
+    passages : List[str]
+        The passages to generate questions for.
+    llm : LLM
+        The language model to use.
+    executor : BatchExecutor, optional
+        Limits the concurrency and retries the calls, by default a BatchExecutor with its default settings.
+    Returns
+    -------
+    List[Optional[str]]
+        The generated questions in the order of the passages, None for the passages that failed.
     """
-    tasks = [agenerate_question(passage, llm) for passage in passages]
-    questions = await asyncio.gather(*tasks)
-    return questions
\ No newline at end of file
+    executor = executor or BatchExecutor(provider=type(llm).__name__)
+    batch_result = await executor.run(lambda passage: agenerate_question(passage, llm), passages)
+    return batch_result.results
@@ -0,0 +1,169 @@
+"""
+Process-wide registry of HTTP clients, so the LLM clients, the retriever client and the deployments reuse their
+keep-alive connection pools instead of opening new connections (and TLS handshakes) for every request or every
+loaded model. The async clients are bound to the event loop that uses them, so they are kept per event loop.
+
+The pools are configured with the environment variables:
+    CHAT_RAG_HTTP_MAX_CONNECTIONS: maximum number of connections of every pool, by default 100.
+    CHAT_RAG_HTTP_MAX_KEEPALIVE_CONNECTIONS: maximum number of idle connections kept alive, by default 20.
+    CHAT_RAG_HTTP_KEEPALIVE_EXPIRY: seconds an idle connection is kept alive, by default 30.
+    CHAT_RAG_HTTP2: whether to use HTTP/2 when the h2 package is installed, by default 'yes'.
+"""
+import asyncio
+import atexit
+import importlib.util
+import os
+from logging import getLogger
+from threading import Lock
+from typing import Any, Callable, Dict, Tuple
+from weakref import WeakKeyDictionary
+
+import httpx
+
+logger = getLogger(__name__)
+
+_lock = Lock()
+_clients: Dict[Tuple, Any] = {}
+_async_clients: "WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, Any]]" = WeakKeyDictionary()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.environ.get("CHAT_RAG_HTTP_MAX_CONNECTIONS", 100)),
+        max_keepalive_connections=int(os.environ.get("CHAT_RAG_HTTP_MAX_KEEPALIVE_CONNECTIONS", 20)),
+        keepalive_expiry=float(os.environ.get("CHAT_RAG_HTTP_KEEPALIVE_EXPIRY", 30)),
+    )
+
+
+def _http2() -> bool:
+    return (
+        os.environ.get("CHAT_RAG_HTTP2", "yes") == "yes"
+        and importlib.util.find_spec("h2") is not None
+    )
+
+
+def get_httpx_client(is_async: bool = False, **kwargs):
+    """
+    Returns a new pooled httpx client with the configured limits, to be passed to the SDKs that accept one.
+    """
+    client_class = httpx.AsyncClient if is_async else httpx.Client
+    return client_class(limits=_limits(), http2=_http2(), **kwargs)
+
+
+def get_client(key: Tuple, factory: Callable[[], Any], is_async: bool = False):
+    """
+    Returns the client registered under the key, creating it with the factory the first time.
+    The async clients are registered per running event loop.
+    Parameters
+    ----------
+    key : Tuple
+        Identifies the client, e.g. (provider, api_key, base_url).
+    factory : Callable[[], Any]
+        Creates the client.
+    is_async : bool, optional
+        Whether the client is async, by default False.
+    """
+    with _lock:
+        if is_async:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = asyncio.get_event_loop_policy().get_event_loop()
+            clients = _async_clients.setdefault(loop, {})
+        else:
+            clients = _clients
+
+        if key not in clients:
+            clients[key] = factory()
+        return clients[key]
+
+
+def get_openai_client(api_key: str = None, base_url: str = None, is_async: bool = False):
+    from openai import AsyncOpenAI, OpenAI
+
+    client_class = AsyncOpenAI if is_async else OpenAI
+    return get_client(
+        ("openai", api_key, base_url),
+        lambda: client_class(
+            api_key=api_key, base_url=base_url, http_client=get_httpx_client(is_async)
+        ),
+        is_async=is_async,
+    )
+
+
+def get_anthropic_client(api_key: str = None, is_async: bool = False):
+    from anthropic import Anthropic, AsyncAnthropic
+
+    client_class = AsyncAnthropic if is_async else Anthropic
+    return get_client(
+        ("anthropic", api_key),
+        lambda: client_class(api_key=api_key, http_client=get_httpx_client(is_async)),
+        is_async=is_async,
+    )
+
+
+def get_mistral_client(api_key: str = None, is_async: bool = False):
+    # The mistralai clients don't accept an http client, but reusing them reuses their own pools
+    from mistralai.async_client import MistralAsyncClient
+    from mistralai.client import MistralClient
+
+    client_class = MistralAsyncClient if is_async else MistralClient
+    return get_client(
+        ("mistral", api_key),
+        lambda: client_class(api_key=api_key),
+        is_async=is_async,
+    )
+
+
+def get_aiohttp_session():
+    """
+    Returns the aiohttp session of the running event loop, with a keep-alive connection pool.
+    """
+    import aiohttp
+
+    return get_client(
+        ("aiohttp",),
+        lambda: aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=int(os.environ.get("CHAT_RAG_HTTP_MAX_CONNECTIONS", 100)),
+                keepalive_timeout=float(os.environ.get("CHAT_RAG_HTTP_KEEPALIVE_EXPIRY", 30)),
+            )
+        ),
+        is_async=True,
+    )
+
+
+def close_clients():
+    """
+    Closes the sync clients, it is registered to run at exit.
+    """
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception as e:
+            logger.warning(f"Error closing the HTTP client {client}: {e}")
+
+
+async def aclose_clients():
+    """
+    Closes the async clients of the running event loop, call it before the loop is closed.
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = list(_async_clients.pop(loop, {}).values())
+    for client in clients:
+        try:
+            if hasattr(client, "aclose"):
+                await client.aclose()
+            elif hasattr(client, "close"):
+                result = client.close()
+                if asyncio.iscoroutine(result):
+                    await result
+        except Exception as e:
+            logger.warning(f"Error closing the HTTP client {client}: {e}")
+
+
+atexit.register(close_clients)
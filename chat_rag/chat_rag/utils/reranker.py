@@ -1,7 +1,10 @@
 from typing import Any, Dict, List
 
+import numpy as np
 from sentence_transformers import CrossEncoder
 
+from chat_rag.utils.score_cache import RerankScoreCache
+
 models_dict = {
     'en': 'mixedbread-ai/mxbai-rerank-base-v1', # 'cross-encoder/ms-marco-MiniLM-L-12-v2' for little bit better performance
     'multilingual': 'nreimers/mmarco-mMiniLMv2-L6-H384-v1', # 'nreimers/mmarco-mMiniLMv2-L12-H384-v1' for better performance but slower
@@ -9,14 +12,18 @@ models_dict = {
 
 
 class ReRanker:
-    def __init__(self, lang: str = 'en', model_name: str = None, device: str ='cuda') -> None:
+    def __init__(self, lang: str = 'en', model_name: str = None, device: str ='cuda', score_cache: RerankScoreCache = None) -> None:
         """
         Class to rerank the retrieved contexts using a cross-encoder.
         It also filters out low confidence contexts.
+        If a score_cache is given, the scores of already seen (query, knowledge item, content) triples are not recomputed,
+        the knowledge item is identified by the 'k_item_id' key of the contexts.
         """
         lang = lang if lang in models_dict else 'multilingual' # default to multilingual model if language not supported
         model_name = model_name if model_name is not None else models_dict[lang]
+        self.model_name = model_name
         self.model = CrossEncoder(model_name, device=device)
+        self.score_cache = score_cache
 
     def __call__(self, query: str, contexts: List[Dict[str, Any]], batch_size: int = 32, threshold: float = 0.0) -> List[Dict[str, Any]]:
         """
@@ -32,14 +39,73 @@ class ReRanker:
         List[Dict[str, Any]]
             List of reranked contexts.
         """
-        docs = [context['content'] for context in contexts]
-        results = self.model.rank(query, docs, return_documents=False, batch_size=batch_size)
+        return self.rank_batch([query], [contexts], batch_size=batch_size, threshold=threshold)[0]
+
+    def rank_batch(self, queries: List[str], contexts_list: List[List[Dict[str, Any]]], batch_size: int = 32, threshold: float = 0.0) -> List[List[Dict[str, Any]]]:
+        """
+        Rerank the retrieved contexts of several queries in a single pass of the cross-encoder.
+        The (query, context) pairs of all the queries are flattened and sorted by length, so every micro-batch
+        has pairs of similar length, and the scores are scattered back to each query.
+        Parameters
+        ----------
+        queries: List[str]
+            The user messages.
+        contexts_list: List[List[Dict[str, Any]]]
+            List of retrieved contexts for each query.
+        batch_size: int
+            Number of pairs per micro-batch.
+        threshold: float
+            Contexts with a score not above the threshold are filtered out.
+        Returns
+        -------
+        List[List[Dict[str, Any]]]
+            List of reranked contexts for each query.
+        """
+        pairs = []
+        owners = []  # (query index, context index) of every pair
+        for query_idx, (query, contexts) in enumerate(zip(queries, contexts_list)):
+            for context_idx, context in enumerate(contexts):
+                pairs.append([query, context['content']])
+                owners.append((query_idx, context_idx))
+
+        if not pairs:
+            return [[] for _ in queries]
+
+        scores = [None] * len(pairs)
+
+        cache_keys = None
+        if self.score_cache is not None:
+            cache_keys = [
+                self.score_cache.make_key(self.model_name, query, contexts_list[query_idx][context_idx].get('k_item_id'), content)
+                for (query, content), (query_idx, context_idx) in zip(pairs, owners)
+            ]
+            cached_scores = self.score_cache.get_many(cache_keys)
+            for pair_idx, key in enumerate(cache_keys):
+                if key in cached_scores:
+                    scores[pair_idx] = np.float32(cached_scores[key])
+
+        # Only the pairs without a cached score go through the cross-encoder
+        # The number of characters is a cheap proxy of the number of tokens
+        order = sorted((i for i in range(len(pairs)) if scores[i] is None), key=lambda i: len(pairs[i][0]) + len(pairs[i][1]))
+        if order:
+            sorted_scores = self.model.predict([pairs[i] for i in order], batch_size=batch_size, show_progress_bar=False)
+            for position, pair_idx in enumerate(order):
+                scores[pair_idx] = sorted_scores[position]
+
+            if cache_keys is not None:
+                self.score_cache.set_many(
+                    {cache_keys[i]: scores[i] for i in order},
+                    {cache_keys[i]: contexts_list[owners[i][0]][owners[i][1]].get('k_item_id') for i in order},
+                )
+
+        reranked_contexts_list = [[] for _ in queries]
+        for (query_idx, context_idx), score in zip(owners, scores):
+            if score > threshold:
+                reranked_context = contexts_list[query_idx][context_idx]
+                reranked_context['score'] = score
+                reranked_contexts_list[query_idx].append(reranked_context)
 
-        reranked_contexts = []
-        for result in results:
-            if result['score'] > threshold:
-                reranked_context = contexts[result['corpus_id']]
-                reranked_context['score'] = result['score']
-                reranked_contexts.append(reranked_context)
+        for reranked_contexts in reranked_contexts_list:
+            reranked_contexts.sort(key=lambda context: context['score'], reverse=True)
 
-        return reranked_contexts
+        return reranked_contexts_list
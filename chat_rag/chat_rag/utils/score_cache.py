@@ -0,0 +1,162 @@
+import hashlib
+import time
+from collections import OrderedDict
+from logging import getLogger
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+logger = getLogger(__name__)
+
+KEY_PREFIX = "rerank_score"
+
+
+def normalize_query(query: str) -> str:
+    """
+    Lowercases and collapses the whitespace of a query so trivial variations share the cached scores.
+    """
+    return " ".join(query.lower().split())
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class RerankScoreCache:
+    """
+    Cache of cross-encoder scores keyed on the normalized query, the knowledge item id and a hash of its content,
+    so a modified knowledge item never hits a stale score. It has a process-local LRU tier with TTL and an optional
+    Redis tier shared by all the replicas.
+    """
+
+    def __init__(
+        self,
+        max_items: int = 50000,
+        ttl: int = 24 * 60 * 60,
+        redis_url: str = None,
+    ):
+        """
+        Parameters
+        ----------
+        max_items : int, optional
+            Maximum number of scores in the local tier, by default 50000.
+        ttl : int, optional
+            Time to live of the scores in seconds, by default one day.
+        redis_url : str, optional
+            URL of the Redis used as shared tier, by default None (local tier only).
+        """
+        self.max_items = max_items
+        self.ttl = ttl
+        self.local: OrderedDict[str, tuple] = OrderedDict()  # key -> (expiry timestamp, score)
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.redis = None
+        if redis_url:
+            import redis
+
+            self.redis = redis.Redis.from_url(redis_url)
+
+    @staticmethod
+    def make_key(model_name: str, query: str, knowledge_item_id: Optional[Any], content: str) -> str:
+        """
+        The model name is part of the key so different cross-encoders don't share scores.
+        """
+        query_hash = hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+        return f"{KEY_PREFIX}:{model_name}:{query_hash}:{knowledge_item_id}:{content_hash(content)}"
+
+    @staticmethod
+    def _item_keys_set(knowledge_item_id: Any) -> str:
+        return f"{KEY_PREFIX}:kitem:{knowledge_item_id}"
+
+    def get_many(self, keys: List[str]) -> Dict[str, float]:
+        """
+        Returns the cached scores of the given keys, missing or expired keys are not included.
+        """
+        found = {}
+        now = time.monotonic()
+        with self.lock:
+            for key in keys:
+                entry = self.local.get(key)
+                if entry is None:
+                    continue
+                expiry, score = entry
+                if expiry < now:
+                    del self.local[key]
+                    continue
+                self.local.move_to_end(key)
+                found[key] = score
+
+        pending = [key for key in keys if key not in found]
+        if self.redis is not None and pending:
+            try:
+                values = self.redis.mget(pending)
+            except Exception as e:  # The shared tier is best effort, never fail a rerank because of it
+                logger.warning(f"Rerank score cache Redis tier unavailable: {e}")
+                values = [None] * len(pending)
+            with self.lock:
+                for key, value in zip(pending, values):
+                    if value is not None:
+                        found[key] = float(value)
+                        self._remember(key, found[key], now)
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def _remember(self, key: str, score: float, now: float):
+        self.local[key] = (now + self.ttl, score)
+        self.local.move_to_end(key)
+        while len(self.local) > self.max_items:
+            self.local.popitem(last=False)
+
+    def set_many(self, scores: Dict[str, float], knowledge_item_ids: Dict[str, Any] = None):
+        """
+        Stores the scores in both tiers.
+        Parameters
+        ----------
+        scores : Dict[str, float]
+            Scores by key.
+        knowledge_item_ids : Dict[str, Any], optional
+            Knowledge item id of every key, used to invalidate the Redis tier when the item changes.
+        """
+        now = time.monotonic()
+        with self.lock:
+            for key, score in scores.items():
+                self._remember(key, float(score), now)
+
+        if self.redis is not None and scores:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for key, score in scores.items():
+                    pipe.set(key, float(score), ex=self.ttl)
+                    knowledge_item_id = (knowledge_item_ids or {}).get(key)
+                    if knowledge_item_id is not None:
+                        item_keys = self._item_keys_set(knowledge_item_id)
+                        pipe.sadd(item_keys, key)
+                        pipe.expire(item_keys, self.ttl)
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Rerank score cache Redis tier unavailable: {e}")
+
+    @classmethod
+    def invalidate(cls, redis_url: str, knowledge_item_ids: List[Any]):
+        """
+        Removes the shared scores of the given knowledge items. The local tiers don't need it because their keys
+        include the content hash, the stale entries just expire.
+        """
+        import redis
+
+        client = redis.Redis.from_url(redis_url)
+        for knowledge_item_id in knowledge_item_ids:
+            item_keys = cls._item_keys_set(knowledge_item_id)
+            keys = client.smembers(item_keys)
+            client.delete(item_keys, *keys)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else None,
+        }
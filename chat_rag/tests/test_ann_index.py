@@ -0,0 +1,38 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+faiss = pytest.importorskip("faiss")
+# The package imports the rest of the retrievers
+pytest.importorskip("torch")
+
+from chat_rag.retrievers import FaissIndex  # noqa: E402
+
+
+@pytest.fixture
+def embeddings():
+    embeddings = np.random.default_rng(0).standard_normal((1000, 32)).astype(np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def test_hnsw_index_is_loaded_with_its_parameters(embeddings, tmp_path):
+    path = str(tmp_path / "index.faiss")
+    FaissIndex.build(embeddings, index_type="hnsw", ef_search=123).save(path)
+
+    index = FaissIndex.load(path)
+
+    assert index.index_type == "hnsw"
+    assert index.ef_search == 123
+    assert index.nprobe is None
+
+
+def test_ivfpq_index_is_loaded_with_its_parameters(embeddings, tmp_path):
+    path = str(tmp_path / "index.faiss")
+    FaissIndex.build(embeddings, index_type="ivfpq", nlist=16, pq_m=8, nprobe=7).save(path)
+
+    index = FaissIndex.load(path)
+
+    assert index.index_type == "ivfpq"
+    assert index.nprobe == 7
+    assert index.ef_search is None
+    scores, indexes = index.search(embeddings[:3], top_k=5)
+    assert [len(row) for row in indexes] == [5, 5, 5]
@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+# The package imports the embedding models
+pytest.importorskip("torch")
+
+from chat_rag.llms import batch_executor  # noqa: E402
+from chat_rag.llms.batch_executor import BatchExecutor, TokenBucket, release_rate_limiters  # noqa: E402
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class BadRequestError(Exception):
+    status_code = 400
+
+
+class FakeClock:
+    """
+    Replaces time.monotonic and asyncio.sleep, a sleep advances the clock instantly and is recorded.
+    """
+
+    def __init__(self, monkeypatch):
+        self.now = 0.0
+        self.sleeps = []
+        real_sleep = asyncio.sleep
+
+        async def sleep(delay):
+            self.sleeps.append(delay)
+            self.now += delay
+            await real_sleep(0)
+
+        monkeypatch.setattr(batch_executor.time, "monotonic", lambda: self.now)
+        monkeypatch.setattr(batch_executor.asyncio, "sleep", sleep)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # The longest backoff delay, so the retries are deterministic
+    monkeypatch.setattr(batch_executor.random, "uniform", lambda low, high: high)
+    return FakeClock(monkeypatch)
+
+
+def test_token_bucket_allows_a_burst_then_the_rate(clock):
+    async def acquire_times():
+        bucket = TokenBucket(rate=2, capacity=2)
+        times = []
+        for _ in range(5):
+            await bucket.acquire()
+            times.append(clock.now)
+        return times
+
+    assert asyncio.run(acquire_times()) == pytest.approx([0, 0, 0.5, 1.0, 1.5])
+
+
+def test_token_bucket_refills_up_to_the_capacity(clock):
+    async def acquire_times():
+        bucket = TokenBucket(rate=1, capacity=2)
+        await bucket.acquire()
+        await bucket.acquire()
+        clock.now += 10
+        times = []
+        for _ in range(3):
+            await bucket.acquire()
+            times.append(clock.now)
+        return times
+
+    assert asyncio.run(acquire_times()) == pytest.approx([10, 10, 11])
+
+
+def test_transient_errors_are_retried_with_exponential_backoff(clock):
+    calls = []
+
+    async def flaky(item):
+        calls.append(item)
+        if len(calls) <= 3:
+            raise RateLimitError("Too many requests")
+        return item * 2
+
+    executor = BatchExecutor(max_retries=5, base_delay=1, max_delay=3)
+    result = asyncio.run(executor.run(flaky, [21]))
+
+    assert result.results == [42]
+    assert result.n_failed == 0
+    assert clock.sleeps == [1, 2, 3]
+
+
+def test_failed_inputs_do_not_fail_the_batch(clock):
+    async def func(item):
+        if item == "bad request":
+            raise BadRequestError("Invalid prompt")
+        if item == "overloaded":
+            raise RateLimitError("Too many requests")
+        return item.upper()
+
+    progress = []
+    executor = BatchExecutor(max_retries=2, progress_callback=lambda *args: progress.append(args))
+    result = asyncio.run(executor.run(func, ["a", "bad request", "overloaded", "b"]))
+
+    assert result.results == ["A", None, None, "B"]
+    assert isinstance(result.errors[1], BadRequestError)
+    assert isinstance(result.errors[2], RateLimitError)
+    # The bad request is not retried, the rate limited input is retried twice
+    assert clock.sleeps == [1, 2]
+    assert progress[-1] == (4, 4, 2)
+
+
+def test_executors_of_a_provider_share_the_rate_limit(clock):
+    started = []
+
+    async def func(item):
+        started.append((item, clock.now))
+        return item
+
+    async def run_both():
+        first = BatchExecutor(requests_per_second=2, provider="openai")
+        second = BatchExecutor(requests_per_second=2, provider="openai")
+        await asyncio.gather(first.run(func, [1, 2]), second.run(func, [3, 4]))
+        release_rate_limiters()
+
+    asyncio.run(run_both())
+
+    assert sorted(now for _, now in started) == pytest.approx([0, 0, 0.5, 1.0])
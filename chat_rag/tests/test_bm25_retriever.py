@@ -0,0 +1,79 @@
+import pytest
+
+pytest.importorskip("bm25s")
+# The package imports the rest of the retrievers
+pytest.importorskip("torch")
+
+from chat_rag.retrievers.bm25_retriever import BM25Retriever  # noqa: E402
+
+CORPUS = [
+    {"content": "How do I reset my password from the settings page", "title": "Password"},
+    {"content": "Invoices are sent every month to the billing email", "title": "Billing"},
+    {"content": "Contact support if the problem with your account persists", "title": "Support"},
+    {"content": "The settings page lets you change the language of your account", "title": "Settings"},
+]
+QUERIES = ["reset password", "billing invoices", "account settings language", "support problem"]
+
+
+def scores_by_title(retriever):
+    return [
+        {doc["title"]: doc["score"] for doc in query_results}
+        for query_results in retriever.retrieve(QUERIES, top_k=len(CORPUS), disable_progress_bar=True)
+    ]
+
+
+def assert_same_scores(retriever, expected):
+    for query_scores, expected_scores in zip(scores_by_title(retriever), scores_by_title(expected)):
+        assert query_scores.keys() == expected_scores.keys()
+        for title, score in query_scores.items():
+            assert score == pytest.approx(expected_scores[title])
+
+
+def test_add_matches_a_fresh_index():
+    retriever = BM25Retriever(CORPUS[:2], ids=["a", "b"])
+    retriever.add(CORPUS[2:], ids=["c", "d"])
+
+    assert len(retriever) == 4
+    assert_same_scores(retriever, BM25Retriever(CORPUS, ids=["a", "b", "c", "d"]))
+
+
+def test_remove_matches_a_fresh_index():
+    retriever = BM25Retriever(CORPUS, ids=["a", "b", "c", "d"])
+    retriever.remove(["b", "unknown"])
+
+    assert len(retriever) == 3
+    assert_same_scores(retriever, BM25Retriever([CORPUS[0], CORPUS[2], CORPUS[3]]))
+
+
+def test_add_replaces_the_documents_with_the_same_id():
+    retriever = BM25Retriever(CORPUS, ids=["a", "b", "c", "d"])
+    replacement = {"content": "Passwords expire every ninety days", "title": "Password"}
+    retriever.add([replacement], ids=["a"])
+
+    assert len(retriever) == 4
+    assert_same_scores(retriever, BM25Retriever([replacement, *CORPUS[1:]]))
+
+
+def test_save_and_load_round_trip(tmp_path):
+    retriever = BM25Retriever(CORPUS[:3])
+    retriever.add([CORPUS[3]])
+    retriever.remove(["1"])
+    retriever.save(str(tmp_path))
+
+    loaded = BM25Retriever.load(str(tmp_path))
+
+    assert len(loaded) == 3
+    assert_same_scores(loaded, BM25Retriever([CORPUS[0], CORPUS[2], CORPUS[3]]))
+    # The loaded index keeps working incrementally
+    loaded.add([CORPUS[1]])
+    assert_same_scores(loaded, BM25Retriever([CORPUS[0], CORPUS[2], CORPUS[3], CORPUS[1]]))
+
+
+def test_empty_index_returns_no_results(tmp_path):
+    retriever = BM25Retriever(CORPUS, ids=["a", "b", "c", "d"])
+    retriever.remove(["a", "b", "c", "d"])
+
+    assert retriever.retrieve(QUERIES, disable_progress_bar=True) == [[] for _ in QUERIES]
+
+    retriever.save(str(tmp_path))
+    assert BM25Retriever.load(str(tmp_path)).retrieve(QUERIES, disable_progress_bar=True) == [[] for _ in QUERIES]
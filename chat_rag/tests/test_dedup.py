@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("numpy")
+# The package imports the embedding models
+pytest.importorskip("torch")
+
+from chat_rag.data.dedup import NearDuplicateFilter, item_text  # noqa: E402
+
+PAGE = (
+    "Our support team answers every request within two working days. You can reach us by email or phone "
+    "from Monday to Friday, and the help center lists the answers to the most frequent questions about "
+    "billing, accounts, passwords and the mobile application."
+)
+UNRELATED = (
+    "Invoices are generated on the first day of every month and sent to the billing email of the account. "
+    "Past invoices can be downloaded from the billing section of the settings page as PDF files."
+)
+
+
+def test_near_copies_are_dropped():
+    dedup = NearDuplicateFilter(threshold=0.8)
+
+    assert not dedup.is_duplicate(PAGE)
+    assert dedup.is_duplicate(PAGE)
+    # The same boilerplate with another casing and punctuation
+    assert dedup.is_duplicate(PAGE.upper().replace(",", ""))
+    # One word changed in the footer of a crawled page
+    assert dedup.is_duplicate(PAGE.replace("mobile application", "mobile app"))
+    assert dedup.report() == {"seen": 4, "kept": 1, "dropped": 3}
+
+
+def test_unrelated_texts_are_kept():
+    dedup = NearDuplicateFilter()
+
+    assert not dedup.is_duplicate(PAGE)
+    assert not dedup.is_duplicate(UNRELATED)
+    # Sharing half of the text is not enough with the default threshold
+    assert not dedup.is_duplicate(PAGE[: len(PAGE) // 2] + " " + UNRELATED[: len(UNRELATED) // 2])
+
+
+def test_short_texts_are_never_duplicates():
+    dedup = NearDuplicateFilter(shingle_size=5)
+
+    assert not dedup.is_duplicate("Yes, it is free")
+    assert not dedup.is_duplicate("Yes, it is free")
+    assert dedup.report()["dropped"] == 0
+
+
+def test_filter_compares_the_title_and_content_of_the_items():
+    items = [
+        SimpleNamespace(title="How do I contact support?", content=PAGE),
+        SimpleNamespace(title="How do I contact support?", content=PAGE),
+        # The same answer to another question
+        SimpleNamespace(title="Which payment methods do you accept for the yearly plans?", content=PAGE),
+        SimpleNamespace(title=None, content=UNRELATED),
+    ]
+
+    kept = list(NearDuplicateFilter(threshold=0.8).filter(items))
+
+    assert kept == [items[0], items[2], items[3]]
+    assert item_text(items[3]) == "\n" + UNRELATED
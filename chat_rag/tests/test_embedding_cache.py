@@ -0,0 +1,53 @@
+import sqlite3
+
+import pytest
+
+np = pytest.importorskip("numpy")
+# The package imports the embedding models
+pytest.importorskip("torch")
+
+from chat_rag.embedding_models import EmbeddingCache  # noqa: E402
+
+
+def test_disk_tier_is_shared(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    writer = EmbeddingCache(path=path)
+    writer.set_many([("a", np.ones(4)), ("b", np.zeros(4))])
+
+    reader = EmbeddingCache(path=path)
+    found = reader.get_many(["a", "b", "c"])
+
+    assert sorted(found) == ["a", "b"]
+    np.testing.assert_array_equal(found["a"], np.ones(4, dtype=np.float32))
+    assert reader.stats()["disk_hits"] == 2
+    assert reader.stats()["misses"] == 1
+
+
+def test_locked_database_keeps_the_embeddings_in_memory(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = EmbeddingCache(path=path, timeout=0.1)
+
+    # Another process holding the write lock of the database
+    lock = sqlite3.connect(path)
+    lock.execute("BEGIN IMMEDIATE")
+    try:
+        cache.set_many([("a", np.ones(4))])
+    finally:
+        lock.rollback()
+        lock.close()
+
+    assert list(cache.get_many(["a"])) == ["a"]
+    assert EmbeddingCache(path=path).get_many(["a"]) == {}
+
+
+def test_unreadable_database_is_a_miss(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = EmbeddingCache(path=path)
+    cache.set_many([("a", np.ones(4))])
+    cache.memory.clear()
+
+    with sqlite3.connect(path) as other:
+        other.execute("DROP TABLE embeddings")
+
+    assert cache.get_many(["a"]) == {}
+    assert cache.stats()["misses"] == 1
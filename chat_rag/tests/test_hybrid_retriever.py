@@ -0,0 +1,73 @@
+import pytest
+
+# The package imports the rest of the retrievers
+pytest.importorskip("torch")
+
+from chat_rag.retrievers.hybrid_retriever import HybridRetriever  # noqa: E402
+
+
+class StaticRetriever:
+    """
+    Returns the same ranked documents for every query.
+    """
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def retrieve(self, queries, top_k=5, disable_progress_bar=False, **kwargs):
+        return [self.docs[:top_k] for _ in queries]
+
+
+def make_retriever(lexical_docs, dense_docs, **kwargs):
+    return HybridRetriever(StaticRetriever(lexical_docs), StaticRetriever(dense_docs), **kwargs)
+
+
+def test_rrf_ranks_the_documents_found_by_both_legs_first():
+    lexical = [{"content": "a", "score": 9.0}, {"content": "b", "score": 5.0}, {"content": "c", "score": 1.0}]
+    dense = [{"content": "c", "similarity": 0.9}, {"content": "d", "similarity": 0.8}, {"content": "a", "similarity": 0.7}]
+    retriever = make_retriever(lexical, dense, fusion="rrf", rrf_k=60)
+
+    (results,) = retriever.retrieve(["query"], top_k=4)
+
+    # a: 1/61 + 1/63, c: 1/63 + 1/61, the tie keeps the lexical order
+    assert [doc["content"] for doc in results] == ["a", "c", "b", "d"]
+    assert results[0]["score"] == pytest.approx(0.5 / 61 + 0.5 / 63)
+    retriever.close()
+
+
+def test_weighted_fusion_uses_the_normalized_scores():
+    lexical = [{"content": "a", "score": 10.0}, {"content": "b", "score": 0.0}]
+    dense = [{"content": "b", "similarity": 0.9}, {"content": "a", "similarity": 0.5}]
+    retriever = make_retriever(lexical, dense, fusion="weighted", weights=(0.2, 0.8))
+
+    (results,) = retriever.retrieve(["query"], top_k=2)
+
+    # a: 0.2 * 1 + 0.8 * 0, b: 0.2 * 0 + 0.8 * 1
+    assert [doc["content"] for doc in results] == ["b", "a"]
+    assert [doc["score"] for doc in results] == pytest.approx([0.8, 0.2])
+    retriever.close()
+
+
+def test_results_are_deduplicated_by_content():
+    lexical = [{"content": "a", "score": 3.0}, {"content": "b", "score": 2.0}]
+    # e.g. two ColBERT passages of the same document
+    dense = [{"content": "a", "similarity": 0.9}, {"content": "a", "similarity": 0.8}, {"content": "b", "similarity": 0.1}]
+    retriever = make_retriever(lexical, dense, fusion="rrf", rrf_k=0)
+
+    (results,) = retriever.retrieve(["query"], top_k=5)
+
+    assert [doc["content"] for doc in results] == ["a", "b"]
+    # Every leg counts a content once, at its best rank
+    assert results[0]["score"] == pytest.approx(0.5 / 1 + 0.5 / 1)
+    assert results[1]["score"] == pytest.approx(0.5 / 2 + 0.5 / 3)
+    retriever.close()
+
+
+def test_top_k_limits_the_fused_results():
+    docs = [{"content": str(i), "score": float(10 - i)} for i in range(10)]
+    retriever = make_retriever(docs, [])
+
+    results = retriever.retrieve(["first", "second"], top_k=3)
+
+    assert [[doc["content"] for doc in query_results] for query_results in results] == [["0", "1", "2"]] * 2
+    retriever.close()
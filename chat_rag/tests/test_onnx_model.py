@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+pytest.importorskip("onnxruntime")
+
+from chat_rag.embedding_models import BaseModel  # noqa: E402
+from chat_rag.embedding_models.onnx_model import PARITY_TEXTS, ONNXEncoder  # noqa: E402
+
+WORDS = ["how", "do", "i", "reset", "my", "password", "query", "passage", "the", "settings", "page", "yes"]
+
+
+@pytest.fixture(scope="module")
+def tiny_model_dir(tmp_path_factory):
+    """
+    A small random BERT model and its tokenizer saved to disk, so the tests don't download anything.
+    """
+    model_dir = tmp_path_factory.mktemp("tiny_bert")
+    vocab_path = model_dir / "vocab.txt"
+    vocab_path.write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", *WORDS]))
+    tokenizer = transformers.BertTokenizer(str(vocab_path))
+    tokenizer.save_pretrained(model_dir)
+
+    torch.manual_seed(0)
+    config = transformers.BertConfig(
+        vocab_size=len(WORDS) + 5,
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=64,
+    )
+    transformers.BertModel(config).save_pretrained(model_dir)
+    return str(model_dir)
+
+
+@pytest.mark.parametrize("quantize,min_similarity", [(False, 0.9999), (True, 0.99)])
+def test_onnx_embeddings_match_torch(tiny_model_dir, tmp_path, quantize, min_similarity):
+    model = BaseModel(model_name=tiny_model_dir, use_cpu=True)
+    torch_embeddings = model.encode(PARITY_TEXTS, disable_progress_bar=True)
+
+    similarity = model.enable_onnx(cache_dir=str(tmp_path), quantize=quantize, min_similarity=min_similarity)
+
+    assert isinstance(model.model, ONNXEncoder)
+    assert similarity >= min_similarity
+    onnx_embeddings = model.encode(PARITY_TEXTS, disable_progress_bar=True)
+    cosine = (torch_embeddings * onnx_embeddings).sum(dim=1)
+    assert torch.all(cosine >= min_similarity)
+
+
+def test_onnx_is_not_used_below_min_similarity(tiny_model_dir, tmp_path):
+    model = BaseModel(model_name=tiny_model_dir, use_cpu=True)
+    torch_model = model.model
+
+    model.enable_onnx(cache_dir=str(tmp_path), min_similarity=1.01)
+
+    assert model.model is torch_model
+
+
+def test_export_leaves_no_temporary_files(tiny_model_dir, tmp_path):
+    model = BaseModel(model_name=tiny_model_dir, use_cpu=True)
+    model.enable_onnx(cache_dir=str(tmp_path))
+
+    (model_dir,) = os.listdir(tmp_path)
+    assert sorted(os.listdir(tmp_path / model_dir)) == ["model.int8.onnx", "model.onnx"]
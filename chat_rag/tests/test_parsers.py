@@ -0,0 +1,111 @@
+import os
+
+import pytest
+
+pytest.importorskip("unstructured")
+
+from unstructured.documents.elements import Title  # noqa: E402
+from unstructured.partition.html import partition_html  # noqa: E402
+
+from benchmarks.bench_parse_elements import (  # noqa: E402
+    make_elements,
+    old_is_header_or_footer,
+    old_parse_elements,
+)
+from chat_rag.data.parsers import (  # noqa: E402
+    is_header_or_footer,
+    parse_elements,
+    parse_html,
+    parse_pdf,
+)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def test_is_header_or_footer_matches_old_predicate():
+    for element in make_elements(2000):
+        assert is_header_or_footer(element) == old_is_header_or_footer(element), element
+
+
+def test_is_header_or_footer_without_coordinates():
+    assert not is_header_or_footer(Title(text="A title without coordinates"))
+
+
+@pytest.mark.parametrize("file_type", ["pdf", "html"])
+@pytest.mark.parametrize("combine_section_under_n_chars,new_after_n_chars", [(500, 1000), (-1, 1000), (500, -1), (-1, -1), (100, 300)])
+def test_parse_elements_matches_old_sections(file_type, combine_section_under_n_chars, new_after_n_chars):
+    for seed in range(5):
+        elements = make_elements(1000, seed=seed)
+        kwargs = dict(
+            file_type=file_type,
+            combine_section_under_n_chars=combine_section_under_n_chars,
+            new_after_n_chars=new_after_n_chars,
+        )
+        new_sections = parse_elements(elements, **kwargs)
+        old_sections = old_parse_elements(elements, **kwargs)
+        # Same elements, by identity, in the same sections
+        assert [[id(e) for e in section] for section in new_sections] == [
+            [id(e) for e in section] for section in old_sections
+        ]
+
+
+def k_item_fields(k_items):
+    return [(k_item.title, k_item.content, k_item.url, k_item.page_number) for k_item in k_items]
+
+
+def test_parse_html_fixture():
+    filename = os.path.join(FIXTURES_DIR, "faq.html")
+
+    k_items = parse_html(filename=filename, combine_section_under_n_chars=-1)
+
+    # A section per question, titled by the first heading of the section
+    assert [k_item.title for k_item in k_items] == [
+        "Account",
+        "Can I change the email of my account?",
+        "Billing",
+    ]
+    assert k_items[0].content.startswith("Account\nHow do I reset my password?\nOpen the settings page")
+    assert k_items[2].content.endswith("The billing email can be different from the email of the account.")
+    assert {k_item.url for k_item in k_items} == {"faq.html"}
+    assert k_item_fields(parse_html(filename=filename, combine_section_under_n_chars=-1, stream=True)) == k_item_fields(
+        k_items
+    )
+
+
+def test_parse_elements_matches_old_sections_of_the_html_fixture():
+    elements = partition_html(filename=os.path.join(FIXTURES_DIR, "faq.html"))
+
+    for kwargs in [{}, {"combine_section_under_n_chars": -1}, {"new_after_n_chars": 200}]:
+        new_sections = parse_elements(elements, file_type="html", **kwargs)
+        old_sections = old_parse_elements(elements, file_type="html", **kwargs)
+        assert [[id(e) for e in section] for section in new_sections] == [
+            [id(e) for e in section] for section in old_sections
+        ]
+
+
+def test_parse_pdf_fixture():
+    filename = os.path.join(FIXTURES_DIR, "guide.pdf")
+
+    k_items = parse_pdf(filename=filename, strategy="fast", combine_section_under_n_chars=-1)
+
+    assert {k_item.page_number for k_item in k_items} == {1, 2}
+    content = "\n".join(k_item.content for k_item in k_items)
+    assert "knowledge base" in content
+    assert "Uploading documents" in content
+    # The page numbers at the bottom of the pages are dropped
+    assert not any(line.strip().isdigit() for line in content.splitlines())
+    assert k_item_fields(
+        parse_pdf(filename=filename, strategy="fast", combine_section_under_n_chars=-1, stream=True)
+    ) == k_item_fields(k_items)
+
+
+def test_parse_pdf_fixture_in_parallel_matches_the_whole_file():
+    pytest.importorskip("pypdf")
+    filename = os.path.join(FIXTURES_DIR, "guide.pdf")
+
+    k_items = parse_pdf(filename=filename, strategy="fast", combine_section_under_n_chars=-1)
+    parallel_k_items = parse_pdf(
+        filename=filename, strategy="fast", combine_section_under_n_chars=-1, n_workers=2, pages_per_range=1
+    )
+
+    assert k_item_fields(parallel_k_items) == k_item_fields(k_items)
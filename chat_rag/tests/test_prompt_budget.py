@@ -0,0 +1,64 @@
+import pytest
+
+# The package imports the embedding models
+pytest.importorskip("torch")
+
+from chat_rag.llms.prompt_budget import PromptBudget  # noqa: E402
+
+
+def count_words(texts):
+    return [len(text.split()) for text in texts]
+
+
+def make_messages(*n_words):
+    return [{"role": "user", "content": " ".join(["word"] * n)} for n in n_words]
+
+
+def test_fit_messages_keeps_the_largest_suffix_that_fits():
+    budget = PromptBudget(count_tokens=count_words, message_overhead=1)
+    # Costs 4, 3, 2 from the oldest, the suffix sums are 2, 5, 9
+    messages = make_messages(3, 2, 1)
+
+    assert budget.fit_messages(messages, 1) == 0
+    assert budget.fit_messages(messages, 2) == 1
+    assert budget.fit_messages(messages, 4) == 1
+    assert budget.fit_messages(messages, 5) == 2
+    assert budget.fit_messages(messages, 8) == 2
+    assert budget.fit_messages(messages, 9) == 3
+    assert budget.fit_messages(messages, 100) == 3
+    assert budget.fit_messages([], 100) == 0
+
+
+def test_fit_contexts_keeps_the_first_contexts_that_fit():
+    budget = PromptBudget(count_tokens=count_words)
+    # "\n- " counts as one word, so the costs are 3, 2, 4 and the prefix sums 3, 5, 9
+    contexts = ["a b", "c", "d e f"]
+
+    assert budget.fit_contexts(contexts, 2) == 0
+    assert budget.fit_contexts(contexts, 3) == 1
+    assert budget.fit_contexts(contexts, 8) == 2
+    assert budget.fit_contexts(contexts, 9) == 3
+    assert budget.fit_contexts(contexts, 3, separator="") == 2
+    assert budget.fit_contexts([], 10) == 0
+
+
+def test_counts_are_cached_by_content():
+    counted = []
+
+    def count_tokens(texts):
+        counted.extend(texts)
+        return count_words(texts)
+
+    budget = PromptBudget(count_tokens=count_tokens, max_cache_items=2)
+
+    assert budget.counts(["a b", "c", "a b"]) == [2, 1, 2]
+    assert budget.counts(["c", "a b"]) == [1, 2]
+    assert counted == ["a b", "c"]
+    # The least recently used count is evicted
+    budget.counts(["d e f"])
+    budget.counts(["a b", "c"])
+    assert counted == ["a b", "c", "d e f", "c"]
+
+
+def test_the_default_count_is_an_estimate():
+    assert PromptBudget().counts(["", "abcdefgh"]) == [1, 3]
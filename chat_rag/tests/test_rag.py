@@ -0,0 +1,48 @@
+import pytest
+
+# The package imports the embedding models
+pytest.importorskip("torch")
+
+from chat_rag.llms.prompt_budget import PromptBudget  # noqa: E402
+from chat_rag.rag import RAG  # noqa: E402
+
+
+class FakeLLM:
+    def __init__(self, model_max_length=None):
+        self.model_max_length = model_max_length
+        self.prompt_budget = PromptBudget(count_tokens=lambda texts: [len(text.split()) for text in texts])
+
+
+CONTEXTS = [
+    "reset the password from the settings page",
+    "the password must have eight characters",
+    "invoices are sent every month",
+]
+
+
+def system_prompt(rag, contexts):
+    messages = [{"role": "system", "content": "You are a helpful assistant."}, {"role": "user", "content": "hi"}]
+    return rag.augment_prompt(messages, list(contexts))[0]["content"]
+
+
+def test_contexts_over_the_budget_are_trimmed():
+    # The separator counts as one token, so the first two contexts take 8 + 7 tokens
+    rag = RAG(retriever=None, llm=FakeLLM(), max_context_tokens=15)
+
+    prompt = system_prompt(rag, CONTEXTS)
+
+    assert prompt == "You are a helpful assistant.\nInformation:\n- " + "\n- ".join(CONTEXTS[:2])
+
+
+def test_the_budget_defaults_to_a_share_of_the_context_length():
+    rag = RAG(retriever=None, llm=FakeLLM(model_max_length=20))
+
+    assert rag.max_context_tokens == 10
+    assert system_prompt(rag, CONTEXTS).endswith("- " + CONTEXTS[0])
+
+
+def test_all_contexts_are_used_without_a_known_context_length():
+    rag = RAG(retriever=None, llm=FakeLLM())
+
+    assert rag.max_context_tokens is None
+    assert system_prompt(rag, CONTEXTS).endswith("- " + CONTEXTS[2])
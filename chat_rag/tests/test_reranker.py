@@ -0,0 +1,88 @@
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from chat_rag.utils.reranker import ReRanker  # noqa: E402
+from chat_rag.utils.score_cache import RerankScoreCache  # noqa: E402
+
+
+class FakeCrossEncoder:
+    """
+    Scores a pair by the fraction of query words found in the context, and records the scored pairs.
+    """
+
+    def __init__(self):
+        self.predicted = []
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.predicted.extend(tuple(pair) for pair in pairs)
+        scores = []
+        for query, content in pairs:
+            query_words = set(query.lower().split())
+            scores.append(len(query_words & set(content.lower().split())) / len(query_words))
+        return scores
+
+
+def make_reranker(score_cache=None):
+    reranker = ReRanker.__new__(ReRanker)
+    reranker.model_name = "fake-cross-encoder"
+    reranker.model = FakeCrossEncoder()
+    reranker.score_cache = score_cache
+    return reranker
+
+
+def make_contexts():
+    return [
+        [
+            {"k_item_id": 1, "content": "reset the password from the settings page"},
+            {"k_item_id": 2, "content": "invoices are sent every month"},
+            {"k_item_id": 3, "content": "the password must have eight characters"},
+        ],
+        [
+            {"k_item_id": 2, "content": "invoices are sent every month"},
+            {"k_item_id": 4, "content": "contact support"},
+        ],
+        [],
+    ]
+
+
+QUERIES = ["how to reset the password", "when are invoices sent", "anything"]
+
+
+def scores(contexts_list):
+    return [[(context["k_item_id"], context["score"]) for context in contexts] for contexts in contexts_list]
+
+
+def test_rank_batch_matches_ranking_every_query():
+    batched = make_reranker().rank_batch(QUERIES, make_contexts(), batch_size=2)
+
+    reranker = make_reranker()
+    single = [reranker(query, contexts, batch_size=2) for query, contexts in zip(QUERIES, make_contexts())]
+
+    assert scores(batched) == scores(single)
+    assert [[context["k_item_id"] for context in contexts] for contexts in batched] == [[1, 3], [2], []]
+
+
+def test_contexts_not_above_the_threshold_are_dropped():
+    (reranked,) = make_reranker().rank_batch(QUERIES[:1], make_contexts()[:1], threshold=0.5)
+
+    assert [context["k_item_id"] for context in reranked] == [1]
+
+
+def test_cached_scores_skip_the_cross_encoder():
+    score_cache = RerankScoreCache()
+    reranker = make_reranker(score_cache)
+
+    first = reranker.rank_batch(QUERIES, make_contexts())
+    assert len(reranker.model.predicted) == 5
+    assert score_cache.stats()["misses"] == 5
+
+    reranker.model.predicted.clear()
+    # The same queries with other casing and spacing, and a modified knowledge item
+    contexts_list = make_contexts()
+    contexts_list[1][1]["content"] = "contact support by email"
+    second = reranker.rank_batch(["How to reset  the password", "when are invoices sent", "anything"], contexts_list)
+
+    assert reranker.model.predicted == [("when are invoices sent", "contact support by email")]
+    assert score_cache.stats()["hits"] == 4
+    assert scores(second)[0] == scores(first)[0]
@@ -0,0 +1,113 @@
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# The package imports the embedding models
+pytest.importorskip("torch")
+
+from chat_rag.utils import score_cache  # noqa: E402
+from chat_rag.utils.score_cache import RerankScoreCache  # noqa: E402
+
+
+class FakeRedis:
+    """
+    In-memory stand-in of the redis client with the commands used by RerankScoreCache.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+
+    def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def set(self, key, value, ex=None):
+        self.values[key] = str(value).encode()
+
+    def sadd(self, key, member):
+        self.sets.setdefault(key, set()).add(member)
+
+    def expire(self, key, ttl):
+        pass
+
+    def execute(self):
+        pass
+
+    def smembers(self, key):
+        return set(self.sets.get(key, set()))
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+            self.sets.pop(key, None)
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = FakeRedis()
+    module = SimpleNamespace(Redis=SimpleNamespace(from_url=lambda url: client))
+    monkeypatch.setitem(sys.modules, "redis", module)
+    return client
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(score_cache.time, "monotonic", lambda: clock.now)
+    return clock
+
+
+def test_key_normalizes_the_query_and_hashes_the_content():
+    key = RerankScoreCache.make_key("model", "How do I  reset it?", 7, "content")
+
+    assert key == RerankScoreCache.make_key("model", "how do i reset it?", 7, "content")
+    assert key != RerankScoreCache.make_key("model", "how do i reset it?", 7, "new content")
+    assert key != RerankScoreCache.make_key("other model", "how do i reset it?", 7, "content")
+
+
+def test_local_scores_expire_after_the_ttl(clock):
+    cache = RerankScoreCache(ttl=60)
+    cache.set_many({"a": 0.5})
+
+    clock.now += 59
+    assert cache.get_many(["a", "b"]) == {"a": 0.5}
+    clock.now += 2
+    assert cache.get_many(["a"]) == {}
+    assert cache.stats() == {"hits": 1, "misses": 2, "hit_rate": 1 / 3}
+
+
+def test_local_tier_evicts_the_least_recently_used(clock):
+    cache = RerankScoreCache(max_items=2)
+    cache.set_many({"a": 0.1, "b": 0.2})
+    cache.get_many(["a"])
+    cache.set_many({"c": 0.3})
+
+    assert cache.get_many(["a", "b", "c"]) == {"a": 0.1, "c": 0.3}
+
+
+def test_redis_tier_is_shared_and_invalidated_per_knowledge_item(fake_redis):
+    writer = RerankScoreCache(redis_url="redis://redis")
+    writer.set_many({"a": 0.5, "b": 0.7}, {"a": 1, "b": 2})
+
+    assert RerankScoreCache(redis_url="redis://redis").get_many(["a", "b"]) == {"a": 0.5, "b": 0.7}
+
+    RerankScoreCache.invalidate("redis://redis", [1])
+
+    assert RerankScoreCache(redis_url="redis://redis").get_many(["a", "b"]) == {"b": 0.7}
+
+
+def test_redis_errors_are_misses(fake_redis):
+    def unavailable(*args, **kwargs):
+        raise ConnectionError("Connection refused")
+
+    fake_redis.mget = unavailable
+    fake_redis.execute = unavailable
+    cache = RerankScoreCache(redis_url="redis://redis")
+
+    cache.set_many({"a": 0.5}, {"a": 1})
+    assert cache.get_many(["a"]) == {"a": 0.5}
+    assert RerankScoreCache(redis_url="redis://redis").get_many(["a"]) == {}